@@ -1,10 +1,57 @@
-from fastapi import FastAPI
+import json
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-from app.services.chatbot import get_rafiki_answer
+from typing import Optional
+from app.services.admission import (
+    OVERLOAD_MODE, HeldStreamingResponse, Rejected, get_admission, rate_limit_keys,
+)
+from app.services.feedback import close_feedback_store, get_feedback_store
+from app.services.intents import IntentRouter
+from app.services.metrics import REGISTRY, MetricsMiddleware
+from app.services.startup import PipelineLoader
+from app.services.warmup import WARMUP, Warmup, close_question_log, get_question_log
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="MOHI Rafiki IT Chatbot")
+# The chatbot module (LangChain, Chroma, OpenAI clients) is imported and the RAG pipeline built
+# in the background, so '/' answers as soon as the process is up. Endpoints that need the
+# pipeline await it; the chatbot imports inside them are free once it has loaded.
+loader = PipelineLoader()
+
+# Bounded concurrency, a short wait queue and per-session / per-address rate limits for the chat endpoints;
+# requests turned away when full get the built-in responses (or 503, see RAFIKI_OVERLOAD)
+admission = get_admission()
+builtin_router = IntentRouter()
+
+def prepare_pipeline(pipeline):
+    # Retrieval shares the chunk priors the feedback store keeps up to date
+    pipeline.priors = get_feedback_store().priors
+    # Precompute answers for the top questions in the background; '/' reports ready once done
+    # Only counted while warm-up runs: its watch loop is what flushes the log
+    if WARMUP:
+        pipeline.questions = get_question_log()
+    app.state.warmup = Warmup(pipeline, pipeline.questions)
+    app.state.warmup.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the RAG pipeline once (unless already built); every /chat request reuses it
+    loader.start(on_loaded=prepare_pipeline)
+    yield
+    await loader.stop()
+    warmup = getattr(app.state, "warmup", None)
+    if warmup is not None:
+        await warmup.stop()
+        close_question_log()
+    # Write out sessions still queued for the background writer
+    if loader.state == "loaded":
+        loader.pipeline.sessions.close()
+    # Write out feedback still queued for the background writer
+    close_feedback_store()
+
+app = FastAPI(title="MOHI Rafiki IT Chatbot", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,12 +59,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Request counts, latency and in-flight gauge per endpoint, plus the optional Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 # Define the request model ONLY ONCE
 class ChatRequest(BaseModel):
     message: str
-    history: list = []
+    session_id: Optional[str] = None  # from the previous reply; omit to start a conversation
+    history: list = []  # legacy clients: full history, answered without a session
 
 class FeedbackRequest(BaseModel):
     messageIndex: int
@@ -25,23 +77,100 @@ class FeedbackRequest(BaseModel):
     feedbackType: str  # 'positive' or 'negative'
     feedbackReason: Optional[str] = None  # 'confused', 'more-detail', 'wrong', 'human'
     timestamp: str
+    answerId: Optional[str] = None  # answer_id of the rated reply
 
 class FeedbackResponse(BaseModel):
     success: bool
     message: str
 
 @app.get("/")
-def health_check():
+def health_check(response: Response):
+    # Answers immediately, with a 503 while the pipeline loads ('loading') and until warm-up
+    # has precomputed the top answers ('warming_up'), so load balancers hold traffic back
+    warmup = getattr(app.state, "warmup", None)
+    if loader.state != "loaded":
+        response.status_code = 503
+        return {"status": loader.state, "service": "Rafiki IT"}
+    if warmup is not None and not warmup.ready:
+        response.status_code = 503
+        return {"status": "warming_up", "service": "Rafiki IT"}
     return {"status": "online", "service": "Rafiki IT"}
 
+def sse_event(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def chat_event_stream(frames):
+    """
+    Re-yield the answer's SSE frames. The pipeline already falls back to the
+    built-in response when the LLM fails before the first token; a failure
+    after that ends the stream with an 'error' frame rather than a cut-off body.
+    """
+    try:
+        async for frame in frames:
+            yield frame
+    except Exception as e:
+        print(f"Chat stream error: {str(e)}")
+        yield sse_event("error", {"detail": "stream interrupted"})
+
+def chat_rate_limit_keys(http: Request, request: ChatRequest) -> list:
+    """Client address, plus the session once the loaded pipeline's SessionStore has issued it"""
+    sessions = loader.pipeline.sessions if loader.state == "loaded" else None
+    return rate_limit_keys(http, request.session_id, sessions)
+
+def turned_away(e: Rejected, request: ChatRequest, endpoint: str, stream: bool = False):
+    """429 with Retry-After when rate limited; when overloaded, the built-in response or 503."""
+    if e.status == 503 and OVERLOAD_MODE == "builtin":
+        REGISTRY.inc("rafiki_builtin_fallbacks_total", endpoint=endpoint)
+        response_text = builtin_router.fallback(request.message)
+        reply = {"response": response_text, "session_id": request.session_id, "answer_id": None}
+        if not stream:
+            return reply
+        frames = [("metadata", {"sources": [], "session_id": request.session_id}),
+                  ("token", {"content": response_text}), ("done", reply)]
+        return StreamingResponse(
+            iter(sse_event(event, data) for event, data in frames),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    return JSONResponse({"detail": "Too many requests" if e.status == 429 else "Rafiki is busy",
+                         "reason": e.reason}, status_code=e.status, headers=e.headers)
+
 @app.post("/chat")
-async def chat_with_rafiki(request: ChatRequest):
-    # This calls the service with BOTH the message and the history
-    answer = get_rafiki_answer(request.message, chat_history=request.history)
-    return {"response": answer}
+async def chat_with_rafiki(request: ChatRequest, http: Request):
+    try:
+        ticket = await admission.enter(chat_rate_limit_keys(http, request))
+    except Rejected as e:
+        return turned_away(e, request, "/chat")
+    try:
+        await loader.get()
+        from app.services.chatbot import achat
+        # The conversation lives server-side; the reply carries the session_id to send next time
+        return await achat(request.message, session_id=request.session_id, chat_history=request.history)
+    finally:
+        ticket.release()
 
-# In-memory storage for feedback (could be moved to MongoDB for persistence)
-feedback_store = []
+@app.post("/chat/stream")
+async def stream_chat_with_rafiki(request: ChatRequest, http: Request):
+    try:
+        ticket = await admission.enter(chat_rate_limit_keys(http, request))
+    except Rejected as e:
+        return turned_away(e, request, "/chat/stream", stream=True)
+    try:
+        await loader.get()
+    except BaseException:
+        ticket.release()
+        raise
+    from app.services.chatbot import stream_rafiki_answer
+    # Server-Sent Events: sources first, then tokens as they arrive, then a 'done' frame.
+    # The slot is held until the stream has been sent (or the client went away).
+    return HeldStreamingResponse(
+        ticket,
+        chat_event_stream(stream_rafiki_answer(request.message, chat_history=request.history,
+                                               session_id=request.session_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/api/feedback", response_model=FeedbackResponse)
 async def submit_feedback(request: FeedbackRequest):
@@ -50,15 +179,28 @@ async def submit_feedback(request: FeedbackRequest):
     This data can be used to improve the chatbot over time.
     """
     try:
-        feedback_entry = {
-            "messageIndex": request.messageIndex,
-            "messageContent": request.messageContent,
-            "feedbackType": request.feedbackType,
-            "feedbackReason": request.feedbackReason,
-            "timestamp": request.timestamp
-        }
-        
-        feedback_store.append(feedback_entry)
+        # Trace the rating back to the question, chunks and answer that produced it;
+        # without a loaded pipeline there is nothing to trace and the rating is stored as is
+        pipeline = loader.pipeline if request.answerId and loader.state == "loaded" else None
+        served = (pipeline.answers.get(request.answerId) if pipeline is not None else None) or {}
+
+        # Counted immediately, written to SQLite in batches by a background thread
+        get_feedback_store().record(
+            request.feedbackType,
+            reason=request.feedbackReason,
+            client_timestamp=request.timestamp,
+            message_index=request.messageIndex,
+            message_content=request.messageContent,
+            answer_id=request.answerId,
+            question=served.get("question"),
+            answer=served.get("answer"),
+            chunk_ids=served.get("chunk_ids", ()),
+        )
+
+        # Stop serving an answer staff marked wrong from the cache
+        if served and request.feedbackType == "negative" and request.feedbackReason == "wrong":
+            if pipeline.cache.evict_answer(served["answer"]):
+                print("🗑️ Cached answer marked wrong, evicted")
         
         # Log feedback for analysis
         feedback_icon = "👍" if request.feedbackType == "positive" else "👎"
@@ -77,28 +219,61 @@ async def submit_feedback(request: FeedbackRequest):
         )
 
 @app.get("/feedback/stats")
-async def get_feedback_stats():
-    """Get aggregated feedback statistics"""
-    if not feedback_store:
-        return {
-            "total": 0,
-            "positive": 0,
-            "negative": 0,
-            "reasons": {}
-        }
-    
-    positive = sum(1 for f in feedback_store if f["feedbackType"] == "positive")
-    negative = sum(1 for f in feedback_store if f["feedbackType"] == "negative")
-    
-    reasons = {}
-    for f in feedback_store:
-        if f["feedbackReason"]:
-            reasons[f["feedbackReason"]] = reasons.get(f["feedbackReason"], 0) + 1
-    
-    return {
-        "total": len(feedback_store),
-        "positive": positive,
-        "negative": negative,
-        "satisfaction_rate": round((positive / len(feedback_store)) * 100, 1) if feedback_store else 0,
-        "reasons": reasons
-    }
\ No newline at end of file
+async def get_feedback_stats(hours: Optional[float] = None, reason: Optional[str] = None):
+    """Get aggregated feedback statistics, optionally for the last `hours` and/or one reason"""
+    since = time.time() - hours * 3600 if hours else None
+    return get_feedback_store().stats(since=since, reason=reason)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Semantic answer cache hit/miss counters"""
+    return (await loader.get()).cache.stats()
+
+@app.get("/intents/stats")
+async def get_intent_stats():
+    """How many questions the intent fast path answered without retrieval or the LLM"""
+    router = (await loader.get()).router
+    return router.stats() if router else {"enabled": False}
+
+@app.get("/context/stats")
+async def get_context_stats():
+    """Prompt tokens sent vs what stuffing every chunk and the last 5 messages would have cost"""
+    return (await loader.get()).context_builder.stats()
+
+@app.get("/sessions/stats")
+async def get_session_stats():
+    """Active server-side conversations and LRU/TTL eviction counters"""
+    return (await loader.get()).sessions.stats()
+
+@app.get("/coalesce/stats")
+async def get_coalesce_stats():
+    """Requests that shared an in-flight answer instead of computing their own"""
+    return (await loader.get()).inflight.stats()
+
+@app.get("/upstream/stats")
+async def get_upstream_stats():
+    """Circuit breaker state of the embedding and LLM upstreams"""
+    pipeline = await loader.get()
+    return {"embeddings": pipeline.embed_breaker.stats(), "llm": pipeline.llm_breaker.stats()}
+
+@app.get("/warmup/stats")
+async def get_warmup_stats():
+    """Pipeline load time, warm-up passes, what they precomputed, and the question log they draw on"""
+    warmup = getattr(app.state, "warmup", None)
+    stats = warmup.stats() if warmup is not None else {"enabled": False}
+    return dict(stats, pipeline=loader.stats())
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """Chat requests being answered, waiting, and turned away (rate limited or overloaded)"""
+    return admission.stats()
+
+@app.get("/feedback/priors")
+async def get_feedback_priors():
+    """Chunks down-weighted in retrieval because of repeated negative feedback"""
+    return (await loader.get()).priors.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format: stage latencies, tokens, cache hit rates, in-flight requests, errors"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,275 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from starlette.responses import StreamingResponse
+from app.services.metrics import REGISTRY
+
+MAX_CONCURRENT = int(os.getenv("RAFIKI_MAX_CONCURRENT", "32"))  # chat requests answered at once
+MAX_QUEUE = int(os.getenv("RAFIKI_MAX_QUEUE", "32"))  # requests allowed to wait for a free slot
+QUEUE_TIMEOUT = float(os.getenv("RAFIKI_QUEUE_TIMEOUT", "2"))  # seconds a request waits before it is turned away
+# What an overloaded server does with the requests it turns away: 'builtin' answers them
+# with the built-in responses, 'reject' sends 503 with Retry-After
+OVERLOAD_MODE = os.getenv("RAFIKI_OVERLOAD", "builtin")
+USER_RATE = float(os.getenv("RAFIKI_USER_RATE", "0.2"))  # sustained requests per second per session; 0 disables
+USER_BURST = int(os.getenv("RAFIKI_USER_BURST", "5"))  # requests a session may send back to back
+# Every request is also limited per client address, more loosely since a whole office
+# can share one address behind NAT; 0 leaves only the per-session limit
+CLIENT_RATE = float(os.getenv("RAFIKI_CLIENT_RATE", "2"))
+CLIENT_BURST = int(os.getenv("RAFIKI_CLIENT_BURST", "30"))
+# Reverse proxies (comma-separated addresses) whose X-Forwarded-For is believed; from
+# anyone else the header is ignored, since a client could send any address it likes
+TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("RAFIKI_TRUSTED_PROXIES", "").split(",") if ip.strip()}
+RATE_LIMIT_KEYS = 10000  # token buckets held; the least recently used are dropped
+SERVICE_TIME_ALPHA = 0.1  # smoothing of the average answer time behind Retry-After
+
+
+class Rejected(Exception):
+    """A request turned away: 429 (rate limited) or 503 (overloaded), with seconds to wait before retrying."""
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    @property
+    def headers(self) -> dict:
+        return {"Retry-After": str(self.retry_after)}
+
+
+class TokenBuckets:
+    """
+    One token bucket per key (session ID or client address): `burst` requests
+    back to back, refilled at `rate` per second. Buckets refill lazily when
+    used; the least recently used are dropped beyond `max_keys` (a dropped
+    key simply starts again with a full bucket).
+    """
+
+    def __init__(self, rate: float = USER_RATE, burst: int = USER_BURST, max_keys: int = RATE_LIMIT_KEYS):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"token bucket needs rate > 0 and burst >= 1, got rate={rate}, burst={burst}")
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Spend one token: 0.0 if allowed, else the seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class Ticket:
+    """An admitted request's slot. release() is idempotent; the request path must call it (see HeldStreamingResponse)."""
+
+    def __init__(self, control):
+        self.control = control
+        self.start = time.perf_counter()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.control._release(self)
+
+
+class HeldStreamingResponse(StreamingResponse):
+    """
+    A streamed chat answer that keeps its admission ticket until the response
+    has been sent, failed, or the client went away, including before the
+    first chunk, when the body generator never even starts.
+    """
+
+    def __init__(self, ticket: Ticket, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.ticket.release()
+
+
+class AdmissionControl:
+    """
+    Bounds the chat work a server takes on. At most `max_concurrent` requests
+    are answered at once; up to `max_queue` more wait for a slot, each for at
+    most `queue_timeout` seconds. Anything beyond that is turned away at once
+    (Rejected 503) instead of piling up LLM calls until everything times out,
+    so admitted requests keep their latency. Before queueing, the request
+    spends a token from each of its rate-limit keys' buckets (see
+    rate_limit_keys; Rejected 429 when any is empty).
+
+    Retry-After for a full server is the queue's expected drain time, from a
+    moving average of how long admitted requests take.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT, max_queue: int = MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT, buckets: dict = None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # key kind ('session' / 'client', see rate_limit_keys) -> TokenBuckets
+        if buckets is None:
+            buckets = {}
+            if USER_RATE > 0:
+                buckets["session"] = TokenBuckets(USER_RATE, USER_BURST)
+            if CLIENT_RATE > 0:
+                buckets["client"] = TokenBuckets(CLIENT_RATE, CLIENT_BURST)
+        self.buckets = buckets
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.service_time = 1.0
+
+        self.admitted = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.queue_timeouts = 0
+
+    def retry_after(self) -> float:
+        return self.service_time * (self.waiting + 1) / max(1, self.max_concurrent)
+
+    async def enter(self, keys: list = ()) -> Ticket:
+        """Wait for a slot; raises Rejected when rate limited or overloaded."""
+        wait = 0.0
+        for key in keys:
+            buckets = self.buckets.get(key.split(":", 1)[0])
+            if buckets is not None:
+                wait = max(wait, buckets.take(key))
+        if wait:
+            self.rate_limited += 1
+            raise Rejected(429, "rate_limited", wait)
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self.queue_full += 1
+                raise Rejected(503, "queue_full", self.retry_after())
+            self.queued += 1
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except TimeoutError:
+                self.queue_timeouts += 1
+                raise Rejected(503, "queue_timeout", self.retry_after())
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.active += 1
+        self.admitted += 1
+        return Ticket(self)
+
+    def _release(self, ticket: Ticket):
+        self.active -= 1
+        self._slots.release()
+        elapsed = time.perf_counter() - ticket.start
+        self.service_time += SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+
+    @asynccontextmanager
+    async def admit(self, keys: list = ()):
+        ticket = await self.enter(keys)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rate_limited": self.rate_limited,
+            "queue_full": self.queue_full,
+            "queue_timeouts": self.queue_timeouts,
+            "avg_service_s": round(self.service_time, 3),
+            "rate_limit_keys": {kind: len(buckets) for kind, buckets in self.buckets.items()},
+        }
+
+
+def client_address(request, trusted_proxies: set = TRUSTED_PROXIES) -> str:
+    """
+    The address a request came from: the TCP peer, unless that is a trusted
+    proxy, in which case the nearest X-Forwarded-For hop that is not itself a
+    trusted proxy (hops further left are client-supplied and not believed).
+    """
+    host = request.client.host if request.client else ""
+    forwarded = request.headers.get("x-forwarded-for")
+    if host not in trusted_proxies or not forwarded:
+        return host
+    for hop in reversed([hop.strip() for hop in forwarded.split(",")]):
+        if hop and hop not in trusted_proxies:
+            return hop
+    return host
+
+
+def rate_limit_keys(request, session_id: str = None, sessions=None) -> list:
+    """
+    Rate-limit keys for a chat request: always its client address, plus the
+    conversation when `sessions` (the pipeline's SessionStore) issued that
+    session ID. A made-up or expired ID gets no bucket of its own, so rotating
+    IDs does not buy fresh tokens.
+    """
+    keys = [f"client:{client_address(request)}"]
+    if session_id and sessions is not None and sessions.issued(session_id):
+        keys.append(f"session:{session_id}")
+    return keys
+
+
+# Process-wide admission control for the chat endpoints, created on first use
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def get_admission() -> AdmissionControl:
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = AdmissionControl()
+        return _admission
+
+
+@REGISTRY.collector
+def admission_metrics() -> dict:
+    """Slots in use, queue depth and turned-away requests, read at scrape time."""
+    if _admission is None:
+        return {}
+    return {
+        ("rafiki_admission_active", ()): _admission.active,
+        ("rafiki_admission_waiting", ()): _admission.waiting,
+        ("rafiki_admission_queued_total", ()): _admission.queued,
+        ("rafiki_admission_rejected_total", (("reason", "rate_limited"),)): _admission.rate_limited,
+        ("rafiki_admission_rejected_total", (("reason", "queue_full"),)): _admission.queue_full,
+        ("rafiki_admission_rejected_total", (("reason", "queue_timeout"),)): _admission.queue_timeouts,
+    }
+
+
+REGISTRY.describe("rafiki_admission_active", "gauge", "Chat requests being answered")
+REGISTRY.describe("rafiki_admission_waiting", "gauge", "Chat requests waiting for a free slot")
+REGISTRY.describe("rafiki_admission_queued_total", "counter", "Chat requests that had to wait for a slot")
+REGISTRY.describe("rafiki_admission_rejected_total", "counter", "Chat requests turned away, by reason")
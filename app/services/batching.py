@@ -0,0 +1,87 @@
+import os
+import asyncio
+
+EMBED_BATCH_WINDOW_MS = float(os.getenv("RAFIKI_EMBED_BATCH_WINDOW_MS", "3"))  # 0 embeds every query on its own
+EMBED_BATCH_SIZE = int(os.getenv("RAFIKI_EMBED_BATCH_SIZE", "32"))  # a full batch is sent without waiting
+
+
+class MicroBatcher:
+    """
+    Dynamic batching for concurrent single-item calls. The first submit() opens
+    a window of `window_ms`; everything submitted until it closes (or until
+    `max_batch` items are waiting) goes out as one `embed_batch(texts)` call,
+    and each caller gets its own vector back. Duplicate texts in a batch are
+    sent once.
+
+    A caller that gives up (timeout, disconnect) only cancels its own wait; the
+    batch still completes for the others. The batch call itself is bounded by
+    `timeout` seconds and, with a `breaker`, runs under that CircuitBreaker, so
+    one failed upstream call counts once however many callers were waiting on it.
+    """
+
+    def __init__(self, embed_batch, window_ms: float = EMBED_BATCH_WINDOW_MS, max_batch: int = EMBED_BATCH_SIZE,
+                 timeout: float = None, breaker=None):
+        self.embed_batch = embed_batch
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.breaker = breaker
+        self._pending = []  # (text, future)
+        self._timer = None
+        self._tasks = set()
+
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+
+    async def submit(self, text: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = [(t, f) for t, f in self._pending if not f.done()], []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.items += len(batch)
+        self.largest = max(self.largest, len(batch))
+        try:
+            if self.breaker is None:
+                vectors = await asyncio.wait_for(self.embed_batch(texts), self.timeout)
+            else:
+                with self.breaker.guard():
+                    vectors = await asyncio.wait_for(self.embed_batch(texts), self.timeout)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest,
+        }
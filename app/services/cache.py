@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CACHE_THRESHOLD = float(os.getenv("RAFIKI_CACHE_THRESHOLD", "0.95"))
+CACHE_TTL = float(os.getenv("RAFIKI_CACHE_TTL", str(6 * 60 * 60)))  # seconds
+CACHE_SIZE = int(os.getenv("RAFIKI_CACHE_SIZE", "512"))  # 0 disables the cache
+
+KB_VERSION_FILE = ".kb_version"
+
+
+def read_kb_version(db_path: str) -> str:
+    """Version stamp written by run_ingestion; changes whenever the knowledge base is rebuilt."""
+    try:
+        with open(os.path.join(db_path, KB_VERSION_FILE)) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def bump_kb_version(db_path: str) -> str:
+    version = str(time.time_ns())
+    os.makedirs(db_path, exist_ok=True)
+    with open(os.path.join(db_path, KB_VERSION_FILE), "w") as f:
+        f.write(version)
+    return version
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on query-embedding similarity.
+
+    A question is a hit when its cosine similarity to a previously answered
+    question is >= threshold and that entry is younger than ttl seconds.
+    Entries live in a fixed-size matrix so a lookup is one matrix-vector
+    product; the least recently used entry is evicted when it is full.
+    """
+
+    def __init__(self, threshold: float = CACHE_THRESHOLD, ttl: float = CACHE_TTL,
+                 max_entries: int = CACHE_SIZE, db_path: str = None):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.kb_version = read_kb_version(db_path) if db_path else ""
+        self._kb_mtime = self._kb_version_mtime()
+
+        self._lock = threading.Lock()
+        self._vectors = None  # (max_entries, dim), allocated on first store
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._entries = OrderedDict()  # slot -> {"question", "answer", "created"}, LRU order
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.rejections = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _kb_version_mtime(self):
+        try:
+            return os.stat(os.path.join(self.db_path, KB_VERSION_FILE)).st_mtime_ns if self.db_path else None
+        except OSError:
+            return None
+
+    def _check_kb_version(self):
+        # Only re-read the stamp when run_ingestion has rewritten it
+        mtime = self._kb_version_mtime()
+        if mtime == self._kb_mtime:
+            return
+        self._kb_mtime = mtime
+        version = read_kb_version(self.db_path)
+        if version != self.kb_version:
+            self.kb_version = version
+            self._clear()
+            print("♻️ Knowledge base changed, answer cache cleared")
+
+    def _best_match(self, v: np.ndarray):
+        if self._vectors is None or not self._entries:
+            return None, -1.0
+        sims = self._vectors @ v
+        sims[~self._valid] = -np.inf
+        slot = int(np.argmax(sims))
+        return slot, float(sims[slot])
+
+    def _drop(self, slot: int):
+        self._valid[slot] = False
+        self._entries.pop(slot, None)
+
+    def _clear(self):
+        self._valid[:] = False
+        self._entries.clear()
+        self.invalidations += 1
+
+    def lookup(self, vector):
+        """Return the cache entry ({"question", "answer", "chunk_ids"}) for a semantically equivalent question, or None."""
+        if not self.enabled:
+            return None
+        v = self._normalize(vector)
+        with self._lock:
+            self._check_kb_version()
+            slot, score = self._best_match(v)
+            if slot is not None and score >= self.threshold:
+                entry = self._entries[slot]
+                if time.monotonic() - entry["created"] <= self.ttl:
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return entry
+                self._drop(slot)
+            self.misses += 1
+            return None
+
+    def store(self, vector, question: str, answer: str, chunk_ids: list = ()):
+        if not self.enabled:
+            return
+        v = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, v.shape[0]), dtype=np.float32)
+
+            slot, score = self._best_match(v)
+            if slot is None or score < self.threshold:
+                free = np.flatnonzero(~self._valid)
+                if len(free):
+                    slot = int(free[0])
+                else:
+                    slot, _ = self._entries.popitem(last=False)
+                    self.evictions += 1
+
+            self._vectors[slot] = v
+            self._valid[slot] = True
+            self._entries[slot] = {"question": question, "answer": answer, "chunk_ids": list(chunk_ids),
+                                   "created": time.monotonic()}
+            self._entries.move_to_end(slot)
+
+    def evict_answer(self, answer: str) -> int:
+        """Drop every entry serving this answer (staff marked it wrong). Returns how many were dropped."""
+        with self._lock:
+            slots = [slot for slot, entry in self._entries.items() if entry["answer"] == answer]
+            for slot in slots:
+                self._drop(slot)
+            self.rejections += len(slots)
+            return len(slots)
+
+    def invalidate(self):
+        """Drop every cached answer (e.g. after the knowledge base is re-ingested)."""
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits / total) * 100, 1) if total else 0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "rejected_by_feedback": self.rejections,
+        }
@@ -1,31 +1,38 @@
 import os
+import json
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
 from langchain_chroma import Chroma
-from langchain_classic.chains import RetrievalQA
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
+from app.services.cache import SemanticCache
+from app.services.coalesce import SingleFlight, flight_key
+from app.services.context import ContextBuilder
+from app.services.embeddings import get_embeddings, resolve_embedding_config
+from app.services.feedback import AnswerLog, ChunkPriors
+from app.services.intents import INTENT_ROUTER, IntentRouter
+from app.services.paths import project_path
+from app.services.sessions import SessionStore
+from app.services.lexical import LexicalRetriever, reciprocal_rank_fusion
+from app.services.metrics import REGISTRY, record_stage, stage
+from app.services.tokens import count_tokens
+from app.services.upstream import LLM_TIMEOUT, CircuitBreaker, CircuitOpenError, openai_client_options, with_idle_timeout
+from app.services.vectorindex import VECTOR_INDEX, VectorIndexRetriever, has_vector_index
 
 load_dotenv()
 
-def get_rafiki_answer(query: str, chat_history: list = []):
-    db_path = "./chroma_db_openai"
-    
-    # 1. Load the existing 'Brain'
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-    vector_db = Chroma(persist_directory=db_path, embedding_function=embeddings)
-    
-    # 2. Initialize the LLM
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.4)
-    
-    # 3. Flatten Chat History for the Prompt
-    # This prevents the 'Missing Key' error by pre-filling the history
-    history_str = ""
-    for msg in chat_history[-5:]: # Keep last 5 messages for context
-        role = "Staff" if msg["role"] == "user" else "Rafiki"
-        history_str += f"{role}: {msg['content']}\n"
-
-    # 4. Define the Personality & Directives
-    template = """You are Rafiki, the friendly and supportive I.T. Assistant for Missions of Hope International (MOHI).
+DB_PATH = os.getenv("RAFIKI_DB_PATH", project_path("chroma_db_openai"))
+CHAT_MODEL = "gpt-4o-mini"
+RETRIEVAL_K = 5
+SYNC_WORKERS = int(os.getenv("RAFIKI_SYNC_WORKERS", "8"))
+HYBRID_SEARCH = os.getenv("RAFIKI_HYBRID_SEARCH", "1") == "1"
+
+# Personality & Directives
+RAFIKI_TEMPLATE = """You are Rafiki, the friendly and supportive I.T. Assistant for Missions of Hope International (MOHI).
     MOHI is a Christ-centered NGO dedicated to transforming impoverished communities in Kenya through holistic ministry.
     Your goal is to help staff with technical issues while reflecting MOHI's values of grace.
 
@@ -36,35 +43,463 @@ def get_rafiki_answer(query: str, chat_history: list = []):
     4. If unknown, suggest contacting the I.T. department at Pangani (Ext 303/304).
 
     CONTEXT: {context}
-    
-    CHAT HISTORY: 
+
+    CHAT HISTORY:
     {chat_history}
 
     STAFF MEMBER: {question}
     RAFIKI:"""
 
-    # Note: chat_history is NOT in input_variables because we 'partial' it
-    RAFIKI_PROMPT = PromptTemplate(
-        template=template, 
-        input_variables=["context", "question"]
-    ).partial(chat_history=history_str)
-
-    # 5. Create the Retrieval Chain
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=vector_db.as_retriever(search_kwargs={"k": 5}),
-        chain_type_kwargs={"prompt": RAFIKI_PROMPT}
-    )
-    
-    # 6. Run the query
-    print(f"🔍 Rafiki is searching for: {query}")
-    response = qa_chain.invoke({"query": query, "question": query})
-    
-    return response["result"]
+
+# Bounded pool for sync-only components (Chroma queries) so they never block the event loop
+_sync_executor = ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix="rafiki-sync")
+
+
+async def run_sync(func, *args):
+    """Run a blocking call on the bounded worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    # Carry the request context over, so stage timings land in this request's breakdown
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_sync_executor, context.run, func, *args)
+
+
+class RafikiPipeline:
+    """
+    Long-lived RAG pipeline: embeddings, the Chroma 'Brain', the LLM client and the
+    prompt are built once and shared by every request. Per-request state (the
+    question and chat history) is passed in as chain input, never baked into the prompt.
+    """
+
+    def __init__(self, embeddings=None, llm=None, db_path: str = DB_PATH, k: int = RETRIEVAL_K, cache=None,
+                 router=None, sessions=None, priors=None):
+        # 1. Load the existing 'Brain'
+        # Query with the same embedding model the collection was built with (see embedding.json).
+        # Each upstream has a circuit breaker: while open, embedding falls back to keyword
+        # search and the LLM to the built-in responses, without waiting for a timeout
+        self.embed_breaker = CircuitBreaker("embeddings")
+        self.llm_breaker = CircuitBreaker("llm")
+        self.embeddings = embeddings or get_embeddings(resolve_embedding_config(db_path), breaker=self.embed_breaker)
+        self.db_path = db_path
+        # RAFIKI_VECTOR_INDEX=mmap searches the read-only export written by run_ingestion instead:
+        # every worker process maps the same files, so vectors are held in memory once per machine
+        self.vector_index = None
+        self.vector_db = None
+        if VECTOR_INDEX == "mmap" and has_vector_index(db_path):
+            self.vector_index = VectorIndexRetriever(db_path)
+        else:
+            if VECTOR_INDEX == "mmap":
+                print(f"⚠ No vector index export in {db_path}, using Chroma (run python -m app.services.vectorindex)")
+            self.vector_db = Chroma(persist_directory=db_path, embedding_function=self.embeddings)
+        self.k = k
+        # BM25 index written next to Chroma by run_ingestion; fused with vector hits by RRF
+        self.lexical = LexicalRetriever(db_path) if HYBRID_SEARCH else None
+
+        # 2. Initialize the LLM on the shared connection pool
+        self.llm = llm or ChatOpenAI(model=CHAT_MODEL, temperature=0.4, **openai_client_options(LLM_TIMEOUT))
+
+        # 3. Prompt -> LLM -> plain text
+        self.prompt = PromptTemplate(
+            template=RAFIKI_TEMPLATE,
+            input_variables=["context", "chat_history", "question"],
+        )
+        self.chain = self.prompt | self.llm | StrOutputParser()
+        # Fills token budgets for chunks and history (RAFIKI_CONTEXT_TOKENS / RAFIKI_HISTORY_TOKENS)
+        self.context_builder = ContextBuilder(RAFIKI_TEMPLATE)
+
+        # 4. Semantic answer cache, cleared whenever run_ingestion rebuilds the 'Brain'
+        self.cache = cache or SemanticCache(db_path=db_path)
+
+        # 5. Curated intents (IT office, lockout, leave) answered without retrieval or the LLM
+        self.router = router or (IntentRouter() if INTENT_ROUTER else None)
+        self.fallback = (self.router or IntentRouter()).fallback
+
+        # 6. Server-side conversations: recent turns + rolling summary per session ID
+        self.sessions = sessions or SessionStore()
+
+        # 7. Identical questions asked at the same moment share one embedding + retrieval + LLM call
+        self.inflight = SingleFlight()
+
+        # 8. Feedback: answers are logged by answer_id, and chunks behind badly rated answers
+        # are down-weighted (the app shares the FeedbackStore's priors)
+        self.answers = AnswerLog()
+        self.priors = priors if priors is not None else ChunkPriors()
+
+        # 9. First-turn questions are counted (when the app attaches a QuestionLog) so the
+        # most frequent ones can be precomputed at startup
+        self.questions = None
+
+    def search(self, query: str, query_vector):
+        """
+        Hybrid retrieval. With no query vector (embedding API down) the lexical index answers alone.
+        Chunks with feedback priors are re-scored, with extra candidates to replace them.
+        """
+        fetch_k = self.k * 2 if self.priors else self.k
+        with stage("lexical"):
+            lexical = self.lexical.documents(query, fetch_k) if self.lexical else []
+        if query_vector is None:
+            ranked = [lexical]
+        else:
+            with stage("chroma"):
+                if self.vector_index is not None:
+                    dense = self.vector_index.documents(query_vector, fetch_k)
+                else:
+                    dense = self.vector_db.similarity_search_by_vector(query_vector, k=fetch_k)
+            ranked = [dense, lexical] if lexical else [dense]
+        if len(ranked) == 1 and not self.priors:
+            return ranked[0]
+        return reciprocal_rank_fusion(ranked, k=self.k, weight=self.priors.weight if self.priors else None)
+
+    def embed_query(self, query: str):
+        try:
+            with stage("embedding"):
+                return self.embeddings.embed_query(query)
+        except Exception as e:
+            return self.embedding_failed(e)
+
+    async def aembed_query(self, query: str):
+        try:
+            with stage("embedding"):
+                return await self.embeddings.aembed_query(query)
+        except Exception as e:
+            return self.embedding_failed(e)
+
+    def embedding_failed(self, error: Exception):
+        if not self.lexical:
+            raise error
+        if not isinstance(error, CircuitOpenError):
+            print(f"⚠ Query embedding failed, using keyword search only: {error!r}")
+        return None
+
+    def retrieve(self, query: str):
+        return self.search(query, self.embed_query(query))
+
+    def build_prompt(self, query: str, docs, chat_history: list, summary: str = ""):
+        with stage("prompt"):
+            prompt = self.context_builder.build(query, docs, chat_history, summary)
+        tokens = prompt.tokens
+        REGISTRY.inc("rafiki_prompt_tokens_total", tokens["prompt"])
+        return prompt
+
+    def chain_inputs(self, query: str, prompt) -> dict:
+        return {
+            "context": prompt.context,
+            "chat_history": prompt.chat_history,
+            "question": query,
+        }
+
+    def routed_answer(self, query: str):
+        if not self.router:
+            return None
+        with stage("routing"):
+            return self.router.route(query)
+
+    def cached_answer(self, query_vector, chat_history: list):
+        # Only first-turn questions are cached: follow-ups depend on the conversation
+        if chat_history or query_vector is None:
+            return None
+        with stage("cache"):
+            return self.cache.lookup(query_vector)
+
+    async def agenerate(self, query: str, prompt) -> str:
+        # The deadline covers the SDK's retries too
+        with self.llm_breaker.guard(), stage("llm"):
+            answer = await asyncio.wait_for(self.chain.ainvoke(self.chain_inputs(query, prompt)), LLM_TIMEOUT)
+        REGISTRY.inc("rafiki_completion_tokens_total", count_tokens(answer))
+        return answer
+
+    def fallback_answer(self, query: str, error: Exception) -> str:
+        """Built-in response for when the LLM failed or its circuit is open."""
+        if not isinstance(error, CircuitOpenError):
+            print(f"⚠ LLM call failed, answering with a built-in response: {error!r}")
+        REGISTRY.inc("rafiki_answers_total", source="fallback")
+        return self.fallback(query)
+
+    def remember(self, query_vector, query: str, chat_history: list, answer: str, docs=()):
+        if not chat_history and query_vector is not None:
+            self.cache.store(query_vector, query, answer, [doc.id for doc in docs])
+
+    def answer(self, query: str, chat_history: list = [], summary: str = "") -> str:
+        print(f"🔍 Rafiki is searching for: {query}")
+        routed = self.routed_answer(query)
+        if routed is not None:
+            return routed.response
+
+        query_vector = self.embed_query(query)
+        cached = self.cached_answer(query_vector, chat_history)
+        if cached is not None:
+            return cached["answer"]
+
+        docs = self.search(query, query_vector)
+        prompt = self.build_prompt(query, docs, chat_history, summary)
+        try:
+            with self.llm_breaker.guard(), stage("llm"):
+                answer = self.chain.invoke(self.chain_inputs(query, prompt))
+        except Exception as e:
+            return self.fallback_answer(query, e)
+        self.remember(query_vector, query, chat_history, answer, prompt.docs)
+        return answer
+
+    def log_question(self, query: str):
+        if self.questions is not None:
+            self.questions.record(query)
+
+    async def warm(self, query: str) -> str:
+        """
+        Precompute a first-turn answer into the semantic cache (startup warm-up).
+        Returns 'routed', 'cached', 'computed' or 'skipped' (nothing cacheable).
+        """
+        if self.router:
+            intent, confidence = self.router.best(query)
+            if confidence >= self.router.thresholds[intent]:
+                return "routed"
+        query_vector = await self.aembed_query(query)
+        if query_vector is None or not self.cache.enabled:
+            return "skipped"
+        if self.cache.lookup(query_vector) is not None:
+            return "cached"
+        docs = await run_sync(self.search, query, query_vector)
+        prompt = self.build_prompt(query, docs, [])
+        answer = await self.agenerate(query, prompt)
+        self.remember(query_vector, query, [], answer, prompt.docs)
+        return "computed"
+
+    async def aretrieve(self, query: str):
+        return await run_sync(self.search, query, await self.aembed_query(query))
+
+    async def aanswer(self, query: str, chat_history: list = [], summary: str = "") -> str:
+        return (await self.areply(query, chat_history, summary))["response"]
+
+    async def areply(self, query: str, chat_history: list = [], summary: str = "") -> dict:
+        """{"response", "answer_id"}; the answer_id ties later feedback to this answer."""
+        result = await self.inflight.do(
+            flight_key(query, chat_history, summary),
+            lambda: self._areply(query, chat_history, summary),
+        )
+        return self.reply(query, result)
+
+    def answered(self, answer: str, chunk_ids=(), source: str = "llm") -> dict:
+        """One computed answer; coalesced requests share it, and reply() gives each its own answer_id."""
+        REGISTRY.inc("rafiki_answers_total", source=source)
+        return {"response": answer, "chunk_ids": list(chunk_ids)}
+
+    def reply(self, query: str, result: dict) -> dict:
+        """
+        {"response", "answer_id"} for one request. The answer_id is minted per
+        request, outside the in-flight computation, so staff who were served the
+        same coalesced answer rate it separately. Built-in fallbacks (chunk_ids
+        None) get none: they are not rated or cached.
+        """
+        if result["chunk_ids"] is None:
+            return {"response": result["response"], "answer_id": None}
+        return {"response": result["response"],
+                "answer_id": self.answers.add(query, result["response"], result["chunk_ids"])}
+
+    async def _areply(self, query: str, chat_history: list, summary: str) -> dict:
+        print(f"🔍 Rafiki is searching for: {query}")
+        routed = self.routed_answer(query)
+        if routed is not None:
+            return self.answered(routed.response, source="intent")
+
+        # The embedding client is natively async; Chroma only has a sync client, so the
+        # vector search runs on the bounded pool
+        query_vector = await self.aembed_query(query)
+        cached = self.cached_answer(query_vector, chat_history)
+        if cached is not None:
+            return self.answered(cached["answer"], cached["chunk_ids"], source="cache")
+
+        docs = await run_sync(self.search, query, query_vector)
+        prompt = self.build_prompt(query, docs, chat_history, summary)
+        try:
+            answer = await self.agenerate(query, prompt)
+        except Exception as e:
+            # No answer_id: built-in responses are not rated or cached
+            return {"response": self.fallback_answer(query, e), "chunk_ids": None}
+        self.remember(query_vector, query, chat_history, answer, prompt.docs)
+        return self.answered(answer, [doc.id for doc in prompt.docs])
+
+    async def astream(self, query: str, chat_history: list = [], summary: str = ""):
+        """
+        Yield (event, data) pairs: retrieval metadata first, then each LLM token
+        as it is generated, then a final 'done' event carrying the full answer.
+        Concurrent identical requests subscribe to the same token stream.
+        """
+        async for event, data in self.inflight.stream(
+            flight_key(query, chat_history, summary),
+            lambda: self._astream(query, chat_history, summary),
+        ):
+            # Subscribers share the 'done' answer; each gets its own answer_id
+            yield event, self.reply(query, data) if event == "done" else data
+
+    async def _astream(self, query: str, chat_history: list, summary: str):
+        print(f"🔍 Rafiki is streaming an answer for: {query}")
+        routed = self.routed_answer(query)
+        if routed is not None:
+            yield "metadata", {"sources": [], "intent": routed.intent}
+            yield "token", {"content": routed.response}
+            yield "done", self.answered(routed.response, source="intent")
+            return
+
+        query_vector = await self.aembed_query(query)
+        cached = self.cached_answer(query_vector, chat_history)
+        if cached is not None:
+            yield "metadata", {"sources": [], "cached": True}
+            yield "token", {"content": cached["answer"]}
+            yield "done", self.answered(cached["answer"], cached["chunk_ids"], source="cache")
+            return
+
+        docs = await run_sync(self.search, query, query_vector)
+        prompt = self.build_prompt(query, docs, chat_history, summary)
+        yield "metadata", {"sources": [doc.metadata.get("source") for doc in prompt.docs], "tokens": prompt.tokens}
+
+        tokens = []
+        start = time.perf_counter()
+        try:
+            # LLM_TIMEOUT bounds the wait for the first token and every gap after it
+            with self.llm_breaker.guard():
+                async for token in with_idle_timeout(self.chain.astream(self.chain_inputs(query, prompt)),
+                                                     LLM_TIMEOUT):
+                    if not tokens:
+                        record_stage("llm_first_token", time.perf_counter() - start)
+                    tokens.append(token)
+                    yield "token", {"content": token}
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                REGISTRY.inc("rafiki_errors_total", stage="llm")
+                record_stage("llm", time.perf_counter() - start)
+            if tokens:
+                raise
+            # Nothing sent yet: the built-in response still makes a complete answer
+            fallback = self.fallback_answer(query, e)
+            yield "token", {"content": fallback}
+            yield "done", {"response": fallback, "chunk_ids": None}
+            return
+        record_stage("llm", time.perf_counter() - start)
+        answer = "".join(tokens)
+        REGISTRY.inc("rafiki_completion_tokens_total", count_tokens(answer))
+        self.remember(query_vector, query, chat_history, answer, prompt.docs)
+        yield "done", self.answered(answer, [doc.id for doc in prompt.docs])
+
+
+def sse_frame(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Process-wide pipeline, created once (normally in the FastAPI lifespan)
+_pipeline = None
+
+
+def init_pipeline(**kwargs) -> RafikiPipeline:
+    """Build the shared pipeline. Keyword arguments are forwarded to RafikiPipeline."""
+    global _pipeline
+    _pipeline = RafikiPipeline(**kwargs)
+    return _pipeline
+
+
+def get_pipeline() -> RafikiPipeline:
+    """Return the shared pipeline, building it on first use if the lifespan hasn't."""
+    if _pipeline is None:
+        return init_pipeline()
+    return _pipeline
+
+
+@REGISTRY.collector
+def pipeline_metrics() -> dict:
+    """Cache, intent, coalescing and session counters of the shared pipeline, read at scrape time."""
+    if _pipeline is None:
+        return {}
+    cache = _pipeline.cache.stats()
+    metrics = {
+        ("rafiki_semantic_cache_hits_total", ()): cache["hits"],
+        ("rafiki_semantic_cache_misses_total", ()): cache["misses"],
+        ("rafiki_semantic_cache_entries", ()): cache["entries"],
+        ("rafiki_coalesced_requests_total", ()): _pipeline.inflight.coalesced,
+        ("rafiki_computed_requests_total", ()): _pipeline.inflight.leaders,
+        ("rafiki_sessions_active", ()): _pipeline.sessions.stats()["active"],
+    }
+    for breaker in (_pipeline.embed_breaker, _pipeline.llm_breaker):
+        labels = (("upstream", breaker.name),)
+        metrics[("rafiki_circuit_open", labels)] = int(breaker.state != "closed")
+        metrics[("rafiki_circuit_short_circuited_total", labels)] = breaker.short_circuited
+    if _pipeline.router:
+        metrics[("rafiki_intent_routed_total", ())] = _pipeline.router.routed
+        metrics[("rafiki_intent_passed_total", ())] = _pipeline.router.passed
+    embedding_stats = getattr(_pipeline.embeddings, "stats", None)
+    if embedding_stats:
+        embeddings = embedding_stats()
+        for tier in ("memory", "disk"):
+            metrics[("rafiki_embedding_cache_hits_total", (("tier", tier),))] = embeddings[f"{tier}_hits"]
+        metrics[("rafiki_embedding_cache_misses_total", ())] = embeddings["misses"]
+        if embeddings.get("batching"):
+            metrics[("rafiki_embedding_batches_total", ())] = embeddings["batching"]["batches"]
+            metrics[("rafiki_embedding_batched_queries_total", ())] = embeddings["batching"]["items"]
+    return metrics
+
+
+REGISTRY.describe("rafiki_semantic_cache_hits_total", "counter", "Semantic answer cache hits")
+REGISTRY.describe("rafiki_semantic_cache_misses_total", "counter", "Semantic answer cache misses")
+REGISTRY.describe("rafiki_semantic_cache_entries", "gauge", "Answers in the semantic cache")
+REGISTRY.describe("rafiki_coalesced_requests_total", "counter", "Requests that shared an in-flight answer")
+REGISTRY.describe("rafiki_computed_requests_total", "counter", "Requests that computed their own answer")
+REGISTRY.describe("rafiki_sessions_active", "gauge", "Server-side conversations held")
+REGISTRY.describe("rafiki_circuit_open", "gauge", "1 while an upstream's circuit breaker is open or half-open")
+REGISTRY.describe("rafiki_circuit_short_circuited_total", "counter", "Calls answered by the fallback without trying the upstream")
+REGISTRY.describe("rafiki_intent_routed_total", "counter", "Questions answered by the intent fast path")
+REGISTRY.describe("rafiki_intent_passed_total", "counter", "Questions passed on to retrieval")
+REGISTRY.describe("rafiki_embedding_cache_hits_total", "counter", "Query embedding cache hits by tier")
+REGISTRY.describe("rafiki_embedding_cache_misses_total", "counter", "Query embeddings computed by the model")
+REGISTRY.describe("rafiki_embedding_batches_total", "counter", "Batched embedding calls made for query misses")
+REGISTRY.describe("rafiki_embedding_batched_queries_total", "counter", "Query embeddings sent in those batches")
+
+
+def get_rafiki_answer(query: str, chat_history: list = []):
+    return get_pipeline().answer(query, chat_history=chat_history)
+
+
+async def aget_rafiki_answer(query: str, chat_history: list = []):
+    """Async variant of get_rafiki_answer for use inside FastAPI handlers."""
+    return await get_pipeline().aanswer(query, chat_history=chat_history)
+
+
+async def achat(query: str, session_id: str = None, chat_history: list = None) -> dict:
+    """
+    Answer within a server-side session: the client sends only the new message
+    and the session_id from its previous reply. Clients that still send their
+    own history are answered statelessly from it, as before.
+    """
+    pipeline = get_pipeline()
+    if chat_history:
+        return dict(await pipeline.areply(query, chat_history=chat_history), session_id=None)
+
+    session = pipeline.sessions.get(session_id)
+    if not session.recent:
+        pipeline.log_question(query)
+    reply = await pipeline.areply(query, chat_history=list(session.recent), summary=session.summary)
+    pipeline.sessions.append(session, query, reply["response"])
+    return dict(reply, session_id=session.id)
+
+
+async def stream_rafiki_answer(query: str, chat_history: list = [], session_id: str = None):
+    """SSE-encoded token stream for the /chat/stream endpoints; the metadata frame carries the session_id."""
+    pipeline = get_pipeline()
+    if chat_history:
+        async for event, data in pipeline.astream(query, chat_history=chat_history):
+            yield sse_frame(event, data)
+        return
+
+    session = pipeline.sessions.get(session_id)
+    if not session.recent:
+        pipeline.log_question(query)
+    async for event, data in pipeline.astream(query, chat_history=list(session.recent), summary=session.summary):
+        if event == "metadata":
+            data = dict(data, session_id=session.id)
+        elif event == "done":
+            pipeline.sessions.append(session, query, data["response"])
+        yield sse_frame(event, data)
+
 
 if __name__ == "__main__":
     # Internal Test Run
     user_query = "How many centers do we have in Nairobi?"
     answer = get_rafiki_answer(user_query, chat_history=[])
-    print(f"\n🤖 Rafiki IT: {answer}")
\ No newline at end of file
+    print(f"\n🤖 Rafiki IT: {answer}")
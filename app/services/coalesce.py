@@ -0,0 +1,110 @@
+import re
+import json
+import asyncio
+import hashlib
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """'Portal down?? How do I reset my password!' -> 'portal down how do i reset my password'"""
+    return _SPACE.sub(" ", _PUNCTUATION.sub(" ", text.lower())).strip()
+
+
+def flight_key(query: str, chat_history: list = (), summary: str = "") -> str:
+    """Requests share a computation only when the question and everything else in the prompt match."""
+    context = json.dumps([list(chat_history), summary], sort_keys=True)
+    return hashlib.sha256(f"{normalize_question(query)}\0{context}".encode("utf-8")).hexdigest()
+
+
+class Broadcast:
+    """Replays one async generator's items to any number of subscribers, late joiners included."""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def run(self, source):
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self):
+        i = 0
+        while True:
+            while i < len(self.items):
+                yield self.items[i]
+                i += 1
+            # Grab the event before checking `done`; nothing can run in between
+            changed = self._changed
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical requests: the first caller for a key runs the
+    computation as a task, and callers arriving while it is in flight await the
+    same task (or replay the same token stream) instead of starting their own.
+    The task outlives a caller that disconnects, so the others still get the answer.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _track(self, table: dict, key: str, entry, task: asyncio.Task):
+        table[key] = entry
+        task.add_done_callback(lambda _: table.pop(key, None))
+
+    async def do(self, key: str, func):
+        """Await func() once per key among concurrent callers."""
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(func())
+            self._track(self._calls, key, task, task)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def stream(self, key: str, source_factory):
+        """Iterate source_factory() once per key among concurrent callers; everyone sees every item."""
+        entry = self._streams.get(key)
+        if entry is None:
+            self.leaders += 1
+            broadcast = Broadcast()
+            task = asyncio.ensure_future(broadcast.run(source_factory()))
+            self._track(self._streams, key, broadcast, task)
+        else:
+            self.coalesced += 1
+            broadcast = entry
+        async for item in broadcast.subscribe():
+            yield item
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "computed": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round((self.coalesced / total) * 100, 1) if total else 0,
+        }
@@ -0,0 +1,197 @@
+import os
+import re
+import threading
+
+from app.services.tokens import count_tokens
+
+CONTEXT_TOKENS = int(os.getenv("RAFIKI_CONTEXT_TOKENS", "1000"))  # budget for retrieved chunks
+HISTORY_TOKENS = int(os.getenv("RAFIKI_HISTORY_TOKENS", "400"))  # budget for recent turns + summary
+DEDUP_THRESHOLD = float(os.getenv("RAFIKI_DEDUP_THRESHOLD", "0.8"))  # word-shingle Jaccard
+# Messages kept verbatim (budget permitting), in whole exchanges; older ones are summarised.
+# Sessions keep the same window (sessions.RECENT_MESSAGES)
+HISTORY_MESSAGES = 6
+MAX_OVERLAP = 400  # search window for the splitter's chunk overlap (CHUNK_OVERLAP is 150)
+SUMMARY_QUESTION_TOKENS = 20  # per earlier question in the history summary
+
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 3) -> set:
+    words = _WORD.findall(text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def strip_overlap(previous: str, text: str) -> str:
+    """
+    Drop the head of text that repeats the tail of previous, i.e. the overlap
+    RecursiveCharacterTextSplitter leaves between neighbouring chunks.
+    """
+    probe = text[:40]
+    if len(probe) < 40:
+        return text
+    start = previous.rfind(probe, max(0, len(previous) - MAX_OVERLAP))
+    if start >= 0 and text.startswith(previous[start:]):
+        return text[len(previous) - start:].lstrip()
+    return text
+
+
+def format_turn(msg: dict) -> str:
+    role = "Staff" if msg["role"] == "user" else "Rafiki"
+    return f"{role}: {msg['content']}\n"
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    tokens = count_tokens(text)
+    if tokens <= budget:
+        return text
+    return text[:max(0, len(text) * budget // tokens)].rsplit(" ", 1)[0] + " …"
+
+
+class PromptContext:
+    """What goes into the prompt for one request, with its token accounting."""
+
+    def __init__(self, context: str, chat_history: str, docs: list, tokens: dict):
+        self.context = context
+        self.chat_history = chat_history
+        self.docs = docs
+        self.tokens = tokens
+
+
+class ContextBuilder:
+    """
+    Fill fixed token budgets instead of stuffing every retrieved chunk and the
+    last N messages into the prompt:
+
+    - chunks are taken in retrieval-score order while they fit CONTEXT_TOKENS;
+      near-duplicates are dropped and the splitter's overlap with a chunk that
+      is already in the context is cut off;
+    - the newest history turns are kept verbatim while they fit HISTORY_TOKENS,
+      and older turns collapse into a one-line summary of what was asked.
+    """
+
+    def __init__(self, template: str = "", context_tokens: int = CONTEXT_TOKENS,
+                 history_tokens: int = HISTORY_TOKENS, dedup_threshold: float = DEDUP_THRESHOLD):
+        self.template_tokens = count_tokens(template)
+        self.context_tokens = context_tokens
+        self.history_tokens = history_tokens
+        self.dedup_threshold = dedup_threshold
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.raw_prompt_tokens = 0
+
+    def select_chunks(self, docs: list):
+        """Returns (texts, docs used, duplicates dropped, chunks over budget)."""
+        texts, used, seen = [], [], []
+        duplicates = over_budget = 0
+        remaining = self.context_tokens
+
+        for doc in docs:
+            text = doc.page_content
+            fingerprint = shingles(text)
+            if any(jaccard(fingerprint, other) >= self.dedup_threshold for other in seen):
+                duplicates += 1
+                continue
+            for previous in texts:
+                text = strip_overlap(previous, text)
+
+            tokens = count_tokens(text)
+            if tokens > remaining:
+                if texts:
+                    over_budget += 1
+                    continue
+                # Never send an empty context: cut the best chunk down to the budget
+                text = truncate_to_tokens(text, remaining)
+                tokens = count_tokens(text)
+
+            texts.append(text)
+            used.append(doc)
+            seen.append(fingerprint)
+            remaining -= tokens
+        return texts, used, duplicates, over_budget
+
+    def select_history(self, chat_history: list, summary: str = ""):
+        """
+        Returns (transcript, messages kept verbatim, messages summarised). The
+        newest whole exchanges that fit HISTORY_MESSAGES and the token budget are
+        kept verbatim. summary is a session's rolling summary of everything before
+        chat_history; the questions of messages trimmed here are added to it (or,
+        without one, summarised on their own), so nothing is silently dropped.
+        """
+        lines = []
+        remaining = self.history_tokens
+        recent = chat_history[-HISTORY_MESSAGES:]
+        kept = []
+        for msg in reversed(recent):
+            line = format_turn(msg)
+            tokens = count_tokens(line)
+            if tokens > remaining:
+                break
+            lines.append(line)
+            kept.append(msg)
+            remaining -= tokens
+        # An answer whose question didn't fit goes with its question
+        while kept and kept[-1]["role"] != "user":
+            kept.pop()
+            remaining += count_tokens(lines.pop())
+        lines.reverse()
+
+        older = chat_history[:len(chat_history) - len(kept)]
+        asked = [
+            truncate_to_tokens(msg["content"].strip().split("\n")[0], SUMMARY_QUESTION_TOKENS)
+            for msg in older if msg["role"] == "user"
+        ]
+        asked = [a for a in asked if a]
+        if asked:
+            earlier = "the staff member asked: " + "; ".join(asked)
+            summary = f"{summary} | then {earlier}" if summary else earlier
+        if summary and remaining > SUMMARY_QUESTION_TOKENS:
+            line = truncate_to_tokens(f"(Earlier in this chat: {summary})", remaining) + "\n"
+            lines.insert(0, line)
+        return "".join(lines), len(kept), len(older)
+
+    def build(self, query: str, docs: list, chat_history: list, summary: str = "") -> PromptContext:
+        texts, used, duplicates, over_budget = self.select_chunks(docs)
+        context = "\n\n".join(texts)
+        history, kept, summarised = self.select_history(chat_history, summary)
+
+        tokens = {
+            "template": self.template_tokens,
+            "question": count_tokens(query),
+            "context": count_tokens(context),
+            "history": count_tokens(history),
+            "chunks_used": len(used),
+            "chunks_duplicate": duplicates,
+            "chunks_over_budget": over_budget,
+            "history_turns": kept,
+            "history_summarised": summarised,
+        }
+        tokens["prompt"] = tokens["template"] + tokens["question"] + tokens["context"] + tokens["history"]
+        # What the old "stuff every chunk + last 5 messages" prompt would have cost
+        tokens["unbudgeted"] = (
+            tokens["template"] + tokens["question"]
+            + count_tokens("\n\n".join(doc.page_content for doc in docs))
+            + sum(count_tokens(format_turn(msg)) for msg in chat_history[-5:])
+        )
+
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += tokens["prompt"]
+            self.raw_prompt_tokens += tokens["unbudgeted"]
+        return PromptContext(context, history, used, tokens)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "context_budget": self.context_tokens,
+            "history_budget": self.history_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "unbudgeted_prompt_tokens": self.raw_prompt_tokens,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.requests, 1) if self.requests else 0,
+            "tokens_saved": self.raw_prompt_tokens - self.prompt_tokens,
+        }
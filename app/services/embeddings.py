@@ -0,0 +1,333 @@
+import os
+import json
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from app.services.batching import EMBED_BATCH_WINDOW_MS, MicroBatcher
+from app.services.paths import project_path
+from app.services.upstream import BATCH_TIMEOUT, EMBED_TIMEOUT, openai_client_options
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_BACKEND = os.getenv("RAFIKI_EMBEDDING_BACKEND", "openai")  # 'openai' or 'onnx'
+ONNX_MODEL = os.getenv("RAFIKI_ONNX_MODEL", "sentence-transformers/all-MiniLM-L6-v2")  # hub repo or local dir
+ONNX_THREADS = int(os.getenv("RAFIKI_ONNX_THREADS", "0"))  # 0 lets onnxruntime decide
+ONNX_BATCH_SIZE = int(os.getenv("RAFIKI_ONNX_BATCH_SIZE", "32"))
+ONNX_MAX_LENGTH = 256
+EMBEDDING_CONFIG_FILE = "embedding.json"
+CHROMA_DB_FILE = "chroma.sqlite3"  # present once a collection has been written
+EMBED_CACHE_PATH = os.getenv("RAFIKI_EMBED_CACHE", project_path("embedding_cache.sqlite3"))
+EMBED_MEMORY_SIZE = int(os.getenv("RAFIKI_EMBED_MEMORY_SIZE", "4096"))
+
+
+class EmbeddingStore:
+    """On-disk SQLite table of float32 vectors keyed by (model, text) hash."""
+
+    def __init__(self, path: str = EMBED_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: dict):
+        if not items:
+            return
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wrap an embedding model with a two-tier cache: an in-memory LRU in front of
+    an EmbeddingStore on disk. Keys are sha256(model name + text), so the query
+    path and the ingestion path share vectors and only ever-unseen text reaches
+    the underlying model.
+
+    With a `breaker` (the query path), query misses that reach the model run
+    under that CircuitBreaker and must finish within `query_timeout` seconds.
+    With a `batcher`, async query misses from concurrent requests are sent to
+    the model together (see MicroBatcher), and the batcher's breaker records
+    one outcome per batch instead.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str = None, store: EmbeddingStore = None,
+                 memory_size: int = EMBED_MEMORY_SIZE, breaker=None, query_timeout: float = EMBED_TIMEOUT,
+                 batcher: MicroBatcher = None):
+        self.embeddings = embeddings
+        self.breaker = breaker
+        self.query_timeout = query_timeout
+        self.batcher = batcher
+        self.model_name = model_name or getattr(embeddings, "model", type(embeddings).__name__)
+        self.store = store if store is not None else EmbeddingStore()
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _from_memory(self, texts: list):
+        keys = [self.key(t) for t in texts]
+        vectors = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    vectors[i] = self._memory[key]
+                    self.memory_hits += 1
+        return keys, vectors
+
+    def _from_disk(self, texts: list, keys: list, vectors: list):
+        cold = list({keys[i] for i, v in enumerate(vectors) if v is None})
+        from_disk = self.store.get_many(cold) if cold else {}
+        missing = {}
+        for i, key in enumerate(keys):
+            if vectors[i] is not None:
+                continue
+            if key in from_disk:
+                vectors[i] = from_disk[key]
+                self.disk_hits += 1
+                self._remember(key, vectors[i])
+            else:
+                missing[key] = texts[i]
+        return keys, vectors, missing
+
+    def _lookup(self, texts: list):
+        """Return (keys, vectors with None for misses, {key: text} still to embed)."""
+        keys, vectors = self._from_memory(texts)
+        return self._from_disk(texts, keys, vectors)
+
+    async def _alookup(self, texts: list):
+        """_lookup with the SQLite read in a worker thread; memory hits never leave the event loop."""
+        keys, vectors = self._from_memory(texts)
+        if all(v is not None for v in vectors):
+            return keys, vectors, {}
+        return await asyncio.to_thread(self._from_disk, texts, keys, vectors)
+
+    def _merge(self, keys, vectors, new: dict):
+        self.misses += len(new)
+        for key, vector in new.items():
+            self._remember(key, vector)
+        return [v if v is not None else new[k] for k, v in zip(keys, vectors)]
+
+    def _fill(self, keys, vectors, missing: dict, embedded: list):
+        new = dict(zip(missing.keys(), embedded))
+        self.store.put_many(new)
+        return self._merge(keys, vectors, new)
+
+    async def _afill(self, keys, vectors, missing: dict, embedded: list):
+        new = dict(zip(missing.keys(), embedded))
+        await asyncio.to_thread(self.store.put_many, new)
+        return self._merge(keys, vectors, new)
+
+    def embed_documents(self, texts: list) -> list:
+        keys, vectors, missing = self._lookup(texts)
+        embedded = self.embeddings.embed_documents(list(missing.values())) if missing else []
+        return self._fill(keys, vectors, missing, embedded)
+
+    def embed_query(self, text: str) -> list:
+        keys, vectors, missing = self._lookup([text])
+        if not missing:
+            return vectors[0]
+        if self.breaker is None:
+            return self._fill(keys, vectors, missing, [self.embeddings.embed_query(text)])[0]
+        with self.breaker.guard():
+            embedded = [self.embeddings.embed_query(text)]
+        return self._fill(keys, vectors, missing, embedded)[0]
+
+    async def aembed_documents(self, texts: list) -> list:
+        keys, vectors, missing = await self._alookup(texts)
+        embedded = await self.embeddings.aembed_documents(list(missing.values())) if missing else []
+        return await self._afill(keys, vectors, missing, embedded)
+
+    async def aembed_query(self, text: str) -> list:
+        keys, vectors, missing = await self._alookup([text])
+        if not missing:
+            return vectors[0]
+        if self.batcher is not None:
+            embedded = [await asyncio.wait_for(self.batcher.submit(text), self.query_timeout)]
+        elif self.breaker is None:
+            embedded = [await self.embeddings.aembed_query(text)]
+        else:
+            with self.breaker.guard():
+                embedded = [await asyncio.wait_for(self.embeddings.aembed_query(text), self.query_timeout)]
+        return (await self._afill(keys, vectors, missing, embedded))[0]
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "batching": self.batcher.stats() if self.batcher is not None else None,
+        }
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-embedding model run locally on CPU with onnxruntime: batched
+    inference, mean pooling over the attention mask, L2-normalised output.
+    The model (an `onnx/model.onnx` + `tokenizer.json` layout, as published
+    for sentence-transformers models) is loaded once, at construction.
+    """
+
+    def __init__(self, model: str = ONNX_MODEL, threads: int = ONNX_THREADS,
+                 batch_size: int = ONNX_BATCH_SIZE, max_length: int = ONNX_MAX_LENGTH):
+        # Optional dependencies: only needed when the onnx backend is selected
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model = model
+        self.batch_size = batch_size
+        model_dir = model if os.path.isdir(model) else self._download(model)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        onnx_path = os.path.join(model_dir, "onnx", "model.onnx")
+        if not os.path.exists(onnx_path):
+            onnx_path = os.path.join(model_dir, "model.onnx")
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def _download(repo_id: str) -> str:
+        from huggingface_hub import snapshot_download
+        return snapshot_download(repo_id, allow_patterns=["onnx/model.onnx", "tokenizer.json", "config.json"])
+
+    def _embed_batch(self, texts: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]  # (batch, tokens, dim)
+
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: list) -> list:
+        vectors = [self._embed_batch(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> list:
+        return self._embed_batch([text])[0].tolist()
+
+
+def read_embedding_config(db_path: str):
+    """The {"backend", "model"} a collection was built with, or None for a new/legacy collection."""
+    try:
+        with open(os.path.join(db_path, EMBEDDING_CONFIG_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_embedding_config(db_path: str, config: dict):
+    os.makedirs(db_path, exist_ok=True)
+    with open(os.path.join(db_path, EMBEDDING_CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def collection_embedding_config(db_path: str):
+    """
+    What an existing collection was built with: its embedding.json, or OpenAI
+    for a legacy collection written before embedding.json existed. None when
+    there is no collection yet.
+    """
+    stored = read_embedding_config(db_path)
+    if stored is None and os.path.exists(os.path.join(db_path, CHROMA_DB_FILE)):
+        return {"backend": "openai", "model": EMBEDDING_MODEL}
+    return stored
+
+
+def resolve_embedding_config(db_path: str = None, backend: str = None) -> dict:
+    """
+    Pick the embedding model for a collection: an explicit backend wins, then
+    whatever the collection was built with, then RAFIKI_EMBEDDING_BACKEND
+    (only for a new collection).
+    """
+    stored = collection_embedding_config(db_path) if db_path else None
+    backend = backend or (stored or {}).get("backend") or EMBEDDING_BACKEND
+    if backend == "openai":
+        return {"backend": "openai", "model": EMBEDDING_MODEL}
+    if backend == "onnx":
+        model = stored["model"] if stored and stored.get("backend") == "onnx" else ONNX_MODEL
+        return {"backend": "onnx", "model": model}
+    raise ValueError(f"Unknown embedding backend '{backend}' (expected 'openai' or 'onnx')")
+
+
+def get_embeddings(config: dict = None, breaker=None, max_retries: int = None) -> CachedEmbeddings:
+    """
+    The embedding model shared by ingestion and the query path, behind the
+    persistent cache. The query path passes a CircuitBreaker (see CachedEmbeddings)
+    and gets its concurrent query embeddings micro-batched (RAFIKI_EMBED_BATCH_WINDOW_MS).
+    `max_retries` overrides the OpenAI SDK's own retries (RAFIKI_UPSTREAM_RETRIES);
+    ingestion passes 0 so its RateLimiter sees every 429.
+    """
+    config = config or resolve_embedding_config()
+    if config["backend"] == "onnx":
+        model = OnnxEmbeddings(config["model"])
+        # The full hub id or local path: two local models in same-named directories must not share vectors
+        model_id = config["model"]
+        model_name = f"onnx:{os.path.abspath(model_id) if os.path.isdir(model_id) else model_id}"
+    else:
+        # Send text rather than client-side tiktoken ids: chunks are far below the model's
+        # context limit, and it spares the per-call encode (and tiktoken's first-use download)
+        options = openai_client_options(BATCH_TIMEOUT)
+        if max_retries is not None:
+            options["max_retries"] = max_retries
+        model = OpenAIEmbeddings(model=config["model"], check_embedding_ctx_length=False, **options)
+        model_name = config["model"]
+    batcher = None
+    if breaker is not None and EMBED_BATCH_WINDOW_MS > 0:
+        batcher = MicroBatcher(model.aembed_documents, timeout=EMBED_TIMEOUT, breaker=breaker)
+    return CachedEmbeddings(model, model_name=model_name, breaker=breaker, batcher=batcher)
@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from app.services.paths import project_path
+
+FEEDBACK_DB = os.getenv("RAFIKI_FEEDBACK_DB", project_path("feedback.sqlite3"))
+FEEDBACK_BATCH = int(os.getenv("RAFIKI_FEEDBACK_BATCH", "1000"))  # rows per write transaction
+FEEDBACK_FLUSH_INTERVAL = 0.25  # seconds a partial batch may wait
+BUCKET_SECONDS = 3600  # time-window filters resolve to the hour
+ANSWER_LOG_SIZE = int(os.getenv("RAFIKI_ANSWER_LOG_SIZE", "10000"))  # answers that can still receive feedback
+NEGATIVE_REASONS = {"wrong", "confused"}  # reasons that blame the retrieved chunks
+PRIOR_MIN_NEGATIVE = 3  # a chunk is down-weighted only once this many distinct answers were rated down
+PRIOR_FLOOR = 0.25  # lowest retrieval weight a chunk can be given
+
+
+def hour_bucket(ts: float) -> int:
+    return int(ts // BUCKET_SECONDS)
+
+
+class AnswerLog:
+    """Recently served answers by answer_id, so feedback can be traced back to the question, chunks and answer."""
+
+    def __init__(self, max_entries: int = ANSWER_LOG_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, question: str, answer: str, chunk_ids: list = ()) -> str:
+        answer_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[answer_id] = {"question": question, "answer": answer, "chunk_ids": list(chunk_ids)}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return answer_id
+
+    def get(self, answer_id: str):
+        with self._lock:
+            return self._entries.get(answer_id)
+
+
+class ChunkPriors:
+    """
+    Retrieval weights learned from feedback. Each rated answer casts one vote,
+    its latest rating, on the chunks it was built from; per chunk, the answers
+    voting (negative, positive) are counted. Only chunks blamed by at least
+    PRIOR_MIN_NEGATIVE distinct answers get a weight below 1, the
+    Laplace-smoothed share of positive votes, floored at PRIOR_FLOOR. Repeated
+    clicks on one answer can't down-weight anything on their own.
+    """
+
+    def __init__(self):
+        self._counts = {}  # chunk id -> [negative, positive]
+        self._votes = {}  # answer id -> (negative, chunk ids)
+        self.weights = {}  # chunk id -> weight, only for down-weighted chunks
+        self._lock = threading.Lock()
+
+    def vote(self, answer_id: str, chunk_ids, negative):
+        """Set answer_id's vote (negative True/False, or None for no vote), replacing any earlier one."""
+        with self._lock:
+            previous = self._votes.pop(answer_id, None)
+            if previous is not None:
+                self._apply(previous[1], previous[0], -1)
+                # A re-rating after the answer left the AnswerLog arrives without its chunks
+                chunk_ids = chunk_ids or previous[1]
+            if negative is not None and chunk_ids:
+                self._votes[answer_id] = (negative, tuple(chunk_ids))
+                self._apply(chunk_ids, negative, 1)
+
+    def _apply(self, chunk_ids, negative: bool, n: int):
+        for chunk_id in chunk_ids:
+            counts = self._counts.setdefault(chunk_id, [0, 0])
+            counts[0 if negative else 1] += n
+            bad, good = counts
+            if not bad and not good:
+                del self._counts[chunk_id]
+            if bad >= PRIOR_MIN_NEGATIVE:
+                self.weights[chunk_id] = max(PRIOR_FLOOR, min(1.0, (good + 1) / (bad + good + 1)))
+            else:
+                self.weights.pop(chunk_id, None)
+
+    def weight(self, chunk_id: str) -> float:
+        return self.weights.get(chunk_id, 1.0)
+
+    def __bool__(self):
+        return bool(self.weights)
+
+    def stats(self) -> dict:
+        return {"chunks_with_feedback": len(self._counts), "down_weighted": len(self.weights)}
+
+
+class FeedbackStore:
+    """
+    Durable feedback log with counters kept up to date as feedback arrives.
+
+    record() only enqueues: a background writer drains the queue and inserts
+    in batches (one WAL transaction per FEEDBACK_BATCH rows). Counts per
+    (hour, type, reason) live in memory and in a small aggregate table, so
+    stats() never scans the feedback rows: all-time stats are a dict read and
+    a time window sums one entry per hour.
+
+    Every POST is kept in the feedback log, but the counters and chunk priors
+    count at most one rating per answer_id: a later rating of the same answer
+    replaces the earlier one (answer_ratings, keyed by answer_id).
+    """
+
+    def __init__(self, path: str = FEEDBACK_DB, batch_size: int = FEEDBACK_BATCH,
+                 flush_interval: float = FEEDBACK_FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY,
+                created REAL NOT NULL,
+                client_timestamp TEXT,
+                feedback_type TEXT NOT NULL,
+                feedback_reason TEXT,
+                message_index INTEGER,
+                message_content TEXT,
+                answer_id TEXT,
+                question TEXT,
+                answer TEXT,
+                chunk_ids TEXT
+            );
+            CREATE INDEX IF NOT EXISTS feedback_created ON feedback (created);
+            CREATE TABLE IF NOT EXISTS feedback_counts (
+                bucket INTEGER NOT NULL,
+                feedback_type TEXT NOT NULL,
+                feedback_reason TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                PRIMARY KEY (bucket, feedback_type, feedback_reason)
+            );
+            CREATE TABLE IF NOT EXISTS answer_ratings (
+                answer_id TEXT PRIMARY KEY,
+                created REAL NOT NULL,
+                feedback_type TEXT NOT NULL,
+                feedback_reason TEXT NOT NULL,
+                chunk_ids TEXT
+            );
+        """)
+        # Databases created before feedback was tied to answers
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(feedback)")}
+        for column in ("answer_id", "question", "answer", "chunk_ids"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE feedback ADD COLUMN {column} TEXT")
+        self._conn.commit()
+
+        # (type, reason) -> count, and hour -> {(type, reason): count}; '' stands for no reason
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._buckets = {}
+        for bucket, feedback_type, reason, n in self._conn.execute(
+            "SELECT bucket, feedback_type, feedback_reason, n FROM feedback_counts"
+        ):
+            self._count(bucket, feedback_type, reason, n)
+
+        # answer_id -> (hour, type, reason) of its latest rating, to replace it in the counters
+        self._ratings = {}
+        self.priors = ChunkPriors()
+        for answer_id, created, feedback_type, reason, chunk_ids in self._conn.execute(
+            "SELECT answer_id, created, feedback_type, feedback_reason, chunk_ids FROM answer_ratings"
+        ):
+            self._ratings[answer_id] = (hour_bucket(created), feedback_type, reason)
+            self.priors.vote(answer_id, json.loads(chunk_ids) if chunk_ids else (),
+                             self.negative_vote(feedback_type, reason))
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="rafiki-feedback-writer", daemon=True)
+        self._writer.start()
+
+    def _count(self, bucket: int, feedback_type: str, reason: str, n: int = 1):
+        key = (feedback_type, reason)
+        self._totals[key] = self._totals.get(key, 0) + n
+        counts = self._buckets.setdefault(bucket, {})
+        counts[key] = counts.get(key, 0) + n
+
+    def record(self, feedback_type: str, reason: str = None, client_timestamp: str = None,
+               message_index: int = None, message_content: str = None, answer_id: str = None,
+               question: str = None, answer: str = None, chunk_ids: list = ()):
+        """Count the feedback now and queue it for the background writer; never blocks on disk."""
+        created = time.time()
+        rating = (hour_bucket(created), feedback_type, reason or "")
+        with self._lock:
+            previous = self._ratings.get(answer_id) if answer_id else None
+            if previous is not None:
+                self._count(*previous, n=-1)
+            self._count(*rating)
+            if answer_id:
+                self._ratings[answer_id] = rating
+        if answer_id:
+            self.priors.vote(answer_id, chunk_ids, self.negative_vote(feedback_type, reason))
+        self._queue.put(((created, client_timestamp, feedback_type, reason, message_index, message_content,
+                          answer_id, question, answer, json.dumps(list(chunk_ids)) if chunk_ids else None),
+                         previous))
+
+    @staticmethod
+    def negative_vote(feedback_type: str, reason: str):
+        """How feedback counts against the chunks behind an answer: True (blamed), False (praised) or None."""
+        if feedback_type == "positive":
+            return False
+        if feedback_type == "negative" and reason in NEGATIVE_REASONS:
+            return True
+        return None
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write(batch)
+                    return
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch: list):
+        rows = [row for row, _ in batch]
+        counts = {}
+        for row, previous in batch:
+            created, feedback_type, reason = row[0], row[2], row[3]
+            key = (hour_bucket(created), feedback_type, reason or "")
+            counts[key] = counts.get(key, 0) + 1
+            if previous is not None:
+                counts[previous] = counts.get(previous, 0) - 1
+        ratings = [(row[6], row[0], row[2], row[3] or "", row[9]) for row in rows if row[6]]
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO feedback (created, client_timestamp, feedback_type, feedback_reason, "
+                    "message_index, message_content, answer_id, question, answer, chunk_ids) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.executemany(
+                    "INSERT INTO feedback_counts (bucket, feedback_type, feedback_reason, n) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (bucket, feedback_type, feedback_reason) DO UPDATE SET n = n + excluded.n",
+                    [(*key, n) for key, n in counts.items() if n],
+                )
+                # In order, so the latest rating of an answer wins
+                self._conn.executemany(
+                    "INSERT INTO answer_ratings (answer_id, created, feedback_type, feedback_reason, chunk_ids) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT (answer_id) DO UPDATE SET created = excluded.created, "
+                    "feedback_type = excluded.feedback_type, feedback_reason = excluded.feedback_reason, "
+                    "chunk_ids = COALESCE(excluded.chunk_ids, answer_ratings.chunk_ids)",
+                    ratings,
+                )
+        except sqlite3.Error as e:
+            print(f"⚠ Feedback write failed, {len(batch)} entries lost: {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until everything recorded so far is on disk."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._conn.close()
+
+    def stats(self, since: float = None, until: float = None, reason: str = None) -> dict:
+        """
+        Aggregates for all feedback, or for the hours overlapping [since, until)
+        (epoch seconds), optionally only one feedbackReason.
+        """
+        with self._lock:
+            if since is None and until is None:
+                counts = dict(self._totals)
+            else:
+                first = hour_bucket(since) if since is not None else min(self._buckets, default=0)
+                last = hour_bucket(until) if until is not None else hour_bucket(time.time())
+                if last - first + 1 > len(self._buckets):
+                    selected = [bucket for bucket in self._buckets if first <= bucket <= last]
+                else:
+                    selected = range(first, last + 1)
+                counts = {}
+                for bucket in selected:
+                    for key, n in self._buckets.get(bucket, {}).items():
+                        counts[key] = counts.get(key, 0) + n
+
+        if reason is not None:
+            counts = {key: n for key, n in counts.items() if key[1] == reason}
+        positive = sum(n for (feedback_type, _), n in counts.items() if feedback_type == "positive")
+        negative = sum(n for (feedback_type, _), n in counts.items() if feedback_type == "negative")
+        total = sum(counts.values())
+        reasons = {}
+        for (_, key_reason), n in counts.items():
+            if key_reason and n:
+                reasons[key_reason] = reasons.get(key_reason, 0) + n
+        return {
+            "total": total,
+            "positive": positive,
+            "negative": negative,
+            "satisfaction_rate": round((positive / total) * 100, 1) if total else 0,
+            "reasons": reasons,
+        }
+
+
+# Process-wide store, opened on first use
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_feedback_store() -> FeedbackStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FeedbackStore()
+        return _store
+
+
+def close_feedback_store():
+    """Write out anything still queued (FastAPI shutdown)."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
@@ -0,0 +1,186 @@
+import os
+import re
+import math
+import threading
+
+INTENT_ROUTER = os.getenv("RAFIKI_INTENT_ROUTER", "1") == "1"
+
+# Curated responses, also used by backend/server.py when the AI path is unavailable
+BUILTIN_RESPONSES = {
+    "it office": """The **MOHI IT Office** is located at the **Pangani Head Office**.
+
+**Contact Information:**
+- 📞 Extension: **303** or **304**
+- 📍 Location: Pangani Head Office, Nairobi
+
+Feel free to reach out during working hours (8:00 AM - 5:00 PM). God bless! 🙏""",
+
+    "locked": """I'm sorry to hear you're locked out of your portal! Here's how to get help:
+
+**Steps to Resolve Portal Lockout:**
+1. Contact the IT department at **Extension 303 or 304**
+2. Provide your **Staff ID** and **Username**
+3. Wait for password reset (usually within 30 minutes)
+
+**Tip:** While waiting, you can verify your internet connection is stable.
+
+Don't worry, we'll get you back in quickly! 🔑""",
+
+    "leave": """Here's how to apply for leave through the MOHI Portal:
+
+**Steps to Apply for Leave:**
+1. Log into the **MOHI Staff Portal**
+2. Navigate to **Employee** > **Leave Application**
+3. Select the **Leave Type** (Annual, Sick, etc.)
+4. Enter your **Start Date** and **End Date**
+5. Add any required **Supporting Documents**
+6. Click **Submit** and wait for supervisor approval
+
+Need help? Contact HR at the Pangani office. 📝""",
+
+    "default": """Thank you for reaching out! I'm Rafiki, your friendly IT assistant for MOHI.
+
+I'm currently in **limited mode**, but I can still help guide you! Here are some quick options:
+
+• **IT Office Location** - Our team is at Pangani (Ext 303/304)
+• **Portal Issues** - Contact IT for password resets
+• **Leave Applications** - Use Employee > Leave in the portal
+
+For complex technical issues, please contact the IT department directly. May God bless your work today! 🙏"""
+}
+
+# intent -> (confidence threshold, [(regex, weight), ...])
+# Weights are log-odds evidence; a compound phrase carries the weight of its parts.
+INTENTS = {
+    "it office": (0.85, [
+        (r"\bit office\b", 3.5),
+        (r"\b(?:ict|it) (?:department|team|helpdesk|help desk)\b", 2.5),
+        (r"\bwhere\b", 0.8),
+        (r"\blocat(?:ed|ion)\b", 1.0),
+        (r"\bext(?:ension)?s?\b", 1.0),
+        (r"\bpangani\b", 0.8),
+        (r"\bcontact\b", 0.5),
+    ]),
+    "locked": (0.85, [
+        (r"\b(?:account|portal) (?:is |got |has been )?locked\b", 4.5),
+        (r"\blocked out\b", 4.0),
+        (r"\blocked\b", 1.5),
+        # A forgotten password is only a portal lockout with a portal/account co-term
+        # ("forgot my password for the wifi" belongs to the RAG chain)
+        (r"\bforgot(?:ten)? (?:my )?(?:portal |account |staff |login )password\b", 4.5),
+        (r"\bforgot(?:ten)? (?:my )?password\b", 3.0),
+        (r"\bpassword\b", 1.5),
+        (r"\breset\b", 1.0),
+        (r"\bcan'?t (?:log ?in|login|sign in)\b", 2.0),
+        (r"\bportal\b", 0.5),
+    ]),
+    "leave": (0.85, [
+        (r"\bapply(?:ing)? for (?:\w+ ){0,2}leave\b", 4.5),
+        (r"\bleave application\b", 4.0),
+        (r"\bleave\b", 1.2),
+        (r"\bvacation\b", 1.5),
+        (r"\bdays? off\b", 1.5),
+        (r"\bapply\b", 0.6),
+        (r"\bsteps?\b", 0.4),
+    ]),
+}
+
+BIAS = -2.5  # prior log-odds that a message is one of the curated intents
+LENGTH_PENALTY = 0.08  # per word beyond SHORT_MESSAGE: long, specific questions belong to the RAG chain
+SHORT_MESSAGE = 12
+WORD_BOUNDARY = r"\b"
+
+
+class IntentMatch:
+    def __init__(self, intent: str, confidence: float, response: str):
+        self.intent = intent
+        self.confidence = confidence
+        self.response = response
+
+    def __repr__(self):
+        return f"IntentMatch({self.intent!r}, {self.confidence:.2f})"
+
+
+class IntentRouter:
+    """
+    Fast path in front of the RAG chain. Every pattern of every intent is
+    compiled into one alternation regex, so a message is scanned once; the
+    matched patterns feed a tiny logistic scorer per intent, and only a
+    confidence above that intent's threshold short-circuits retrieval + LLM.
+    """
+
+    def __init__(self, intents: dict = INTENTS, responses: dict = BUILTIN_RESPONSES,
+                 bias: float = BIAS, length_penalty: float = LENGTH_PENALTY):
+        self.responses = responses
+        self.bias = bias
+        self.length_penalty = length_penalty
+        self.thresholds = {name: threshold for name, (threshold, _) in intents.items()}
+
+        # group name -> (intent, weight)
+        self._features = {}
+        alternatives = []
+        for name, (_, patterns) in intents.items():
+            for pattern, weight in patterns:
+                group = f"f{len(self._features)}"
+                self._features[group] = (name, weight)
+                alternatives.append(f"(?P<{group}>{pattern.removeprefix(WORD_BOUNDARY)})")
+        # Every pattern starts at a word boundary; hoisting it out of the alternation
+        # lets the scan reject mid-word positions with a single check
+        self._matcher = re.compile(r"\b(?:" + "|".join(alternatives) + ")")
+
+        self._lock = threading.Lock()
+        self.routed = 0
+        self.passed = 0
+        self.hits = {name: 0 for name in intents}
+
+    def classify(self, message: str) -> dict:
+        """Confidence per intent (0..1) for a message."""
+        text = message.lower()
+        scores = {name: 0.0 for name in self.thresholds}
+        seen = set()
+        for match in self._matcher.finditer(text):
+            group = match.lastgroup
+            if group not in seen:
+                seen.add(group)
+                intent, weight = self._features[group]
+                scores[intent] += weight
+
+        penalty = self.length_penalty * max(0, len(text.split()) - SHORT_MESSAGE)
+        return {
+            name: 1 / (1 + math.exp(-(score + self.bias - penalty))) if score else 0.0
+            for name, score in scores.items()
+        }
+
+    def best(self, message: str):
+        scores = self.classify(message)
+        intent = max(scores, key=scores.get)
+        return intent, scores[intent]
+
+    def route(self, message: str):
+        """Return an IntentMatch when a curated answer is confident enough, else None."""
+        intent, confidence = self.best(message)
+        matched = confidence >= self.thresholds[intent]
+        with self._lock:
+            if matched:
+                self.routed += 1
+                self.hits[intent] += 1
+            else:
+                self.passed += 1
+        if matched:
+            return IntentMatch(intent, confidence, self.responses[intent])
+        return None
+
+    def fallback(self, message: str) -> str:
+        """Degraded mode (no RAG chain): the likeliest curated answer whatever its confidence, else 'default'."""
+        intent, confidence = self.best(message)
+        return self.responses[intent] if confidence > 0 else self.responses["default"]
+
+    def stats(self) -> dict:
+        total = self.routed + self.passed
+        return {
+            "routed": self.routed,
+            "passed_to_rag": self.passed,
+            "hit_rate": round((self.routed / total) * 100, 1) if total else 0,
+            "hits": dict(self.hits),
+            "thresholds": dict(self.thresholds),
+        }
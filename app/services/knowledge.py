@@ -1,64 +1,321 @@
 import os
+import sys
+import json
 import time
+import asyncio
+import hashlib
+import argparse
+import threading
+from contextlib import aclosing
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, DirectoryLoader
+from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain_chroma import Chroma
+from app.services.cache import bump_kb_version
+from app.services.embeddings import (
+    collection_embedding_config, get_embeddings, resolve_embedding_config, write_embedding_config,
+)
+from app.services.lexical import BM25_FILE, BM25Index
+from app.services.paths import project_path
+from app.services.ratelimit import ConcurrentEmbedder
+from app.services.vectorindex import VECTOR_INDEX_FILE, export_vector_index
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 # Load environment variables (ensure GOOGLE_API_KEY is in your .env)
 load_dotenv()
 
-def run_ingestion():
-    data_path = "./data"
-    #db_path = "./chroma_db_gemini"
-    db_path = "./chroma_db_openai"
-    
-    # 1. Load all PDFs and Docx files from your data folder
-    print("📂 Loading MOHI documents from /data...")
-    pdf_loader = DirectoryLoader(data_path, glob="./*.pdf", loader_cls=PyPDFLoader)
-    docx_loader = DirectoryLoader(data_path, glob="./*.docx", loader_cls=Docx2txtLoader)
-    
-    docs = pdf_loader.load() + docx_loader.load()
-    
-    # 2. Split text into chunks
-    # 1000 characters helps keep the context of MOHI policy sections together
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-    chunks = text_splitter.split_documents(docs)
-    
-    # 3. Initialize Google Embeddings with the stable model name
+DATA_PATH = project_path("data")
+#DB_PATH = "./chroma_db_gemini"
+DB_PATH = project_path("chroma_db_openai")
+MANIFEST_FILE = "ingest_manifest.json"
+
+# Only top-level files in ./data are indexed, matching the old DirectoryLoader globs
+LOADERS = {
+    ".pdf": PyPDFLoader,
+    ".docx": Docx2txtLoader,
+}
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(db_path: str) -> dict:
+    """file path -> {"mtime", "size", "sha256", "chunk_ids"} from the last ingestion run"""
+    try:
+        with open(os.path.join(db_path, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(db_path: str, manifest: dict):
+    os.makedirs(db_path, exist_ok=True)
+    tmp_path = os.path.join(db_path, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(db_path, MANIFEST_FILE))
+
+
+def scan_documents(data_path: str) -> list:
+    return sorted(
+        os.path.join(data_path, name)
+        for name in os.listdir(data_path)
+        if os.path.splitext(name)[1].lower() in LOADERS and os.path.isfile(os.path.join(data_path, name))
+    )
+
+
+def chunk_ids(path: str, chunks) -> list:
+    """Deterministic IDs (file, position, text) so re-adding the same chunk is an idempotent upsert."""
+    return [
+        hashlib.sha256(f"{path}\0{i}\0{chunk.page_content}".encode("utf-8")).hexdigest()
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def load_and_split(path: str, text_splitter):
+    loader = LOADERS[os.path.splitext(path)[1].lower()](path)
+    return text_splitter.split_documents(loader.load())
+
+
+# 1000 characters helps keep the context of MOHI policy sections together
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+INGEST_WORKERS = int(os.getenv("RAFIKI_INGEST_WORKERS", str(os.cpu_count() or 1)))
+
+
+def split_file(path: str):
+    """Process-pool worker: parse one document and split it into chunks."""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return path, load_and_split(path, text_splitter)
+
+
+async def split_documents(paths: list, workers: int = INGEST_WORKERS):
+    """
+    Yield (path, chunks) as each file finishes parsing, in completion order.
+    Closing the generator early (the consumer failed) drops the files not yet
+    started instead of waiting for the whole pool to drain.
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield split_file(path)
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(paths)))
+    pending = []
+    try:
+        pending = [loop.run_in_executor(pool, split_file, path) for path in paths]
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def peak_memory_mb() -> float:
+    """Peak RSS of this process and of finished worker processes (0 where unsupported, e.g. Windows)."""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return max(own, children) / (1024 * 1024)
+
+
+class IngestionProgress:
+    """Files/s and chunks/s throughput for the split and embed stages."""
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.files = 0
+        self.chunks = 0
+        self.embedded_chunks = 0
+        self.start = time.perf_counter()
+
+    def split(self, path: str, n_chunks: int):
+        self.files += 1
+        self.chunks += n_chunks
+        elapsed = time.perf_counter() - self.start
+        print(f"📄 [{self.files}/{self.total_files}] {os.path.basename(path)}: {n_chunks} chunks "
+              f"({self.files / elapsed:.1f} files/s)")
+
+    def embedded(self, n_chunks: int):
+        self.embedded_chunks += n_chunks
+        print(f"✅ Embedded {self.embedded_chunks}/{self.chunks} chunks so far...")
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.start
+        return {
+            "files": self.files,
+            "chunks": self.embedded_chunks,
+            "seconds": round(elapsed, 2),
+            "files_per_s": round(self.files / elapsed, 1) if elapsed else 0,
+            "chunks_per_s": round(self.embedded_chunks / elapsed, 1) if elapsed else 0,
+            "peak_rss_mb": round(peak_memory_mb(), 1),
+        }
+
+    def report(self):
+        s = self.summary()
+        print(f"📊 {s['files']} files, {s['chunks']} chunks in {s['seconds']}s: "
+              f"{s['files_per_s']} files/s, {s['chunks_per_s']} chunks/s, peak RSS {s['peak_rss_mb']} MB")
+
+
+def plan_ingestion(paths: list, manifest: dict):
+    """
+    Compare ./data against the manifest.
+    Returns (files to (re)index with their fingerprint, stale chunk IDs to delete, unchanged manifest entries).
+    """
+    to_index, stale_ids, unchanged = {}, [], {}
+
+    for path in paths:
+        stat = os.stat(path)
+        previous = manifest.get(path)
+        if previous and previous["mtime"] == stat.st_mtime and previous["size"] == stat.st_size:
+            unchanged[path] = previous
+            continue
+
+        sha = file_sha256(path)
+        if previous and previous["sha256"] == sha:
+            # Touched but not edited: just refresh the fingerprint
+            unchanged[path] = dict(previous, mtime=stat.st_mtime, size=stat.st_size)
+            continue
+
+        if previous:
+            stale_ids.extend(previous["chunk_ids"])
+        to_index[path] = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": sha}
+
+    # Files removed from ./data since the last run
+    for path, previous in manifest.items():
+        if path not in unchanged and path not in to_index:
+            stale_ids.extend(previous["chunk_ids"])
+
+    return to_index, stale_ids, unchanged
+
+
+def build_lexical_index(vector_db, db_path: str):
+    """Rebuild the BM25 keyword index from the whole collection so it always matches Chroma."""
+    index = BM25Index.from_collection(vector_db._collection)
+    index.save(db_path)
+    print(f"🔤 Keyword (BM25) index rebuilt over {len(index)} chunks")
+
+
+def build_vector_index(vector_db, db_path: str):
+    """Re-export the memory-mapped vector index (RAFIKI_VECTOR_INDEX=mmap) so it matches Chroma."""
+    manifest = export_vector_index(vector_db._collection, db_path)
+    print(f"🗺️ Vector index exported: {manifest['count']} chunks x {manifest['dim']} dims")
+
+
+def run_ingestion(data_path: str = DATA_PATH, db_path: str = DB_PATH, full: bool = False, embeddings=None,
+                  backend: str = None):
+    """
+    Index ./data into Chroma. By default only new or changed documents are
+    re-chunked and embedded, and chunks of edited or deleted files are removed.
+    Pass full=True (or run without a manifest, e.g. the first time) to drop
+    the collection and rebuild everything.
+
+    backend ('openai' or 'onnx') picks the embedding model; it is recorded in
+    embedding.json so the chat service always queries with the same model.
+    Switching the backend of an existing collection requires full=True.
+    """
+    # 1. Initialize the embeddings and open the existing 'Brain'
     # embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-    
-    print(f"🧠 Vectorizing {len(chunks)} chunks into ChromaDB...")
-    
-    # 4. Batching Logic to stay under Free Tier Rate Limits (preventing 429 errors)
-    batch_size = 100  # Processing 100 chunks at a time
-    vector_db = None
-
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i:i + batch_size]
-        
-        if vector_db is None:
-            # Initialize the database with the first batch
-            vector_db = Chroma.from_documents(
-                documents=batch, 
-                embedding=embeddings, 
-                persist_directory=db_path
+    # Cached by content hash, so unchanged chunks are never re-embedded
+    config = resolve_embedding_config(db_path, backend)
+    stored = collection_embedding_config(db_path)
+    if stored and stored != config and not full:
+        raise ValueError(f"Collection was built with {stored}, not {config}; re-run with --full to switch models")
+    # No SDK retries: ConcurrentEmbedder's adaptive backoff owns 429 handling
+    embeddings = embeddings or get_embeddings(config, max_retries=0)
+    vector_db = Chroma(persist_directory=db_path, embedding_function=embeddings)
+
+    manifest = {} if full else load_manifest(db_path)
+    if not manifest:
+        # Without a manifest nothing in the collection is tracked, so start clean rather than duplicate it
+        print("🧹 Full rebuild, clearing the existing collection...")
+        vector_db.reset_collection()
+
+    # 2. Work out what changed since the last run
+    print("📂 Scanning MOHI documents in /data...")
+    to_index, stale_ids, unchanged = plan_ingestion(scan_documents(data_path), manifest)
+    print(f"   {len(to_index)} new/changed, {len(unchanged)} unchanged, {len(stale_ids)} stale chunks")
+
+    if manifest and not to_index and not stale_ids:
+        save_manifest(db_path, unchanged)
+        if not os.path.exists(os.path.join(db_path, BM25_FILE)):
+            build_lexical_index(vector_db, db_path)
+        if not os.path.exists(os.path.join(db_path, VECTOR_INDEX_FILE)):
+            build_vector_index(vector_db, db_path)
+        print("\n✨ Knowledge Base already up to date.")
+        return vector_db
+
+    if stale_ids:
+        vector_db.delete(ids=stale_ids)
+        print(f"🗑️ Removed {len(stale_ids)} chunks from edited or deleted documents")
+
+    # 3. Parse + split new/changed documents in a process pool, and
+    # 4. embed concurrently under the API rate limits (RAFIKI_EMBED_RPM/TPM), batched by
+    #    token count; chunks stream into the embedder as each file finishes
+    new_manifest = dict(unchanged)
+    progress = IngestionProgress(len(to_index))
+    write_lock = threading.Lock()
+
+    def write_batch(texts: list, payloads: list, vectors: list):
+        # Runs in a worker thread (see ConcurrentEmbedder); one batch written at a time.
+        # Deterministic IDs make this an upsert, so an interrupted run can simply be repeated
+        with write_lock:
+            vector_db._collection.upsert(
+                ids=[chunk_id for chunk_id, _ in payloads],
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[metadata for _, metadata in payloads],
             )
-        else:
-            # Add subsequent batches to the existing database
-            vector_db.add_documents(batch)
-        
-        print(f"✅ Processed chunks {i} to {min(i + batch_size, len(chunks))}...")
-        
-        # This 10-second sleep is our "Speed Bump" for the Google API
-        time.sleep(10)
+            progress.embedded(len(texts))
+
+    async def index_documents():
+        embedder = ConcurrentEmbedder(embeddings, on_batch=write_batch)
+        async with aclosing(split_documents(list(to_index))) as split:
+            async for path, chunks in split:
+                file_ids = chunk_ids(path, chunks)
+                new_manifest[path] = dict(to_index[path], chunk_ids=file_ids)
+                progress.split(path, len(chunks))
+                await embedder.add(
+                    [chunk.page_content for chunk in chunks],
+                    payloads=[(chunk_id, chunk.metadata) for chunk_id, chunk in zip(file_ids, chunks)],
+                )
+        await embedder.close()
+
+    print(f"🧠 Vectorizing {len(to_index)} documents into ChromaDB...")
+    asyncio.run(index_documents())
+    progress.report()
+
+    save_manifest(db_path, new_manifest)
+    write_embedding_config(db_path, config)
+    build_lexical_index(vector_db, db_path)
+    build_vector_index(vector_db, db_path)
+
+    # Tell running servers to drop answers cached against the old knowledge base
+    bump_kb_version(db_path)
 
     print(f"\n✨ Success! Rafiki IT Knowledge Base is ready.")
     print(f"📍 Database saved at: {os.path.abspath(db_path)}")
     return vector_db
 
 if __name__ == "__main__":
-    run_ingestion()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Index ./data into the Rafiki knowledge base")
+    parser.add_argument("--full", action="store_true", help="drop the collection and re-index every document")
+    parser.add_argument("--backend", choices=["openai", "onnx"],
+                        help="embedding model for this collection (default: what it was built with)")
+    args = parser.parse_args()
+    run_ingestion(full=args.full, backend=args.backend)
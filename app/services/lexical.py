@@ -0,0 +1,144 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+
+from langchain_core.documents import Document
+
+BM25_FILE = "bm25_index.json"
+RRF_K = 60  # standard reciprocal-rank-fusion constant
+
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how i in is it me my of on or our the to what when where "
+    "which who why with you your can should".split()
+)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list:
+    """Lowercase word/number tokens; keeps things like 'ext', '303' and form codes intact."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring.
+
+    Per-posting term weights are precomputed at load time, so a query is a
+    handful of dict lookups and additions (well under a millisecond for a
+    policy corpus) and never touches the network.
+    """
+
+    def __init__(self, ids: list, texts: list, metadatas: list, k1: float = 1.5, b: float = 0.75):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+        self.postings = self._build(texts)
+
+    def _build(self, texts: list) -> dict:
+        term_freqs = []
+        doc_freq = {}
+        for text in texts:
+            tf = {}
+            for token in tokenize(text):
+                tf[token] = tf.get(token, 0) + 1
+            term_freqs.append(tf)
+            for token in tf:
+                doc_freq[token] = doc_freq.get(token, 0) + 1
+
+        n = len(texts)
+        lengths = [sum(tf.values()) for tf in term_freqs]
+        avg_len = (sum(lengths) / n) if n else 0.0
+
+        postings = {}
+        for doc, tf in enumerate(term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * lengths[doc] / avg_len) if avg_len else self.k1
+            for token, freq in tf.items():
+                idf = math.log(1 + (n - doc_freq[token] + 0.5) / (doc_freq[token] + 0.5))
+                postings.setdefault(token, []).append((doc, idf * freq * (self.k1 + 1) / (freq + norm)))
+        return postings
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query: str, k: int = 5) -> list:
+        """Top-k (doc index, score) pairs."""
+        scores = {}
+        for token in set(tokenize(query)):
+            for doc, weight in self.postings.get(token, ()):
+                scores[doc] = scores.get(doc, 0.0) + weight
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def documents(self, query: str, k: int = 5) -> list:
+        return [
+            Document(id=self.ids[doc], page_content=self.texts[doc], metadata=self.metadatas[doc] or {})
+            for doc, _ in self.search(query, k)
+        ]
+
+    def save(self, db_path: str):
+        path = os.path.join(db_path, BM25_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, db_path: str):
+        with open(os.path.join(db_path, BM25_FILE)) as f:
+            data = json.load(f)
+        return cls(data["ids"], data["texts"], data["metadatas"])
+
+    @classmethod
+    def from_collection(cls, collection):
+        """Build from everything currently in a Chroma collection."""
+        data = collection.get(include=["documents", "metadatas"])
+        return cls(data["ids"], data["documents"], data["metadatas"])
+
+
+class LexicalRetriever:
+    """Holds the BM25 index for a Chroma directory and reloads it when run_ingestion rewrites it."""
+
+    def __init__(self, db_path: str):
+        self.path = os.path.join(db_path, BM25_FILE)
+        self.db_path = db_path
+        self.index = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self.index = BM25Index.load(self.db_path)
+                    self._mtime = mtime
+
+    def documents(self, query: str, k: int = 5) -> list:
+        self._refresh()
+        return self.index.documents(query, k) if self.index else []
+
+
+def reciprocal_rank_fusion(result_lists: list, k: int = 5, rrf_k: int = RRF_K, weight=None) -> list:
+    """
+    Fuse ranked Document lists by sum of 1 / (rrf_k + rank); documents are matched on id (or text).
+    weight(chunk_id) optionally scales each document's fused score (feedback priors).
+    """
+    scores, docs = {}, {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            docs.setdefault(key, doc)
+    if weight is not None:
+        for key, doc in docs.items():
+            if doc.id:
+                scores[key] *= weight(doc.id)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ranked[:k]]
@@ -0,0 +1,226 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+TIMING_HEADER = os.getenv("RAFIKI_TIMING_HEADER", "0") == "1"  # Server-Timing on every response
+TIMING_REQUEST_HEADER = b"x-rafiki-timing"  # ...or only when the client sends this header
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stage durations of the current request, for the Server-Timing header
+_request_timings = contextvars.ContextVar("rafiki_request_timings", default=None)
+
+
+class _Shard:
+    """One thread's metric values. Only its own thread writes to it."""
+
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+
+class Registry:
+    """
+    Counters, gauges and histograms in Prometheus text format, without the
+    prometheus_client dependency. Updates go to a per-thread shard, so the
+    hot path takes no lock; a scrape merges the shards.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._help = {}  # name -> (type, help)
+        self._shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()  # only for registering shards and collectors
+        self._collectors = []
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Counter increment (or gauge change, with a negative value)."""
+        counters = self._shard().counters
+        key = (name, label_key(labels))
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        histograms = self._shard().histograms
+        key = (name, label_key(labels))
+        values = histograms.get(key)
+        if values is None:
+            values = histograms[key] = [0] * (len(self.buckets) + 3)
+        values[bisect.bisect_left(self.buckets, seconds)] += 1
+        values[-2] += seconds
+        values[-1] += 1
+
+    def collector(self, func):
+        """Register func() -> {(name, labels tuple): value}, called at scrape time (e.g. cache stats)."""
+        with self._lock:
+            self._collectors.append(func)
+        return func
+
+    @staticmethod
+    def _snapshot(table: dict) -> list:
+        # The owning thread may insert a key mid-copy; just try again
+        while True:
+            try:
+                return [(key, list(v) if isinstance(v, list) else v) for key, v in list(table.items())]
+            except RuntimeError:
+                continue
+
+    def collect(self):
+        counters, histograms = {}, {}
+        with self._lock:
+            shards = list(self._shards)
+            collectors = list(self._collectors)
+        for shard in shards:
+            for key, value in self._snapshot(shard.counters):
+                counters[key] = counters.get(key, 0) + value
+            for key, values in self._snapshot(shard.histograms):
+                merged = histograms.setdefault(key, [0] * len(values))
+                for i, v in enumerate(values):
+                    merged[i] += v
+        for func in collectors:
+            try:
+                counters.update(func())
+            except Exception as e:
+                print(f"⚠ Metrics collector failed: {e}")
+        return counters, histograms
+
+    def render(self) -> str:
+        counters, histograms = self.collect()
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, help_text = self._help[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name)
+            lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        for (name, labels), values in sorted(histograms.items()):
+            header(name)
+            cumulative = 0
+            for le, count in zip([*map(str, self.buckets), "+Inf"], values):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {values[-2]:.6f}")
+            lines.append(f"{name}_count{format_labels(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def label_key(labels: dict) -> tuple:
+    # Sorting only matters with several labels; most calls have one
+    return tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items())
+
+
+def format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+REGISTRY.describe("rafiki_stage_seconds", "histogram", "Time spent per pipeline stage")
+REGISTRY.describe("rafiki_request_seconds", "histogram", "HTTP request duration, until the last body byte")
+REGISTRY.describe("rafiki_requests_total", "counter", "HTTP requests by endpoint and status")
+REGISTRY.describe("rafiki_requests_in_flight", "gauge", "HTTP requests currently being served")
+REGISTRY.describe("rafiki_errors_total", "counter", "Failures by pipeline stage")
+REGISTRY.describe("rafiki_answers_total", "counter", "Answers by source (llm, cache, intent)")
+REGISTRY.describe("rafiki_prompt_tokens_total", "counter", "Prompt tokens sent to the LLM")
+REGISTRY.describe("rafiki_completion_tokens_total", "counter", "Tokens generated by the LLM")
+REGISTRY.describe("rafiki_builtin_fallbacks_total", "counter", "AI answers that failed, or requests shed under overload, answered with a built-in response")
+
+
+def record_stage(name: str, seconds: float):
+    REGISTRY.observe("rafiki_stage_seconds", seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage; failures are counted per stage and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REGISTRY.inc("rafiki_errors_total", stage=name)
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def server_timing(timings: dict) -> bytes:
+    """Server-Timing header value: 'embedding;dur=12.3, retrieval;dur=4.1, ...' (milliseconds)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware for both apps: request counts, duration (to the end of a
+    streamed body), in-flight gauge, and the optional Server-Timing header
+    with the stage breakdown of the request.
+    """
+
+    def __init__(self, app, registry: Registry = REGISTRY):
+        self.app = app
+        self.registry = registry
+        self._paths = None
+
+    def endpoint(self, scope) -> str:
+        # Label by known route only, so arbitrary URLs can't blow up the series count
+        if self._paths is None and "app" in scope:
+            self._paths = {getattr(route, "path", None) for route in getattr(scope["app"], "routes", [])}
+        return scope["path"] if self._paths and scope["path"] in self._paths else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self.endpoint(scope)
+        timings = {}
+        token = _request_timings.set(timings)
+        want_header = TIMING_HEADER or any(name == TIMING_REQUEST_HEADER for name, _ in scope.get("headers", ()))
+        status = 500
+        start = time.perf_counter()
+        self.registry.inc("rafiki_requests_in_flight", endpoint=endpoint)
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if want_header and timings:
+                    message = dict(message, headers=[*message.get("headers", []),
+                                                     (b"server-timing", server_timing(timings))])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _request_timings.reset(token)
+            self.registry.inc("rafiki_requests_in_flight", -1, endpoint=endpoint)
+            self.registry.inc("rafiki_requests_total", endpoint=endpoint, status=status)
+            self.registry.observe("rafiki_request_seconds", time.perf_counter() - start, endpoint=endpoint)
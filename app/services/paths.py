@@ -0,0 +1,10 @@
+from pathlib import Path
+
+# The repository root. Default data locations (Chroma, the SQLite stores, ./data) are
+# resolved against it rather than the working directory, so the servers and scripts find
+# them whichever directory they are started from
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+def project_path(name: str) -> str:
+    return str(PROJECT_ROOT / name)
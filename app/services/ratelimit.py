@@ -0,0 +1,193 @@
+import os
+import time
+import random
+import asyncio
+
+from app.services.tokens import count_tokens
+
+EMBED_RPM = int(os.getenv("RAFIKI_EMBED_RPM", "3000"))  # requests per minute
+EMBED_TPM = int(os.getenv("RAFIKI_EMBED_TPM", "1000000"))  # tokens per minute
+EMBED_CONCURRENCY = int(os.getenv("RAFIKI_EMBED_CONCURRENCY", "4"))  # batches in flight
+EMBED_BATCH_TOKENS = int(os.getenv("RAFIKI_EMBED_BATCH_TOKENS", "20000"))
+EMBED_BATCH_ITEMS = 512
+MAX_RETRIES = 8
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute / 60` units per second."""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        # Oversized requests (bigger than the whole bucket) wait for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server says we are over the limit."""
+        self._refill()
+        self.tokens = 0
+
+
+class RateLimiter:
+    """Requests/min and tokens/min limits, shared by every in-flight batch."""
+
+    def __init__(self, rpm: float = EMBED_RPM, tpm: float = EMBED_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    async def acquire(self, tokens: int):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def penalize(self):
+        # The server's window is stricter than our bucket thought: drop the burst allowance
+        # so every in-flight batch falls back to the steady per-minute rate
+        self.requests.drain()
+        self.tokens.drain()
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after(error: Exception):
+    """Seconds the server asked us to wait (Retry-After header), if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class ConcurrentEmbedder:
+    """
+    Streaming front end for ingestion: texts are added as documents finish
+    splitting, grouped into token-sized batches, and embedded with up to
+    `concurrency` requests in flight under the shared RateLimiter. 429s drain
+    the buckets and back off exponentially (or for Retry-After).
+
+    on_batch(texts, payloads, vectors) is called in a worker thread as each
+    batch lands, so a blocking write (the Chroma upsert) stays off the event
+    loop. add() blocks while all slots are busy, so a fast producer can't pile
+    up memory.
+    The first batch that fails (other than a retried 429) cancels the rest and
+    is re-raised from add() / close(), so the caller never records as indexed
+    chunks that were not written.
+    """
+
+    def __init__(self, embeddings, limiter: RateLimiter = None, concurrency: int = EMBED_CONCURRENCY,
+                 max_tokens: int = EMBED_BATCH_TOKENS, max_items: int = EMBED_BATCH_ITEMS, on_batch=None):
+        self.embeddings = embeddings
+        self.limiter = limiter or RateLimiter()
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self.on_batch = on_batch
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+        self._error = None
+        self._texts, self._payloads, self._tokens = [], [], 0
+
+        self.batches = 0
+        self.retries = 0
+
+    async def add(self, texts: list, payloads: list = None, token_counts: list = None):
+        self._raise_failure()
+        payloads = payloads if payloads is not None else [None] * len(texts)
+        token_counts = token_counts if token_counts is not None else [count_tokens(t) for t in texts]
+        for text, payload, n in zip(texts, payloads, token_counts):
+            if self._texts and (self._tokens + n > self.max_tokens or len(self._texts) >= self.max_items):
+                await self._launch()
+            self._texts.append(text)
+            self._payloads.append(payload)
+            self._tokens += n
+
+    async def close(self):
+        """Flush the partial batch and wait for everything in flight; raises the first failure."""
+        if self._texts and self._error is None:
+            await self._launch()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        self._raise_failure()
+
+    def _raise_failure(self):
+        if self._error is not None:
+            raise self._error
+
+    def _done(self, task: asyncio.Task):
+        # Released here rather than in _run: a task cancelled before it starts never runs its finally
+        self._slots.release()
+        self._tasks.discard(task)
+        if task.cancelled() or task.exception() is None or self._error is not None:
+            return
+        self._error = task.exception()
+        for other in list(self._tasks):
+            other.cancel()
+
+    async def _launch(self):
+        texts, payloads, tokens = self._texts, self._payloads, self._tokens
+        self._texts, self._payloads, self._tokens = [], [], 0
+        await self._slots.acquire()
+        if self._error is not None:
+            # A batch failed while this one waited for a slot
+            self._slots.release()
+            self._raise_failure()
+        task = asyncio.create_task(self._run(texts, payloads, tokens))
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+
+    async def _run(self, texts: list, payloads: list, tokens: int):
+        for attempt in range(MAX_RETRIES + 1):
+            await self.limiter.acquire(tokens)
+            try:
+                vectors = await self.embeddings.aembed_documents(texts)
+                break
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == MAX_RETRIES:
+                    raise
+                self.limiter.penalize()
+                self.retries += 1
+                delay = retry_after(e) or backoff_delay(attempt)
+                print(f"⏳ Rate limited, retrying a {len(texts)}-chunk batch in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        self.batches += 1
+        if self.on_batch:
+            await asyncio.to_thread(self.on_batch, texts, payloads, vectors)
+
+
+async def embed_concurrently(texts: list, embeddings, token_counts: list = None, limiter: RateLimiter = None,
+                             concurrency: int = EMBED_CONCURRENCY, max_tokens: int = EMBED_BATCH_TOKENS):
+    """Embed an in-memory list of texts with a ConcurrentEmbedder; returns vectors in input order."""
+    vectors = [None] * len(texts)
+
+    def collect(batch_texts, positions, batch_vectors):
+        for i, vector in zip(positions, batch_vectors):
+            vectors[i] = vector
+
+    embedder = ConcurrentEmbedder(embeddings, limiter=limiter, concurrency=concurrency,
+                                  max_tokens=max_tokens, on_batch=collect)
+    await embedder.add(texts, payloads=list(range(len(texts))), token_counts=token_counts)
+    await embedder.close()
+    return vectors
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from app.services.context import HISTORY_MESSAGES, truncate_to_tokens
+
+SESSION_TTL = float(os.getenv("RAFIKI_SESSION_TTL", str(2 * 60 * 60)))  # seconds of inactivity
+SESSION_MAX = int(os.getenv("RAFIKI_SESSION_MAX", "10000"))  # sessions held in memory
+SESSION_DB = os.getenv("RAFIKI_SESSION_DB", "")  # e.g. ./sessions.sqlite3; empty keeps sessions in memory only
+SESSION_FLUSH_INTERVAL = 0.25  # seconds a partial batch of session writes may wait
+RECENT_MESSAGES = HISTORY_MESSAGES  # kept verbatim (3 exchanges); older ones are folded into the summary
+SUMMARY_TOKENS = 250
+SUMMARY_ITEM_TOKENS = 30
+
+
+def first_sentence(text: str) -> str:
+    line = text.strip().split("\n")[0]
+    end = line.find(". ", 20)  # skip abbreviations like "I.T." near the start
+    return line[:end + 1] if end > 0 else line
+
+
+def rolling_summary(summary: str, folded: list) -> str:
+    """
+    Extend the summary with the messages that just left the recent window:
+    one clause per exchange, oldest clauses dropped once SUMMARY_TOKENS is reached.
+    Incremental, so each turn costs the same no matter how long the chat is.
+    """
+    items = [item for item in summary.split(" | ") if item]
+    for msg in folded:
+        text = truncate_to_tokens(first_sentence(msg["content"]), SUMMARY_ITEM_TOKENS)
+        if msg["role"] == "user":
+            items.append(f"asked: {text}")
+        elif items and items[-1].startswith("asked:"):
+            items[-1] += f" -> Rafiki: {text}"
+
+    while items and sum(len(item) for item in items) // 4 > SUMMARY_TOKENS:
+        items.pop(0)
+    return " | ".join(items)
+
+
+class Session:
+    def __init__(self, session_id: str, recent: list = None, summary: str = "", turns: int = 0,
+                 updated: float = None):
+        self.id = session_id
+        self.recent = recent or []
+        self.summary = summary
+        self.turns = turns
+        self.updated = updated or time.time()
+
+
+class SessionStore:
+    """
+    Server-side conversations, so clients send only the new message and a session ID.
+
+    Each session keeps its last RECENT_MESSAGES messages verbatim plus a rolling
+    summary of everything older. Sessions live in an LRU dict bounded by
+    max_sessions and expire after ttl seconds idle; with db_path set they are
+    also written behind to SQLite by a background thread (the latest state of
+    each session, batched like FeedbackStore) and survive restarts and LRU
+    eviction.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX, ttl: float = SESSION_TTL, db_path: str = SESSION_DB,
+                 summarize=rolling_summary):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.summarize = summarize
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self._conn = None
+        self._unsaved = {}  # session id -> row queued for the writer, newest state only
+        self._queue = queue.Queue()
+        self._writer = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(id TEXT PRIMARY KEY, recent TEXT NOT NULL, summary TEXT NOT NULL, turns INTEGER, updated REAL)"
+            )
+            self._conn.commit()
+            self.purge()
+            self._writer = threading.Thread(target=self._write_loop, name="rafiki-session-writer", daemon=True)
+            self._writer.start()
+
+        self.created = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _expired(self, session: Session) -> bool:
+        return time.time() - session.updated > self.ttl
+
+    def _load(self, session_id: str):
+        if self._conn is None:
+            return None
+        # A session evicted from memory may still be waiting for the writer
+        unsaved = self._unsaved.get(session_id)
+        row = unsaved[1:] if unsaved is not None else self._conn.execute(
+            "SELECT recent, summary, turns, updated FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        recent, summary, turns, updated = row
+        return Session(session_id, json.loads(recent), summary, turns, updated)
+
+    def _save(self, session: Session):
+        """Queue the session's current state for the background writer; never blocks on disk."""
+        if self._conn is not None:
+            self._unsaved[session.id] = (session.id, json.dumps(session.recent), session.summary,
+                                         session.turns, session.updated)
+            self._queue.put(session.id)
+
+    def _write_loop(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                deadline = time.monotonic() + SESSION_FLUSH_INTERVAL
+                while True:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._write(conn, batch)
+                        return
+                    batch.append(item)
+                self._write(conn, batch)
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch: list):
+        with self._lock:
+            rows = [self._unsaved[session_id] for session_id in set(batch) if session_id in self._unsaved]
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO sessions (id, recent, summary, turns, updated) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            print(f"⚠ Session write failed, {len(rows)} sessions not saved: {e}")
+        finally:
+            with self._lock:
+                for row in rows:
+                    # Unless the session changed again in the meantime
+                    if self._unsaved.get(row[0]) is row:
+                        del self._unsaved[row[0]]
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every session saved so far is on disk."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        """Write out queued sessions and stop the writer (server shutdown)."""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _put(self, session: Session):
+        self._sessions[session.id] = session
+        self._sessions.move_to_end(session.id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def issued(self, session_id: str) -> bool:
+        """Whether session_id is a live session this store handed out (memory only, no disk lookup)."""
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            return session is not None and not self._expired(session)
+
+    def get(self, session_id: str = None) -> Session:
+        """The live session for session_id, or a fresh one if it is unknown or expired."""
+        with self._lock:
+            session = None
+            if session_id:
+                session = self._sessions.get(session_id) or self._load(session_id)
+                if session is not None and self._expired(session):
+                    self._sessions.pop(session_id, None)
+                    self.expired += 1
+                    session = None
+            if session is None:
+                session = Session(uuid.uuid4().hex)
+                self.created += 1
+            self._put(session)
+            return session
+
+    def append(self, session: Session, question: str, answer: str):
+        """Record one exchange, folding messages that leave the recent window into the summary."""
+        with self._lock:
+            session.recent.extend([
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer},
+            ])
+            if len(session.recent) > RECENT_MESSAGES:
+                folded = session.recent[:-RECENT_MESSAGES]
+                session.recent = session.recent[-RECENT_MESSAGES:]
+                session.summary = self.summarize(session.summary, folded)
+            session.turns += 1
+            session.updated = time.time()
+            self._put(session)
+            self._save(session)
+
+    def purge(self):
+        """Drop expired sessions from memory and SQLite."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for session_id in [s.id for s in self._sessions.values() if s.updated < cutoff]:
+                del self._sessions[session_id]
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,))
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "persistent": self._conn is not None,
+            "created": self.created,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,78 @@
+import time
+import asyncio
+
+
+def build_pipeline():
+    # The heavy imports (langchain_openai, langchain_chroma, chromadb) happen here, off the event loop
+    from app.services.chatbot import get_pipeline
+    return get_pipeline()
+
+
+class PipelineLoader:
+    """
+    Imports the chatbot module and builds the shared pipeline in a worker thread,
+    so the server answers health checks while the heavy dependencies load.
+    start() begins loading (the lifespan calls it as soon as the server is up);
+    get() waits for the pipeline, starting the load itself if nothing has.
+    """
+
+    def __init__(self, build=build_pipeline):
+        self.build = build
+        self.pipeline = None
+        self.error = None
+        self.seconds = None
+        self._task = None
+
+    @property
+    def state(self) -> str:
+        if self.pipeline is not None:
+            return "loaded"
+        if self.error is not None:
+            return "failed"
+        return "loading"
+
+    def start(self, on_loaded=None):
+        """Load in the background; `on_loaded(pipeline)` then runs on the event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._load(on_loaded))
+        return self._task
+
+    async def _load(self, on_loaded):
+        start = time.perf_counter()
+        try:
+            pipeline = await asyncio.to_thread(self.build)
+        except Exception as e:
+            self.error = e
+            print(f"⚠ Pipeline failed to load: {e!r}")
+            return None
+        self.seconds = time.perf_counter() - start
+        self.pipeline = pipeline
+        print(f"🧠 Pipeline loaded in {self.seconds:.1f}s")
+        if on_loaded is not None:
+            on_loaded(pipeline)
+        return pipeline
+
+    async def get(self):
+        if self.pipeline is not None:
+            return self.pipeline
+        # Shielded: a request that goes away must not cancel the load for everyone else
+        pipeline = await asyncio.shield(self.start())
+        if pipeline is None:
+            raise self.error
+        return pipeline
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            # The worker thread can't be interrupted; stop waiting for it
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "seconds": round(self.seconds, 2) if self.seconds is not None else None,
+            "error": repr(self.error) if self.error is not None else None,
+        }
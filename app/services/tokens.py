@@ -0,0 +1,22 @@
+import math
+from functools import lru_cache
+
+ENCODING_NAME = "cl100k_base"  # text-embedding-3-* and gpt-4o-mini are both close enough to cl100k for budgeting
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    # tiktoken downloads its BPE file on first use; offline we fall back to an estimate
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of text (exact with tiktoken, ~4 characters per token otherwise)."""
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
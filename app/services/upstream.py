@@ -0,0 +1,186 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import httpx
+
+LLM_TIMEOUT = float(os.getenv("RAFIKI_LLM_TIMEOUT", "20"))  # seconds per answer (retries included) or per stream gap
+EMBED_TIMEOUT = float(os.getenv("RAFIKI_EMBED_TIMEOUT", "4"))  # seconds per query embedding, retries included
+BATCH_TIMEOUT = 60.0  # per attempt for ingestion batches, which can be large
+CONNECT_TIMEOUT = 3.0
+UPSTREAM_RETRIES = int(os.getenv("RAFIKI_UPSTREAM_RETRIES", "2"))  # the openai SDK backs off with jitter, honouring Retry-After
+MAX_CONNECTIONS = int(os.getenv("RAFIKI_UPSTREAM_CONNECTIONS", "100"))
+KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+BREAKER_THRESHOLD = float(os.getenv("RAFIKI_BREAKER_THRESHOLD", "0.5"))  # failure share that opens the circuit
+BREAKER_MIN_CALLS = int(os.getenv("RAFIKI_BREAKER_MIN_CALLS", "10"))  # ...once the window holds this many calls
+BREAKER_WINDOW = float(os.getenv("RAFIKI_BREAKER_WINDOW", "30"))  # seconds of call outcomes considered
+BREAKER_COOLDOWN = float(os.getenv("RAFIKI_BREAKER_COOLDOWN", "30"))  # seconds the circuit stays open
+
+# HTTP/2 multiplexes concurrent calls over one connection, but needs the optional h2 package
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Tracks call outcomes over the last BREAKER_WINDOW seconds. When at least
+    BREAKER_MIN_CALLS calls were made and the failure share reaches
+    BREAKER_THRESHOLD, the circuit opens: calls fail immediately with
+    CircuitOpenError for BREAKER_COOLDOWN seconds, so callers can serve their
+    fallback at once instead of waiting out the timeout. After the cool-down a
+    single trial call is let through (half-open); success closes the circuit,
+    failure re-opens it for another cool-down.
+    """
+
+    def __init__(self, name: str, threshold: float = BREAKER_THRESHOLD, min_calls: int = BREAKER_MIN_CALLS,
+                 window: float = BREAKER_WINDOW, cooldown: float = BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self._outcomes = deque()  # (monotonic time, ok)
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                self.short_circuited += 1
+                return False
+            self._probing = True
+            return True
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, ok = self._outcomes.popleft()
+            self._failures -= not ok
+
+    def record(self, ok: bool):
+        now = time.monotonic()
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                if ok:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                    self._failures = 0
+                    print(f"🔌 {self.name} circuit closed, upstream recovered")
+                else:
+                    self._opened_at = now
+                return
+            if self._opened_at is not None:
+                return  # a call that started before the circuit opened
+            self._outcomes.append((now, ok))
+            self._failures += not ok
+            self._trim(now)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures / calls >= self.threshold:
+                self._opened_at = now
+                self.times_opened += 1
+                print(f"🔌 {self.name} circuit open: {self._failures}/{calls} calls failed, "
+                      f"fallback for {self.cooldown:.0f}s")
+
+    def release(self):
+        """A call ended without a verdict on the upstream (e.g. the client went away)."""
+        with self._lock:
+            self._probing = False
+
+    @contextmanager
+    def guard(self):
+        """Run one upstream call under the breaker; raises CircuitOpenError while open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit open")
+        try:
+            yield
+        except Exception:
+            self.record(False)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.record(True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = len(self._outcomes)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_failure_rate": round((self._failures / calls) * 100, 1) if calls else 0,
+                "times_opened": self.times_opened,
+                "short_circuited": self.short_circuited,
+            }
+
+
+async def with_idle_timeout(stream, seconds: float):
+    """Re-yield an async stream, raising TimeoutError if the first item or any later gap takes over `seconds`."""
+    iterator = stream.__aiter__()
+    while True:
+        try:
+            item = await asyncio.wait_for(iterator.__anext__(), seconds)
+        except StopAsyncIteration:
+            return
+        yield item
+
+
+# One connection pool per process for every OpenAI call (chat and embeddings share the host)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY)
+
+
+def http_client() -> httpx.Client:
+    with _clients_lock:
+        if "sync" not in _clients:
+            _clients["sync"] = httpx.Client(http2=HTTP2, limits=_limits())
+        return _clients["sync"]
+
+
+def async_http_client() -> httpx.AsyncClient:
+    with _clients_lock:
+        if "async" not in _clients:
+            _clients["async"] = httpx.AsyncClient(http2=HTTP2, limits=_limits())
+        return _clients["async"]
+
+
+def openai_client_options(timeout: float) -> dict:
+    """Keyword arguments for ChatOpenAI / OpenAIEmbeddings: shared pools, per-attempt timeout, SDK retries."""
+    return {
+        "timeout": httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+        "max_retries": UPSTREAM_RETRIES,
+        "http_client": http_client(),
+        "http_async_client": async_http_client(),
+    }
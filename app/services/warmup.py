@@ -0,0 +1,213 @@
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+
+from app.services.cache import read_kb_version
+from app.services.coalesce import normalize_question
+from app.services.paths import project_path
+
+WARMUP = os.getenv("RAFIKI_WARMUP", "1") == "1"
+WARMUP_TOP = int(os.getenv("RAFIKI_WARMUP_TOP", "20"))  # most frequently asked questions to precompute
+WARMUP_INTERVAL = float(os.getenv("RAFIKI_WARMUP_INTERVAL", "60"))  # seconds between knowledge base checks
+WARMUP_CONCURRENCY = 2  # answers computed at once, so warm-up never crowds out real traffic
+# Extra questions to precompute, separated by '|'
+WARMUP_QUESTIONS = [q.strip() for q in os.getenv("RAFIKI_WARMUP_QUESTIONS", "").split("|") if q.strip()]
+QUESTION_LOG_DB = os.getenv("RAFIKI_QUESTION_LOG", project_path("questions.sqlite3"))
+QUESTION_LOG_SIZE = 50000  # distinct questions kept; the rarest are dropped beyond twice this
+
+# The suggested prompts offered by the Streamlit sidebar (interface.py) and the React quick actions
+SUGGESTED_PROMPTS = [
+    "Where is the IT office located and what are the extensions?",
+    "My portal account is locked, what should I do?",
+    "Show me the steps to apply for employee leave.",
+]
+
+
+class QuestionLog:
+    """
+    How often each first-turn question is asked, keyed by its normalised text
+    (the most recent phrasing is kept for display and warm-up). record() only
+    touches memory; flush() upserts what changed since the last flush and
+    prunes the table to the `max_questions` most frequent, so a restart never
+    reloads more than that.
+    """
+
+    def __init__(self, path: str = QUESTION_LOG_DB, max_questions: int = QUESTION_LOG_SIZE):
+        self.path = path
+        self.max_questions = max_questions
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions (key TEXT PRIMARY KEY, question TEXT NOT NULL, n INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+        self._counts = {key: [question, n] for key, question, n in
+                        self._conn.execute("SELECT key, question, n FROM questions")}
+        self._pending = {}  # key -> [question, count since the last flush]
+
+    def record(self, question: str):
+        key = normalize_question(question)
+        if not key:
+            return
+        with self._lock:
+            entry = self._counts.setdefault(key, [question, 0])
+            entry[0] = question
+            entry[1] += 1
+            pending = self._pending.setdefault(key, [question, 0])
+            pending[0] = question
+            pending[1] += 1
+            if len(self._counts) > 2 * self.max_questions:
+                keep = sorted(self._counts.items(), key=lambda item: item[1][1], reverse=True)[:self.max_questions]
+                self._counts = dict(keep)
+
+    def top(self, n: int) -> list:
+        with self._lock:
+            ranked = sorted(self._counts.values(), key=lambda entry: entry[1], reverse=True)
+        return [question for question, _ in ranked[:n]]
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO questions (key, question, n) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET question = excluded.question, n = n + excluded.n",
+                [(key, question, n) for key, (question, n) in pending.items()],
+            )
+            (rows,) = self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()
+            if rows > self.max_questions:
+                self._conn.execute(
+                    "DELETE FROM questions WHERE key NOT IN "
+                    "(SELECT key FROM questions ORDER BY n DESC LIMIT ?)",
+                    (self.max_questions,),
+                )
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def stats(self) -> dict:
+        return {"distinct_questions": len(self._counts), "unflushed": len(self._pending)}
+
+
+class Warmup:
+    """
+    Precomputes answers for the top questions into the semantic cache: the
+    suggested prompts, RAFIKI_WARMUP_QUESTIONS and the most frequently asked
+    questions from the QuestionLog. Runs in the background after startup and
+    again whenever the knowledge base version changes (which clears the cache).
+    `ready` turns True once the first pass has finished.
+    """
+
+    def __init__(self, pipeline, questions: QuestionLog = None, suggested: list = SUGGESTED_PROMPTS,
+                 extra: list = WARMUP_QUESTIONS, top: int = WARMUP_TOP, interval: float = WARMUP_INTERVAL,
+                 concurrency: int = WARMUP_CONCURRENCY):
+        self.pipeline = pipeline
+        self.questions = questions
+        self.suggested = suggested
+        self.extra = extra
+        self.top = top
+        self.interval = interval
+        self.concurrency = concurrency
+        self.ready = False
+        self.kb_version = None
+        self._task = None
+
+        self.runs = 0
+        self.last_run = {}
+        self.last_seconds = 0.0
+
+    def candidates(self) -> list:
+        """Questions to warm, in priority order, without normalised duplicates."""
+        popular = self.questions.top(self.top) if self.questions is not None else []
+        seen, selected = set(), []
+        for question in [*self.suggested, *self.extra, *popular]:
+            key = normalize_question(question)
+            if key and key not in seen:
+                seen.add(key)
+                selected.append(question)
+        return selected
+
+    async def run(self):
+        self.kb_version = read_kb_version(self.pipeline.db_path)
+        questions = self.candidates()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+
+        async def warm(question: str) -> str:
+            async with semaphore:
+                try:
+                    return await self.pipeline.warm(question)
+                except Exception as e:
+                    print(f"⚠ Warm-up failed for '{question}': {e!r}")
+                    return "failed"
+
+        outcomes = await asyncio.gather(*(warm(q) for q in questions))
+        self.last_run = {outcome: outcomes.count(outcome) for outcome in set(outcomes)}
+        self.last_seconds = time.perf_counter() - start
+        self.runs += 1
+        self.ready = True
+        print(f"🔥 Warm-up done in {self.last_seconds:.1f}s: {len(questions)} questions {self.last_run}")
+
+    async def watch(self):
+        await self.run()
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.questions is not None:
+                await asyncio.to_thread(self.questions.flush)
+            if read_kb_version(self.pipeline.db_path) != self.kb_version:
+                print("♻️ Knowledge base changed, warming up again")
+                await self.run()
+
+    def start(self):
+        """Warm up in the background (FastAPI lifespan); readiness flips when the first pass is done."""
+        if not WARMUP:
+            self.ready = True
+            return
+        self._task = asyncio.create_task(self.watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.questions is not None:
+            self.questions.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": WARMUP,
+            "ready": self.ready,
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_seconds": round(self.last_seconds, 2),
+            "questions": self.questions.stats() if self.questions is not None else None,
+        }
+
+
+# Process-wide question log, opened on first use
+_question_log = None
+_question_log_lock = threading.Lock()
+
+
+def get_question_log() -> QuestionLog:
+    global _question_log
+    with _question_log_lock:
+        if _question_log is None:
+            _question_log = QuestionLog()
+        return _question_log
+
+
+def close_question_log():
+    global _question_log
+    with _question_log_lock:
+        if _question_log is not None:
+            _question_log.close()
+            _question_log = None
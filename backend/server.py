@@ -3,14 +3,14 @@ Rafiki IT - Backend Server
 Provides chat functionality for MOHI IT Support
 """
 
-import os
 import sys
+import json
 from pathlib import Path
 from contextlib import asynccontextmanager
 
-import httpx
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from dotenv import load_dotenv
@@ -21,94 +21,95 @@ load_dotenv()
 # Add the parent app directory to path for importing the chatbot
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# Built-in responses for when the full chatbot isn't available; same curated
+# answers and matcher that the pipeline's intent router serves
+from app.services.admission import (
+    OVERLOAD_MODE, HeldStreamingResponse, Rejected, get_admission, rate_limit_keys,
+)
+from app.services.intents import IntentRouter
+from app.services.metrics import REGISTRY, MetricsMiddleware
+from app.services.startup import PipelineLoader
+from app.services.warmup import WARMUP, Warmup, close_question_log, get_question_log
+
 # Track chatbot availability
 CHATBOT_AVAILABLE = False
-get_rafiki_answer = None
-
-# Try to import the chatbot service directly
-try:
-    # Change working directory for correct path resolution
-    original_cwd = os.getcwd()
-    os.chdir(Path(__file__).parent.parent)
-    
-    from app.services.chatbot import get_rafiki_answer as _get_rafiki_answer
-    get_rafiki_answer = _get_rafiki_answer
-    CHATBOT_AVAILABLE = True
-    print("✓ Chatbot service loaded successfully")
-    
-    os.chdir(original_cwd)
-except ImportError as e:
-    print(f"⚠ Chatbot service not available: {e}")
-    print("  Using built-in response mode")
-except Exception as e:
-    print(f"⚠ Chatbot initialization error: {e}")
-    print("  Using built-in response mode")
-
-# Built-in responses for when the full chatbot isn't available
-BUILTIN_RESPONSES = {
-    "it office": """The **MOHI IT Office** is located at the **Pangani Head Office**. 
-
-**Contact Information:**
-- 📞 Extension: **303** or **304**
-- 📍 Location: Pangani Head Office, Nairobi
-
-Feel free to reach out during working hours (8:00 AM - 5:00 PM). God bless! 🙏""",
-    
-    "locked": """I'm sorry to hear you're locked out of your portal! Here's how to get help:
-
-**Steps to Resolve Portal Lockout:**
-1. Contact the IT department at **Extension 303 or 304**
-2. Provide your **Staff ID** and **Username**
-3. Wait for password reset (usually within 30 minutes)
+achat = None
+get_pipeline = None
+stream_rafiki_answer = None
 
-**Tip:** While waiting, you can verify your internet connection is stable.
-
-Don't worry, we'll get you back in quickly! 🔑""",
-    
-    "leave": """Here's how to apply for leave through the MOHI Portal:
-
-**Steps to Apply for Leave:**
-1. Log into the **MOHI Staff Portal**
-2. Navigate to **Employee** > **Leave Application**
-3. Select the **Leave Type** (Annual, Sick, etc.)
-4. Enter your **Start Date** and **End Date**
-5. Add any required **Supporting Documents**
-6. Click **Submit** and wait for supervisor approval
-
-Need help? Contact HR at the Pangani office. 📝""",
+def load_chatbot():
+    """
+    Import the chatbot service and build its pipeline. Runs in a worker thread
+    after startup (see PipelineLoader), so the health endpoints answer at once
+    instead of waiting on the LangChain / Chroma imports.
+    """
+    global CHATBOT_AVAILABLE, achat, get_pipeline, stream_rafiki_answer
+    try:
+        from app.services.chatbot import achat as _achat
+        from app.services.chatbot import get_pipeline as _get_pipeline
+        from app.services.chatbot import stream_rafiki_answer as _stream_rafiki_answer
+        print("✓ Chatbot service loaded successfully")
+        # Build the RAG pipeline once; every /api/chat request reuses it
+        pipeline = _get_pipeline()
+    except ImportError as e:
+        print(f"⚠ Chatbot service not available: {e}")
+        print("  Using built-in response mode")
+        raise
+    except Exception as e:
+        print(f"⚠ Chatbot initialization error: {e}")
+        print("  Using built-in response mode")
+        raise
+    achat = _achat
+    get_pipeline = _get_pipeline
+    stream_rafiki_answer = _stream_rafiki_answer
+    CHATBOT_AVAILABLE = True
+    return pipeline
 
-    "default": """Thank you for reaching out! I'm Rafiki, your friendly IT assistant for MOHI.
+loader = PipelineLoader(build=load_chatbot)
 
-I'm currently in **limited mode**, but I can still help guide you! Here are some quick options:
+async def chatbot_ready() -> bool:
+    """Wait for the chatbot to finish loading; False means built-in responses only"""
+    try:
+        await loader.get()
+    except Exception:
+        pass
+    return CHATBOT_AVAILABLE
 
-• **IT Office Location** - Our team is at Pangani (Ext 303/304)
-• **Portal Issues** - Contact IT for password resets
-• **Leave Applications** - Use Employee > Leave in the portal
+builtin_router = IntentRouter()
 
-For complex technical issues, please contact the IT department directly. May God bless your work today! 🙏"""
-}
+# Bounded concurrency, a short wait queue and per-session / per-address rate limits for the chat endpoints
+admission = get_admission()
 
 def get_builtin_response(message: str) -> str:
     """Get a built-in response based on message content"""
-    message_lower = message.lower()
-    
-    if "office" in message_lower and ("it" in message_lower or "location" in message_lower or "where" in message_lower):
-        return BUILTIN_RESPONSES["it office"]
-    elif "lock" in message_lower or "password" in message_lower or "reset" in message_lower:
-        return BUILTIN_RESPONSES["locked"]
-    elif "leave" in message_lower or "apply" in message_lower or "vacation" in message_lower:
-        return BUILTIN_RESPONSES["leave"]
-    else:
-        return BUILTIN_RESPONSES["default"]
+    return builtin_router.fallback(message)
+
+def start_warmup(pipeline):
+    # Precompute answers for the top questions in the background; health reports ready once done
+    # Only counted while warm-up runs: its watch loop is what flushes the log
+    if WARMUP:
+        pipeline.questions = get_question_log()
+    app.state.warmup = Warmup(pipeline, pipeline.questions)
+    app.state.warmup.start()
+    print("   Chatbot Mode: AI-Powered")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     print("=" * 50)
     print("🚀 Rafiki IT Backend Starting...")
-    print(f"   Chatbot Mode: {'AI-Powered' if CHATBOT_AVAILABLE else 'Built-in Responses'}")
+    print("   Chatbot Mode: loading the AI chatbot in the background")
     print("=" * 50)
+    loader.start(on_loaded=start_warmup)
     yield
+    await loader.stop()
+    warmup = getattr(app.state, "warmup", None)
+    if warmup is not None:
+        await warmup.stop()
+        close_question_log()
+    # Write out sessions still queued for the background writer
+    if loader.state == "loaded":
+        loader.pipeline.sessions.close()
     print("👋 Rafiki IT Backend Shutting Down...")
 
 app = FastAPI(
@@ -125,8 +126,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Request counts, latency and in-flight gauge per endpoint, plus the optional Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 # Request/Response Models
 class ChatMessage(BaseModel):
     role: str
@@ -134,47 +139,91 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
-    history: Optional[List[ChatMessage]] = []
+    session_id: Optional[str] = None  # from the previous reply; omit to start a conversation
+    history: Optional[List[ChatMessage]] = []  # legacy clients: full history, answered without a session
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: Optional[str] = None
+    answer_id: Optional[str] = None
 
 class HealthResponse(BaseModel):
     status: str
     service: str
     chatbot_mode: str
 
-@app.get("/", response_model=HealthResponse)
-async def health_check():
-    """Health check endpoint"""
+def health(response: Response) -> HealthResponse:
+    """
+    Answers immediately: 'loading' while the chatbot loads, then 'warming_up'
+    until the top answers are precomputed (both 503), then 'online'. If the
+    chatbot fails to load the service is online in built-in mode.
+    """
+    warmup = getattr(app.state, "warmup", None)
+    if loader.state == "loading":
+        status = "loading"
+    elif CHATBOT_AVAILABLE and warmup is not None and not warmup.ready:
+        status = "warming_up"
+    else:
+        status = "online"
+    if status != "online":
+        response.status_code = 503
     return HealthResponse(
-        status="online",
+        status=status,
         service="Rafiki IT Backend",
         chatbot_mode="ai-powered" if CHATBOT_AVAILABLE else "builtin"
     )
 
+@app.get("/", response_model=HealthResponse)
+async def health_check(response: Response):
+    """Health check endpoint"""
+    return health(response)
+
 @app.get("/api/health", response_model=HealthResponse)
-async def api_health_check():
+async def api_health_check(response: Response):
     """API Health check endpoint"""
-    return HealthResponse(
-        status="online",
-        service="Rafiki IT Backend",
-        chatbot_mode="ai-powered" if CHATBOT_AVAILABLE else "builtin"
-    )
+    return health(response)
+
+def chat_rate_limit_keys(http: Request, request: ChatRequest) -> list:
+    """Client address, plus the session once the loaded pipeline's SessionStore has issued it"""
+    sessions = loader.pipeline.sessions if loader.state == "loaded" else None
+    return rate_limit_keys(http, request.session_id, sessions)
+
+def turned_away(e: Rejected, request: ChatRequest, endpoint: str, stream: bool = False):
+    """
+    A request admission control turned away: 429 with Retry-After when rate
+    limited; when overloaded, the built-in response (RAFIKI_OVERLOAD=builtin)
+    or 503 with Retry-After.
+    """
+    if e.status == 503 and OVERLOAD_MODE == "builtin":
+        REGISTRY.inc("rafiki_builtin_fallbacks_total", endpoint=endpoint)
+        if stream:
+            return StreamingResponse(
+                builtin_sse_frames(request.message),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        return ChatResponse(response=get_builtin_response(request.message), session_id=request.session_id)
+    return JSONResponse({"detail": "Too many requests" if e.status == 429 else "Rafiki is busy",
+                         "reason": e.reason}, status_code=e.status, headers=e.headers)
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_with_rafiki(request: ChatRequest):
+async def chat_with_rafiki(request: ChatRequest, http: Request):
     """
     Chat endpoint that either:
     1. Calls the AI-powered chatbot service (if available)
     2. Uses built-in intelligent responses
     """
     try:
-        if CHATBOT_AVAILABLE and get_rafiki_answer:
+        ticket = await admission.enter(chat_rate_limit_keys(http, request))
+    except Rejected as e:
+        return turned_away(e, request, "/api/chat")
+    try:
+        if await chatbot_ready():
             # Direct call to AI chatbot service
             history_dicts = [{"role": msg.role, "content": msg.content} for msg in (request.history or [])]
-            answer = get_rafiki_answer(request.message, chat_history=history_dicts)
-            return ChatResponse(response=answer)
+            reply = await achat(request.message, session_id=request.session_id,
+                                            chat_history=history_dicts)
+            return ChatResponse(**reply)
         else:
             # Use built-in responses
             response_text = get_builtin_response(request.message)
@@ -182,9 +231,73 @@ async def chat_with_rafiki(request: ChatRequest):
             
     except Exception as e:
         print(f"Chat error: {str(e)}")
+        REGISTRY.inc("rafiki_builtin_fallbacks_total", endpoint="/api/chat")
         # Fallback to built-in response on any error
         response_text = get_builtin_response(request.message)
         return ChatResponse(response=response_text)
+    finally:
+        ticket.release()
+
+def sse_event(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def builtin_sse_frames(message: str):
+    """The built-in response as a single-token SSE stream"""
+    response_text = get_builtin_response(message)
+    yield sse_event("metadata", {"sources": []})
+    yield sse_event("token", {"content": response_text})
+    yield sse_event("done", {"response": response_text})
+
+async def chat_event_stream(request: ChatRequest):
+    """
+    Stream AI tokens when available. If the chain fails before anything was
+    sent, fall back to the built-in response so the client still gets an answer.
+    """
+    if not await chatbot_ready():
+        for frame in builtin_sse_frames(request.message):
+            yield frame
+        return
+
+    history_dicts = [{"role": msg.role, "content": msg.content} for msg in (request.history or [])]
+    started = False
+    try:
+        async for frame in stream_rafiki_answer(request.message, chat_history=history_dicts,
+                                                session_id=request.session_id):
+            started = True
+            yield frame
+    except Exception as e:
+        print(f"Chat stream error: {str(e)}")
+        REGISTRY.inc("rafiki_builtin_fallbacks_total", endpoint="/api/chat/stream")
+        if not started:
+            for frame in builtin_sse_frames(request.message):
+                yield frame
+        else:
+            yield sse_event("error", {"detail": "stream interrupted"})
+
+@app.post("/api/chat/stream")
+async def stream_chat_with_rafiki(request: ChatRequest, http: Request):
+    """Server-Sent Events variant of /api/chat; the admission slot is held until the stream ends"""
+    try:
+        ticket = await admission.enter(chat_rate_limit_keys(http, request))
+    except Rejected as e:
+        return turned_away(e, request, "/api/chat/stream", stream=True)
+    return HeldStreamingResponse(
+        ticket,
+        chat_event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/admission/stats")
+async def get_admission_stats():
+    """Chat requests being answered, waiting, and turned away (rate limited or overloaded)"""
+    return admission.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text format: stage latencies, tokens, cache hit rates, in-flight requests, errors"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
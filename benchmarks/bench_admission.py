@@ -0,0 +1,227 @@
+"""
+Admission control under overload (app/services/admission.py), with both apps
+as real uvicorn processes in front of a slow fake LLM: every completion takes
+--chat-latency and only --llm-concurrency are generated at once, so the
+upstream answers at most llm_concurrency / chat_latency questions a second.
+An open-loop generator sends --rate unique questions a second (more than that)
+for --seconds, each with the 30 s client timeout interface.py uses.
+
+Configurations (RAFIKI_USER_RATE=0 and RAFIKI_CLIENT_RATE=0 throughout: every
+question comes from one address, and the per-session limit is shown separately):
+  unbounded  no admission limit; every request waits on the saturated LLM
+  reject     RAFIKI_MAX_CONCURRENT / RAFIKI_MAX_QUEUE / RAFIKI_QUEUE_TIMEOUT
+             bound the work taken on; the rest get 503 with Retry-After
+  builtin    the same limits; the rest get the built-in responses
+
+Reported per run: latency of the AI answers (p50/p99/max), latency of the
+requests turned away, how many were answered, turned away or timed out, and
+the Retry-After values sent. Then a burst of --burst requests from one
+session the server issued, against the default per-session limit: those past
+RAFIKI_USER_BURST come back 429 with Retry-After.
+
+    python benchmarks/bench_admission.py --rate 8 --seconds 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import SAMPLE_QUESTIONS
+from benchmarks.fake_openai import free_port
+from benchmarks.load_test import FIXTURE_PATH, TARGETS, build_fixture, percentile, spawn, wait_healthy
+
+REPORT_PATH = ROOT / "test_reports" / "admission_results.json"
+CLIENT_TIMEOUT = 30.0  # interface.py's requests.post timeout
+STATS_PATHS = {"main": "/admission/stats", "backend": "/api/admission/stats"}
+
+
+async def post(client: httpx.AsyncClient, path: str, body: dict) -> dict:
+    start = time.perf_counter()
+    sample = {}
+    try:
+        response = await client.post(path, json=body)
+        sample["status"] = response.status_code
+        sample["retry_after"] = response.headers.get("retry-after")
+        if response.status_code == 200:
+            sample["fallback"] = not response.json().get("answer_id")
+            sample["session_id"] = response.json().get("session_id")
+    except httpx.HTTPError as e:
+        sample["status"] = type(e).__name__
+    sample["seconds"] = time.perf_counter() - start
+    return sample
+
+
+async def open_loop(base_url: str, path: str, rate: float, seconds: float) -> list:
+    """Send `rate` unique questions a second, whether or not earlier ones have been answered."""
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=CLIENT_TIMEOUT, limits=limits) as client:
+        tasks = []
+        start = time.perf_counter()
+        for n in range(int(rate * seconds)):
+            await asyncio.sleep(max(0.0, start + n / rate - time.perf_counter()))
+            question = f"{SAMPLE_QUESTIONS[n % len(SAMPLE_QUESTIONS)]} (ticket {n})"
+            tasks.append(asyncio.create_task(post(client, path, {"message": question})))
+        return await asyncio.gather(*tasks)
+
+
+def summarize(samples: list) -> dict:
+    def ms(values):
+        values = sorted(v * 1000 for v in values)
+        return {"p50": round(percentile(values, 50), 1), "p99": round(percentile(values, 99), 1),
+                "max": round(values[-1], 1) if values else 0}
+
+    answered = [s for s in samples if s["status"] == 200 and not s.get("fallback")]
+    turned_away = [s for s in samples if s["status"] in (429, 503) or (s["status"] == 200 and s.get("fallback"))]
+    statuses = {}
+    for s in samples:
+        key = f"{s['status']} builtin" if s.get("fallback") else str(s["status"])
+        statuses[key] = statuses.get(key, 0) + 1
+    retry_after = sorted(int(s["retry_after"]) for s in samples if s.get("retry_after"))
+    return {
+        "requests": len(samples),
+        "statuses": statuses,
+        "ai_answers": len(answered),
+        "ai_answer_ms": ms(s["seconds"] for s in answered),
+        "turned_away": len(turned_away),
+        "turned_away_ms": ms(s["seconds"] for s in turned_away),
+        "all_ms": ms(s["seconds"] for s in samples),
+        "retry_after_s": {"min": retry_after[0], "max": retry_after[-1]} if retry_after else None,
+    }
+
+
+async def session_burst(base_url: str, path: str, burst: int) -> dict:
+    """`burst` requests at once from one session, after a first message that opens it."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=CLIENT_TIMEOUT) as client:
+        # Only session IDs the server issued get their own bucket
+        opener = await post(client, path, {"message": "Reset my password"})
+        samples = await asyncio.gather(*(post(client, path, {"message": f"Reset my password ({n})",
+                                                             "session_id": opener.get("session_id")})
+                                         for n in range(burst)))
+    statuses = {}
+    for s in samples:
+        statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+    limited = [s for s in samples if s["status"] == 429]
+    return {
+        "requests": burst,
+        "statuses": statuses,
+        "retry_after_s": sorted({int(s["retry_after"]) for s in limited}),
+        "rate_limited_ms_max": round(max(s["seconds"] for s in limited) * 1000, 1) if limited else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["main", "backend", "both"], default="both")
+    parser.add_argument("--rate", type=float, default=8.0, help="questions sent per second")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--chat-latency", type=float, default=2.0, help="fake LLM time per completion")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="completions the fake LLM generates at once")
+    parser.add_argument("--max-concurrent", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=8)
+    parser.add_argument("--queue-timeout", type=float, default=2.0)
+    parser.add_argument("--burst", type=int, default=10, help="requests at once from one session")
+    parser.add_argument("--output", default=str(REPORT_PATH))
+    args = parser.parse_args()
+
+    targets = ["main", "backend"] if args.target == "both" else [args.target]
+    limits = {"RAFIKI_MAX_CONCURRENT": str(args.max_concurrent), "RAFIKI_MAX_QUEUE": str(args.max_queue),
+              "RAFIKI_QUEUE_TIMEOUT": str(args.queue_timeout)}
+    configs = {
+        "unbounded": {"RAFIKI_MAX_CONCURRENT": "1000000", "RAFIKI_USER_RATE": "0", "RAFIKI_CLIENT_RATE": "0"},
+        "reject": dict(limits, RAFIKI_OVERLOAD="reject", RAFIKI_USER_RATE="0", RAFIKI_CLIENT_RATE="0"),
+        "builtin": dict(limits, RAFIKI_OVERLOAD="builtin", RAFIKI_USER_RATE="0", RAFIKI_CLIENT_RATE="0"),
+    }
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "rate_per_s": args.rate,
+        "seconds": args.seconds,
+        "upstream": {"chat_latency_s": args.chat_latency, "llm_concurrency": args.llm_concurrency,
+                     "capacity_per_s": round(args.llm_concurrency / args.chat_latency, 2)},
+        "limits": limits,
+        "targets": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.path.join(tmp, "servers.log"), "w") as log:
+        fake_port = free_port()
+        fake_url = f"http://127.0.0.1:{fake_port}"
+        fake = spawn([str(ROOT / "benchmarks" / "fake_openai.py"), "--port", str(fake_port), "--latency", "0.05",
+                      "--chat-latency", str(args.chat_latency), "--chat-concurrency", str(args.llm_concurrency)],
+                     ROOT, dict(os.environ), log)
+        try:
+            wait_healthy(f"{fake_url}/stats", fake)
+            if not FIXTURE_PATH.exists():
+                build_fixture(FIXTURE_PATH, fake_url)
+
+            def start(target: str, name: str, overrides: dict):
+                app, app_dir, _ = TARGETS[target]
+                port = free_port()
+                env = {key: value for key, value in os.environ.items() if not key.startswith(
+                    ("RAFIKI_MAX_", "RAFIKI_QUEUE_", "RAFIKI_OVERLOAD", "RAFIKI_USER_", "RAFIKI_CLIENT_"))}
+                env.update(overrides, OPENAI_API_KEY="fake", OPENAI_BASE_URL=f"{fake_url}/v1",
+                           OPENAI_API_BASE=f"{fake_url}/v1", RAFIKI_DB_PATH=str(FIXTURE_PATH),
+                           RAFIKI_EMBED_CACHE=os.path.join(tmp, f"{target}_{name}_embeddings.sqlite3"),
+                           RAFIKI_FEEDBACK_DB=os.path.join(tmp, f"{target}_{name}_feedback.sqlite3"),
+                           RAFIKI_QUESTION_LOG=os.path.join(tmp, f"{target}_{name}_questions.sqlite3"),
+                           RAFIKI_INTENT_ROUTER="0", ANONYMIZED_TELEMETRY="False")
+                server = spawn(["-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+                               app_dir, env, log)
+                base_url = f"http://127.0.0.1:{port}"
+                try:
+                    wait_healthy(f"{base_url}/", server)
+                except BaseException:
+                    server.terminate()
+                    raise
+                return server, base_url
+
+            for target in targets:
+                path = TARGETS[target][2]
+                results["targets"][target] = {}
+                for name, overrides in configs.items():
+                    server, base_url = start(target, name, overrides)
+                    try:
+                        summary = summarize(asyncio.run(open_loop(base_url, path, args.rate, args.seconds)))
+                        summary["admission"] = httpx.get(base_url + STATS_PATHS[target]).json()
+                    finally:
+                        server.terminate()
+                        server.wait()
+                    results["targets"][target][name] = summary
+                    print(f"🚦 {target} {name}: {summary['ai_answers']} AI answers, p50 "
+                          f"{summary['ai_answer_ms']['p50']} ms, p99 {summary['ai_answer_ms']['p99']} ms | "
+                          f"{summary['turned_away']} turned away | {summary['statuses']}")
+
+                # Default per-session limit
+                server, base_url = start(target, "burst", {})
+                try:
+                    burst = asyncio.run(session_burst(base_url, path, args.burst))
+                finally:
+                    server.terminate()
+                    server.wait()
+                results["targets"][target]["session_burst"] = burst
+                print(f"🪣 {target} session burst: {burst['statuses']}, Retry-After {burst['retry_after_s']}")
+        finally:
+            fake.terminate()
+            fake.wait()
+            log.flush()
+            if any(target not in results["targets"] for target in targets):
+                print(Path(log.name).read_text()[-4000:])
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"📄 Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
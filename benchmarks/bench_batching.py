@@ -0,0 +1,141 @@
+"""
+Micro-batching of query embeddings: throughput and latency of concurrent
+query-embedding misses through CachedEmbeddings, one model call per query
+(window 0) vs batches collected over a few milliseconds.
+
+Two fake embedders:
+  remote  the API round trip (--latency per call, a little per item) under a
+          request rate limit (--rps calls per second), like the OpenAI backend
+  local   a CPU model that runs one batch at a time, with a fixed cost per
+          call and a smaller cost per item, like the ONNX backend
+
+    python benchmarks/bench_batching.py --seconds 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import EMBEDDING_SIZE, BagOfWordsEmbeddings
+
+from app.services.batching import MicroBatcher
+from app.services.embeddings import CachedEmbeddings, EmbeddingStore
+
+
+class RemoteEmbedder(BagOfWordsEmbeddings):
+    def __init__(self, latency: float, per_item: float, rps: float):
+        super().__init__(EMBEDDING_SIZE)
+        self.latency = latency
+        self.per_item = per_item
+        self.interval = 1 / rps
+        self.next_slot = 0.0
+        self.calls = 0
+
+    async def _rate_limit(self):
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+    async def aembed_documents(self, texts):
+        await self._rate_limit()
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.per_item * len(texts))
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+
+class LocalEmbedder(BagOfWordsEmbeddings):
+    def __init__(self, fixed: float, per_item: float):
+        super().__init__(EMBEDDING_SIZE)
+        self.fixed = fixed
+        self.per_item = per_item
+        self.calls = 0
+        self._cpu = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._cpu:
+            self.calls += 1
+            time.sleep(self.fixed + self.per_item * len(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+async def drive(embeddings: CachedEmbeddings, concurrency: int, seconds: float) -> dict:
+    """Closed loop: each client embeds a fresh question as soon as its previous one returns."""
+    latencies = []
+    counter = iter(range(10 ** 9))
+    deadline = time.monotonic() + seconds
+
+    async def client():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            await embeddings.aembed_query(f"How do I reset my portal password, ticket {next(counter)}?")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "queries_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+    }
+
+
+def run(model_factory, window_ms: float, max_batch: int, concurrency: int, seconds: float, tmp: str) -> dict:
+    model = model_factory()
+    batcher = MicroBatcher(model.aembed_documents, window_ms=window_ms, max_batch=max_batch) if window_ms else None
+    store = EmbeddingStore(os.path.join(tmp, f"cache-{time.monotonic_ns()}.sqlite3"))
+    embeddings = CachedEmbeddings(model, model_name="fake", store=store, batcher=batcher)
+    result = asyncio.run(drive(embeddings, concurrency, seconds))
+    result["model_calls"] = model.calls
+    if batcher:
+        result["mean_batch"] = batcher.stats()["mean_batch"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5], help="batch windows in ms")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05, help="remote round trip in seconds")
+    parser.add_argument("--rps", type=float, default=50, help="remote calls allowed per second")
+    args = parser.parse_args()
+
+    models = {
+        "remote": lambda: RemoteEmbedder(latency=args.latency, per_item=0.0002, rps=args.rps),
+        "local": lambda: LocalEmbedder(fixed=0.008, per_item=0.0005),
+    }
+    results = {"max_batch": args.max_batch, "remote_rps_limit": args.rps}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in models.items():
+            results[name] = {}
+            for concurrency in args.concurrency:
+                for window in args.windows:
+                    r = run(factory, window, args.max_batch, concurrency, args.seconds, tmp)
+                    results[name][f"c{concurrency}_window_{window:g}ms"] = r
+                    print(f"   {name:>6} c={concurrency:<3} window={window:g}ms: {r['queries_per_s']:>7} q/s | "
+                          f"p50 {r['p50_ms']} ms | p99 {r['p99_ms']} ms | {r['model_calls']} calls", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Semantic answer cache: replay a query log dominated by the suggested prompts
+against a fake LLM with --delay seconds of latency, with and without the cache.
+
+    python benchmarks/bench_cache.py --requests 200 --delay 0.05
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import SAMPLE_QUESTIONS, build_fixture_db, make_embeddings, make_llm
+from app.services.cache import SemanticCache, bump_kb_version
+from app.services.chatbot import RafikiPipeline
+
+
+def query_log(n: int, seed: int = 7):
+    """80% suggested prompts, 20% one-off questions."""
+    rng = random.Random(seed)
+    return [
+        rng.choice(SAMPLE_QUESTIONS) if rng.random() < 0.8 else f"One-off question number {i} about the printer"
+        for i in range(n)
+    ]
+
+
+def replay(pipeline, questions):
+    latencies = []
+    for q in questions:
+        start = time.perf_counter()
+        pipeline.answer(q)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    questions = query_log(args.requests)
+    with tempfile.TemporaryDirectory() as db_path:
+        build_fixture_db(db_path)
+        uncached = RafikiPipeline(embeddings=make_embeddings(), llm=make_llm(delay=args.delay),
+                                  db_path=db_path, cache=SemanticCache(max_entries=0))
+        cached = RafikiPipeline(embeddings=make_embeddings(), llm=make_llm(delay=args.delay), db_path=db_path)
+
+        without_cache = replay(uncached, questions)
+        with_cache = replay(cached, questions)
+        llm_calls_saved = cached.cache.hits
+
+        bump_kb_version(db_path)  # simulate a re-ingestion
+        cached.answer(questions[0])
+        stats = cached.cache.stats()
+
+    print(f"📊 {args.requests} requests, LLM delay {args.delay}s")
+    print(f"   no cache: p50 {statistics.median(without_cache) * 1000:.1f} ms | total {sum(without_cache):.2f}s")
+    print(f"   cache:    p50 {statistics.median(with_cache) * 1000:.1f} ms | total {sum(with_cache):.2f}s")
+    print(f"   LLM calls saved: {llm_calls_saved}/{args.requests}")
+    print(f"   after re-ingestion: {stats}")
+
+
+if __name__ == "__main__":
+    main()
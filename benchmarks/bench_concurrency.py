@@ -0,0 +1,75 @@
+"""
+Load test: N concurrent /chat requests against a fake LLM that takes --delay seconds.
+
+The old handler called the sync chain inside `async def`, so requests queued
+behind each other (~N x delay). The async path should finish in ~1 x delay.
+
+    python benchmarks/bench_concurrency.py --concurrency 20 --delay 0.5
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import SAMPLE_QUESTIONS, build_fixture_db, make_embeddings, make_llm
+from app.services import chatbot
+from app.services.cache import SemanticCache
+
+
+def blocking_app() -> FastAPI:
+    """The pre-async handler: a sync chain call inside an async endpoint."""
+    app = FastAPI()
+
+    @app.post("/chat")
+    async def chat(request: dict):
+        return {"response": chatbot.get_rafiki_answer(request["message"], request.get("history", []))}
+
+    return app
+
+
+async def fire(app, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://rafiki") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/chat", json={"message": SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)], "history": []})
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.status_code for r in responses]
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    from app.main import app as async_app
+
+    with tempfile.TemporaryDirectory() as db_path:
+        build_fixture_db(db_path)
+        chatbot.init_pipeline(embeddings=make_embeddings(), llm=make_llm(delay=args.delay), db_path=db_path,
+                              cache=SemanticCache(max_entries=0))
+
+        blocking = asyncio.run(fire(blocking_app(), args.concurrency))
+        non_blocking = asyncio.run(fire(async_app, args.concurrency))
+
+    print(f"📊 {args.concurrency} concurrent requests, LLM delay {args.delay}s")
+    print(f"   blocking handler: {blocking:.2f}s ({blocking / args.delay:.1f} x delay)")
+    print(f"   async handler:    {non_blocking:.2f}s ({non_blocking / args.delay:.1f} x delay)")
+    return 0 if non_blocking < args.delay * 2 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Token-budgeted context: prompt tokens per request for the old "stuff all k
+chunks + last 5 messages" prompt vs ContextBuilder, over retrieval results
+made of neighbouring (150-char overlapping) chunks, re-ingested duplicates
+and chats of growing length.
+
+    python benchmarks/bench_context.py --requests 500
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.chatbot import RAFIKI_TEMPLATE
+from app.services.context import ContextBuilder
+from app.services.knowledge import CHUNK_OVERLAP, CHUNK_SIZE
+from benchmarks.fakes import SAMPLE_DOCS, SAMPLE_QUESTIONS
+
+
+def manual_chunks(paragraphs: int = 120, seed: int = 3) -> list:
+    """A long manual with distinct paragraphs (shuffled SAMPLE_DOCS vocabulary), split like run_ingestion."""
+    rng = random.Random(seed)
+    vocabulary = " ".join(SAMPLE_DOCS).split()
+    text = "\n".join(f"{p}. " + " ".join(rng.sample(vocabulary, 40)) for p in range(paragraphs))
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+                                              separators=[" ", ""])
+    return [Document(page_content=chunk, metadata={"source": "data/manual.docx"})
+            for chunk in splitter.split_text(text)]
+
+
+def retrieval_results(chunks: list, rng, k: int = 5) -> list:
+    """A ranked top-k: a run of neighbouring chunks, sometimes a duplicate from a second copy of the file."""
+    start = rng.randrange(len(chunks) - k)
+    results = chunks[start:start + k - 1]
+    if rng.random() < 0.5:
+        results.append(Document(page_content=results[0].page_content, metadata={"source": "data/manual (1).docx"}))
+    else:
+        results.append(chunks[rng.randrange(len(chunks))])
+    return results
+
+
+def chat_history(turns: int, rng) -> list:
+    history = []
+    for t in range(turns):
+        history.append({"role": "user", "content": rng.choice(SAMPLE_QUESTIONS)})
+        history.append({"role": "assistant", "content": " ".join(rng.sample(SAMPLE_DOCS, 3))})
+    return history
+
+
+def pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--max-turns", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    chunks = manual_chunks()
+    builder = ContextBuilder(RAFIKI_TEMPLATE)
+
+    budgeted, unbudgeted, build_ms, duplicates = [], [], [], 0
+    for i in range(args.requests):
+        docs = retrieval_results(chunks, rng)
+        history = chat_history(rng.randrange(args.max_turns + 1), rng)
+        start = time.perf_counter()
+        prompt = builder.build(rng.choice(SAMPLE_QUESTIONS), docs, history)
+        build_ms.append((time.perf_counter() - start) * 1000)
+        budgeted.append(prompt.tokens["prompt"])
+        unbudgeted.append(prompt.tokens["unbudgeted"])
+        duplicates += prompt.tokens["chunks_duplicate"]
+
+    results = {
+        "requests": args.requests,
+        "context_budget": builder.context_tokens,
+        "history_budget": builder.history_tokens,
+        "unbudgeted_tokens": {"mean": round(statistics.mean(unbudgeted)), "p95": pct(unbudgeted, 0.95),
+                              "max": max(unbudgeted)},
+        "budgeted_tokens": {"mean": round(statistics.mean(budgeted)), "p95": pct(budgeted, 0.95),
+                            "max": max(budgeted)},
+        "tokens_saved_pct": round(100 * (1 - sum(budgeted) / sum(unbudgeted)), 1),
+        "duplicates_dropped": duplicates,
+        "build_ms_p50": round(statistics.median(build_ms), 3),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Persistent embedding cache: embed a chunk set twice (a re-ingestion of an
+unchanged corpus) and a repeated query, counting calls to the fake model.
+
+    python benchmarks/bench_embedding_cache.py --chunks 2000 --delay 0.05
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.embeddings import CachedEmbeddings, EmbeddingStore
+from benchmarks.fakes import make_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=0.05, help="simulated API latency per call")
+    args = parser.parse_args()
+
+    chunks = [f"MOHI policy section {i}: staff must follow the I.T. guidelines." for i in range(args.chunks)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = make_embeddings(delay=args.delay)
+        path = os.path.join(tmp, "embeddings.sqlite3")
+
+        for run in ("first ingestion", "re-ingestion"):
+            # A fresh process each time: only the on-disk tier survives
+            cached = CachedEmbeddings(model, model_name="fake", store=EmbeddingStore(path))
+            calls_before = model.calls
+            start = time.perf_counter()
+            for i in range(0, len(chunks), args.batch):
+                cached.embed_documents(chunks[i:i + args.batch])
+            elapsed = time.perf_counter() - start
+            print(f"📦 {run}: {model.calls - calls_before} embedding calls, {elapsed:.2f}s")
+
+        calls_before = model.calls
+        start = time.perf_counter()
+        for _ in range(100):
+            cached.embed_query("My portal account is locked, what should I do?")
+        elapsed = time.perf_counter() - start
+        print(f"🔍 100 repeated queries: {model.calls - calls_before} embedding calls, "
+              f"{elapsed / 100 * 1000:.3f} ms/query")
+        print(f"   {cached.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Feedback store: sustained writes/s through the background writer and
+/feedback/stats latency at --rows rows, vs the old in-memory list that
+re-scanned every entry three times per stats call.
+
+    python benchmarks/bench_feedback.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.feedback import FeedbackStore
+
+REASONS = [None, "confused", "more-detail", "wrong", "human"]
+
+
+def legacy_stats(feedback_store: list) -> dict:
+    """The old /feedback/stats body."""
+    positive = sum(1 for f in feedback_store if f["feedbackType"] == "positive")
+    negative = sum(1 for f in feedback_store if f["feedbackType"] == "negative")
+    reasons = {}
+    for f in feedback_store:
+        if f["feedbackReason"]:
+            reasons[f["feedbackReason"]] = reasons.get(f["feedbackReason"], 0) + 1
+    return {"total": len(feedback_store), "positive": positive, "negative": negative, "reasons": reasons}
+
+
+def latency_ms(func, repeat: int = 20) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    entries = []
+    for i in range(args.rows):
+        negative = rng.random() < 0.3
+        entries.append(("negative" if negative else "positive", rng.choice(REASONS[1:]) if negative else None,
+                        i % 40, "Please contact the I.T. department at Pangani (Ext 303/304)."))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "feedback.sqlite3")
+        store = FeedbackStore(path)
+
+        start = time.perf_counter()
+        for feedback_type, reason, index, content in entries:
+            store.record(feedback_type, reason=reason, client_timestamp="2026-01-01T00:00:00Z",
+                         message_index=index, message_content=content)
+        enqueued = time.perf_counter() - start
+        store.flush()
+        durable = time.perf_counter() - start
+
+        results = {
+            "rows": args.rows,
+            "record_us": round(enqueued / args.rows * 1e6, 2),
+            "sustained_writes_per_s": round(args.rows / durable),
+            "stats_ms": {
+                "all_time": latency_ms(store.stats),
+                "last_24h": latency_ms(lambda: store.stats(since=time.time() - 86400)),
+                "reason_wrong": latency_ms(lambda: store.stats(reason="wrong")),
+            },
+            "db_mb": round(os.path.getsize(path) / 1e6, 1),
+        }
+        store.close()
+
+        start = time.perf_counter()
+        reopened = FeedbackStore(path)
+        results["restart_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        results["survives_restart"] = reopened.stats()["total"] == args.rows
+        reopened.close()
+
+    legacy = [{"feedbackType": t, "feedbackReason": r, "messageIndex": i, "messageContent": c}
+              for t, r, i, c in entries]
+    results["legacy_list_stats_ms"] = latency_ms(lambda: legacy_stats(legacy), repeat=3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Ingestion embedding throughput against the rate-limited fake OpenAI server.
+
+"before" is the old loop: serial 100-chunk batches with a fixed 10 s sleep in
+between (the sleeps are added arithmetically so the run doesn't take ~17 min).
+"after" is embed_concurrently: token-sized batches, several in flight, a
+client-side RPM/TPM token bucket and 429-driven backoff.
+
+    python benchmarks/bench_ingestion.py --chunks 10000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_openai import OpenAIEmbeddings
+
+from app.services.ratelimit import RateLimiter, embed_concurrently
+from app.services.tokens import count_tokens
+from benchmarks.fake_openai import create_app, serve
+
+LEGACY_BATCH = 100
+LEGACY_SLEEP = 10.0
+
+
+def client(base_url: str) -> OpenAIEmbeddings:
+    # No client-side token pre-splitting (needs tiktoken downloads) and no SDK retries, as run_ingestion builds it
+    return OpenAIEmbeddings(model="text-embedding-3-small", base_url=f"{base_url}/v1", api_key="fake",
+                            check_embedding_ctx_length=False, max_retries=0)
+
+
+def legacy(texts, embeddings):
+    start = time.perf_counter()
+    for i in range(0, len(texts), LEGACY_BATCH):
+        embeddings.embed_documents(texts[i:i + LEGACY_BATCH])
+    measured = time.perf_counter() - start
+    batches = -(-len(texts) // LEGACY_BATCH)
+    return measured, measured + (batches - 1) * LEGACY_SLEEP
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.15, help="fake server latency per request")
+    parser.add_argument("--rpm", type=float, default=600, help="server requests/min limit")
+    parser.add_argument("--tpm", type=float, default=3_000_000, help="server tokens/min limit")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-tokens", type=int, default=20000)
+    args = parser.parse_args()
+
+    texts = [f"Section {i}: MOHI staff must lock their screens and report lost devices to Pangani IT. " * 3
+             for i in range(args.chunks)]
+    token_counts = [count_tokens(t) for t in texts]
+
+    server = serve(create_app(latency=args.latency, jitter=args.latency / 5, rpm=args.rpm, tpm=args.tpm))
+    try:
+        embeddings = client(server.base_url)
+        start = time.perf_counter()
+        # Client limits match the server's published ones, but the server only tolerates short
+        # bursts, so some 429s still happen and exercise the backoff path
+        limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm)
+        vectors = asyncio.run(embed_concurrently(texts, embeddings, token_counts, limiter=limiter,
+                                                 concurrency=args.concurrency, max_tokens=args.batch_tokens))
+        concurrent = time.perf_counter() - start
+        assert len(vectors) == len(texts) and all(v is not None for v in vectors)
+        after = dict(server.config.app.state.stats)
+
+        measured, projected = legacy(texts, embeddings)
+    finally:
+        server.should_exit = True
+
+    print(f"📊 {args.chunks} chunks (~{sum(token_counts):,} tokens), server {args.rpm:.0f} RPM / {args.tpm:,.0f} TPM, "
+          f"{args.latency}s latency")
+    print(f"   before: serial {LEGACY_BATCH}-chunk batches: {measured:.1f}s embedding + 10s sleeps = {projected:.0f}s")
+    print(f"   after:  {args.concurrency} in flight, {args.batch_tokens}-token batches: {concurrent:.1f}s "
+          f"({after['requests']} requests, {after['rate_limited']} rate-limited and retried)")
+
+
+if __name__ == "__main__":
+    main()
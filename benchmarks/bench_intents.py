@@ -0,0 +1,107 @@
+"""
+Intent fast path: route a synthetic query log (suggested prompts, paraphrases
+of the curated intents, and open questions that must reach the RAG chain)
+through the compiled router and the legacy substring checks it replaces.
+
+    python benchmarks/bench_intents.py --queries 100000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.intents import IntentRouter
+
+# (message, intent the fast path should answer it with, or None for the RAG chain)
+LABELLED = [
+    ("Where is the IT office located and what are the extensions?", "it office"),
+    ("where is the it office", "it office"),
+    ("What's the extension for the IT department at Pangani?", "it office"),
+    ("IT office location?", "it office"),
+    ("My portal account is locked, what should I do?", "locked"),
+    ("I'm locked out of the portal", "locked"),
+    ("forgot my portal password", "locked"),
+    ("I forgot my password, I can't log in to the portal", "locked"),
+    ("Can't login, need a password reset", "locked"),
+    ("Show me the steps to apply for employee leave.", "leave"),
+    ("How do I apply for annual leave?", "leave"),
+    ("leave application steps", "leave"),
+    ("How many centers do we have in Nairobi?", None),
+    ("What is the policy on using personal USB drives on office computers?", None),
+    ("Please leave a note for the driver", None),
+    ("Who approves purchase requests above 50,000 shillings?", None),
+    ("The printer on the second floor is jammed again", None),
+    ("How do I connect to the office Wi-Fi on my phone?", None),
+    ("I forgot my password for the wifi", None),
+    ("When does the sick leave policy require a medical certificate from a doctor "
+     "and how many days can I take in one calendar year without it?", None),
+    ("Where can I find the HR handbook?", None),
+    ("Can I apply the new email signature template myself?", None),
+]
+
+
+def legacy_route(message: str):
+    """The substring checks get_builtin_response used before the router."""
+    message_lower = message.lower()
+    if "office" in message_lower and ("it" in message_lower or "location" in message_lower or "where" in message_lower):
+        return "it office"
+    elif "lock" in message_lower or "password" in message_lower or "reset" in message_lower:
+        return "locked"
+    elif "leave" in message_lower or "apply" in message_lower or "vacation" in message_lower:
+        return "leave"
+    return None
+
+
+def query_log(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [rng.choice(LABELLED) for _ in range(n)]
+
+
+def accuracy(route, labelled) -> dict:
+    correct = sum(route(message) == expected for message, expected in labelled)
+    false_routes = sum(expected is None and route(message) is not None for message, expected in labelled)
+    return {"accuracy": round(correct / len(labelled), 3), "false_routes": false_routes}
+
+
+def throughput(route, messages) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        route(message)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=100000)
+    args = parser.parse_args()
+
+    router = IntentRouter()
+
+    def fast_path(message):
+        match = router.route(message)
+        return match.intent if match else None
+
+    messages = [message for message, _ in query_log(args.queries)]
+    router_rate = throughput(fast_path, messages)
+    legacy_rate = throughput(legacy_route, messages)
+    stats = router.stats()
+
+    results = {
+        "queries": args.queries,
+        "router": dict(accuracy(fast_path, LABELLED), routes_per_s=round(router_rate),
+                       us_per_route=round(1e6 / router_rate, 2), hit_rate=stats["hit_rate"], hits=stats["hits"]),
+        "legacy_substring": dict(accuracy(legacy_route, LABELLED), routes_per_s=round(legacy_rate)),
+    }
+    for message, expected in LABELLED:
+        intent, confidence = router.best(message)
+        print(f"{confidence:5.2f} {intent:9} expected={expected!s:9} {message[:60]}")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
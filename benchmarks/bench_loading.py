@@ -0,0 +1,103 @@
+"""
+Document loading + splitting: the old load-everything-then-split path vs the
+process-pool pipeline that streams chunks into the embedder as files finish.
+
+Each mode runs in a fresh subprocess so peak RSS figures are comparable.
+
+    python benchmarks/bench_loading.py --files 200 --paragraphs 400
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fakes import make_embeddings, write_corpus
+
+
+def legacy(data_path: str, db_path: str) -> dict:
+    """The pre-streaming pipeline: parse every file, then split, then embed."""
+    from langchain_community.document_loaders import DirectoryLoader, Docx2txtLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from langchain_chroma import Chroma
+    from app.services.knowledge import peak_memory_mb
+    from app.services.ratelimit import embed_concurrently
+
+    start = time.perf_counter()
+    docs = DirectoryLoader(data_path, glob="./*.docx", loader_cls=Docx2txtLoader).load()
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150).split_documents(docs)
+    texts = [c.page_content for c in chunks]
+    embeddings = make_embeddings()
+    vectors = asyncio.run(embed_concurrently(texts, embeddings))
+    vector_db = Chroma(persist_directory=db_path, embedding_function=embeddings)
+    # Chroma caps how many records one upsert may carry
+    page = vector_db._client.get_max_batch_size()
+    for i in range(0, len(texts), page):
+        vector_db._collection.upsert(ids=[str(j) for j in range(i, min(i + page, len(texts)))],
+                                     embeddings=vectors[i:i + page], documents=texts[i:i + page],
+                                     metadatas=[c.metadata for c in chunks[i:i + page]])
+    elapsed = time.perf_counter() - start
+    return {
+        "files": len(docs),
+        "chunks": len(chunks),
+        "seconds": round(elapsed, 2),
+        "files_per_s": round(len(docs) / elapsed, 1),
+        "chunks_per_s": round(len(chunks) / elapsed, 1),
+        "peak_rss_mb": round(peak_memory_mb(), 1),
+    }
+
+
+def streaming(data_path: str, db_path: str) -> dict:
+    from app.services import knowledge
+
+    summaries = []
+    original = knowledge.IngestionProgress.report
+    knowledge.IngestionProgress.report = lambda self: summaries.append(self.summary())
+    try:
+        knowledge.run_ingestion(data_path=data_path, db_path=db_path, full=True, embeddings=make_embeddings())
+    finally:
+        knowledge.IngestionProgress.report = original
+    return summaries[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--mode", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        # Child process: run one mode and print its summary as the last line
+        with tempfile.TemporaryDirectory() as db_path, open(os.devnull, "w") as quiet:
+            stdout, sys.stdout = sys.stdout, quiet
+            try:
+                result = (legacy if args.mode == "legacy" else streaming)(args.data, db_path)
+            finally:
+                sys.stdout = stdout
+        print(json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory() as data_path:
+        write_corpus(data_path, args.files, args.paragraphs)
+        print(f"📊 Synthetic corpus: {args.files} .docx files x {args.paragraphs} paragraphs")
+        for mode in ("legacy", "streaming"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--data", data_path],
+                check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(out)
+            print(f"   {mode:>9}: {r['seconds']}s | {r['files_per_s']} files/s | {r['chunks_per_s']} chunks/s | "
+                  f"peak RSS {r['peak_rss_mb']} MB ({r['chunks']} chunks)")
+
+
+if __name__ == "__main__":
+    main()
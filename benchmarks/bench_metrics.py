@@ -0,0 +1,127 @@
+"""
+Metrics overhead: cost of a counter increment / histogram observation on the
+hot path (single thread and contended across threads), scrape cost, and /chat
+p50 through the ASGI app with and without MetricsMiddleware. Ends with a
+sample of the /metrics output and the Server-Timing header of one request.
+
+    python benchmarks/bench_metrics.py --requests 500
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import SAMPLE_QUESTIONS, build_fixture_db, make_embeddings, make_llm
+from app.services import chatbot
+from app.services.cache import SemanticCache
+from app.services.metrics import MetricsMiddleware, Registry
+
+
+def per_op_ns(func, n: int = 200_000) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return round((time.perf_counter() - start) / n * 1e9)
+
+
+def contended_ns(registry: Registry, threads: int, n: int = 100_000) -> float:
+    def work():
+        for _ in range(n):
+            registry.inc("rafiki_requests_total", endpoint="/chat", status=200)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    counters, _ = registry.collect()
+    assert counters[("rafiki_requests_total", (("endpoint", "/chat"), ("status", 200)))] == threads * n
+    return round(elapsed / (threads * n) * 1e9)
+
+
+def chat_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/chat")
+    async def chat(request: dict):
+        return await chatbot.achat(request["message"], chat_history=request.get("history"))
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def chat_p50_ms(app, n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    samples = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://rafiki") as client:
+        for i in range(n):
+            body = {"message": SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)], "history": []}
+            start = time.perf_counter()
+            response = await client.post("/chat", json=body)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+    return round(statistics.median(samples), 3)
+
+
+async def sample_scrape(app) -> tuple:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://rafiki") as client:
+        response = await client.post("/chat", json={"message": "Where is the IT office?"},
+                                     headers={"X-Rafiki-Timing": "1"})
+        metrics = await client.get("/metrics")
+    return response.headers.get("server-timing"), metrics.text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    registry = Registry()
+    results = {
+        "inc_ns": per_op_ns(lambda: registry.inc("rafiki_answers_total", source="llm")),
+        "observe_ns": per_op_ns(lambda: registry.observe("rafiki_stage_seconds", 0.012, stage="embedding")),
+        "inc_ns_8_threads": contended_ns(Registry(), threads=8),
+    }
+
+    from app.main import app as main_app
+
+    with tempfile.TemporaryDirectory() as db_path:
+        build_fixture_db(db_path)
+        # Cache off so every request runs every stage
+        chatbot.init_pipeline(embeddings=make_embeddings(), llm=make_llm(), db_path=db_path,
+                              cache=SemanticCache(max_entries=0))
+        results["chat_p50_ms"] = {
+            "without_middleware": asyncio.run(chat_p50_ms(chat_app(False), args.requests)),
+            "with_middleware": asyncio.run(chat_p50_ms(chat_app(True), args.requests)),
+        }
+        server_timing, scrape = asyncio.run(sample_scrape(main_app))
+
+    start = time.perf_counter()
+    for _ in range(100):
+        chatbot.REGISTRY.render()
+    results["scrape_ms"] = round((time.perf_counter() - start) * 10, 3)
+    results["server_timing"] = server_timing
+    print(json.dumps(results, indent=2))
+    print("\n".join(line for line in scrape.splitlines()
+                    if line.startswith(("rafiki_stage_seconds_count", "rafiki_answers", "rafiki_prompt",
+                                        "rafiki_semantic", "rafiki_requests_total"))))
+
+
+if __name__ == "__main__":
+    main()
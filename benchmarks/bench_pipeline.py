@@ -0,0 +1,69 @@
+"""
+Cold-per-request vs warm-singleton pipeline latency.
+
+Cold rebuilds the embeddings, Chroma handle, LLM client and prompt for every
+question (the old get_rafiki_answer behaviour); warm reuses one RafikiPipeline.
+
+    python benchmarks/bench_pipeline.py --requests 50
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import SAMPLE_QUESTIONS, build_fixture_db, make_embeddings, make_llm
+from app.services.chatbot import RafikiPipeline
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def run(requests: int, db_path: str):
+    questions = [SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)] for i in range(requests)]
+
+    cold = []
+    for q in questions:
+        start = time.perf_counter()
+        RafikiPipeline(embeddings=make_embeddings(), llm=make_llm(), db_path=db_path).answer(q)
+        cold.append(time.perf_counter() - start)
+
+    pipeline = RafikiPipeline(embeddings=make_embeddings(), llm=make_llm(), db_path=db_path)
+    warm = []
+    for q in questions:
+        start = time.perf_counter()
+        pipeline.answer(q)
+        warm.append(time.perf_counter() - start)
+
+    return {"requests": requests, "cold": summarize(cold), "warm": summarize(warm)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_path:
+        build_fixture_db(db_path)
+        result = run(args.requests, db_path)
+
+    print(f"📊 {result['requests']} requests")
+    for mode in ("cold", "warm"):
+        stats = result[mode]
+        print(f"   {mode:>4}: mean {stats['mean_ms']} ms | p50 {stats['p50_ms']} ms | p95 {stats['p95_ms']} ms")
+    print(f"   speed-up: {result['cold']['mean_ms'] / result['warm']['mean_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Quantized vector search (RAFIKI_VECTOR_QUANTIZATION): exact float32 scan vs
+an int8 or binary (Hamming) first pass with exact float rescoring of
+RESCORE_FACTOR * k candidates.
+
+The corpus is --chunks synthetic 1536-d vectors (text-embedding-3-small's
+size) grouped around --topics centroids, so every query has a crowd of
+near-neighbours, as in a policy corpus with many similar documents. Queries
+are perturbed corpus vectors. Reported per mode: bytes scanned by the first
+pass (what must stay in RAM for fast queries), recall@k against the exact
+top-k, and query latency. Expect binary to beat the exact scan and int8 to
+trail it: int8 saves memory, not time, while the floats fit in RAM.
+
+    python benchmarks/bench_quantization.py --chunks 100000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+# fakes first: it sets env defaults that app modules read at import time
+import benchmarks.fakes  # noqa: F401
+
+from app.services.vectorindex import MmapVectorIndex, write_vector_index
+
+DIM = 1536
+PAGE = 10000
+
+
+def corpus_pages(n: int, topics: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((topics, DIM), dtype=np.float32)
+    for start in range(0, n, PAGE):
+        rows = min(PAGE, n - start)
+        vectors = centroids[rng.integers(0, topics, rows)] + 0.8 * rng.standard_normal((rows, DIM), dtype=np.float32)
+        ids = [f"chunk-{start + i}" for i in range(rows)]
+        yield ids, vectors, [f"Policy chunk {start + i}" for i in range(rows)], [{}] * rows
+
+
+def query_vectors(index: MmapVectorIndex, n: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(index), n, replace=False))
+    return index.vectors[rows] + 0.03 * rng.standard_normal((n, DIM), dtype=np.float32)
+
+
+def evaluate(index: MmapVectorIndex, queries: np.ndarray, truth: list, k: int) -> dict:
+    timings, recall = [], []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = {row for row, _ in index.search(q, k)}
+        timings.append((time.perf_counter() - start) * 1000)
+        recall.append(len(found & expected) / k)
+    timings.sort()
+    return {
+        f"recall_at_{k}": round(statistics.mean(recall), 3),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95)], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--factors", type=int, nargs="+", default=[5, 20, 50], help="rescore factors to try")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_path:
+        start = time.perf_counter()
+        manifest = write_vector_index(db_path, args.chunks, corpus_pages(args.chunks, args.topics))
+        results = {"chunks": args.chunks, "dim": DIM, "export_s": round(time.perf_counter() - start, 1)}
+        size = lambda key: round(os.path.getsize(os.path.join(db_path, manifest[key])) / 2 ** 20, 1)
+        results["first_pass_mb"] = {"none": size("vectors"), "int8": size("int8"), "binary": size("binary")}
+
+        exact = MmapVectorIndex(db_path, "none")
+        queries = query_vectors(exact, args.queries)
+        truth = [{row for row, _ in exact.search(q, args.k)} for q in queries]
+
+        results["exact"] = evaluate(exact, queries, truth, args.k)
+        for quantization in ("int8", "binary"):
+            for factor in args.factors:
+                index = MmapVectorIndex(db_path, quantization, rescore_factor=factor)
+                results[f"{quantization}_rescore_x{factor}"] = evaluate(index, queries, truth, args.k)
+        # The first pass alone, without float rescoring
+        for quantization in ("int8", "binary"):
+            index = MmapVectorIndex(db_path, quantization)
+            first = [set(index.top_k(index.approximate_scores(q), args.k).tolist()) for q in queries]
+            results[f"{quantization}_no_rescore_recall_at_{args.k}"] = round(
+                statistics.mean(len(f & t) / args.k for f, t in zip(first, truth)), 3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
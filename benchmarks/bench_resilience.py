@@ -0,0 +1,174 @@
+"""
+Upstream resilience against a local flaky fake OpenAI server: the real
+ChatOpenAI / OpenAIEmbeddings clients on the shared connection pool, with
+per-call deadlines, SDK retries and circuit breakers.
+
+Scenarios: healthy upstream; 30% injected 500s with and without retries; an
+LLM that hangs, with and without the circuit breaker (without it every request
+waits out the deadline); an embedding API that hangs (keyword search takes
+over); and recovery once the upstream is healthy again after the cool-down.
+
+Each scenario is also checked: the fallback answer is served while the LLM
+hangs, the breaker opens, is half-open after the cool-down and closes once the
+upstream is healthy again. A failed check is printed and the run exits 1.
+
+    python benchmarks/bench_resilience.py --requests 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Short deadlines and cool-down so the scenarios finish quickly; read at import time
+os.environ.setdefault("RAFIKI_LLM_TIMEOUT", "2")
+os.environ.setdefault("RAFIKI_EMBED_TIMEOUT", "1")
+os.environ.setdefault("RAFIKI_BREAKER_MIN_CALLS", "5")
+os.environ.setdefault("RAFIKI_BREAKER_COOLDOWN", "3")
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import SAMPLE_QUESTIONS
+from benchmarks.fake_openai import create_app, serve
+
+
+async def fire(pipeline, n: int, concurrency: int, tag: str) -> dict:
+    """n unique questions (no cache hits, no coalescing) at the given concurrency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, fallbacks = [], 0
+
+    async def one(i: int):
+        nonlocal fallbacks
+        async with semaphore:
+            start = time.perf_counter()
+            reply = await pipeline.areply(f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} ({tag} {i})")
+            latencies.append(time.perf_counter() - start)
+            fallbacks += reply["answer_id"] is None
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return {
+        "seconds": round(time.perf_counter() - start, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+        "fallback_answers": fallbacks,
+    }
+
+
+def check(results: dict, name: str, ok: bool, detail: str):
+    results.setdefault("checks", {})[name] = "pass" if ok else f"FAIL: {detail}"
+
+
+async def run(pipeline_factory, faults: dict, n: int, concurrency: int, cooldown: float) -> dict:
+    from langchain_openai import ChatOpenAI
+
+    from app.services.chatbot import CHAT_MODEL
+    from app.services.upstream import LLM_TIMEOUT, CircuitBreaker, openai_client_options
+
+    healthy = dict(faults)
+    results = {}
+
+    def unprotected(**kwargs):
+        pipeline = pipeline_factory(**kwargs)
+        pipeline.llm_breaker = CircuitBreaker("llm", threshold=2.0)  # can never open
+        return pipeline
+
+    results["healthy"] = await fire(pipeline_factory(), n, concurrency, "healthy")
+    check(results, "healthy_no_fallbacks", results["healthy"]["fallback_answers"] == 0,
+          f"{results['healthy']['fallback_answers']} fallback answers from a healthy upstream")
+
+    # Retries alone (breaker out of the way): the SDK retries 500s with jittered backoff
+    faults.update(error_rate=0.3)
+    no_retries = dict(openai_client_options(LLM_TIMEOUT), max_retries=0)
+    results["flaky_30pct_no_retries"] = await fire(
+        unprotected(llm=ChatOpenAI(model=CHAT_MODEL, **no_retries)), n, concurrency, "flaky-a")
+    results["flaky_30pct_with_retries"] = await fire(unprotected(), n, concurrency, "flaky-b")
+    faults.update(healthy)
+    check(results, "retries_absorb_errors",
+          results["flaky_30pct_with_retries"]["fallback_answers"]
+          < results["flaky_30pct_no_retries"]["fallback_answers"],
+          "retries did not reduce fallback answers")
+
+    faults.update(chat_latency=60.0)
+    results["llm_hang_no_breaker"] = await fire(unprotected(), n, concurrency, "hang-a")
+    pipeline = pipeline_factory()
+    results["llm_hang_with_breaker"] = await fire(pipeline, n, concurrency, "hang-b")
+    results["llm_hang_with_breaker"]["breaker"] = pipeline.llm_breaker.stats()
+    faults.update(healthy)
+    hang = results["llm_hang_with_breaker"]
+    check(results, "llm_hang_serves_fallback", hang["fallback_answers"] == n,
+          f"{hang['fallback_answers']}/{n} requests got the built-in answer")
+    check(results, "llm_breaker_opens", hang["breaker"]["times_opened"] >= 1 and hang["breaker"]["state"] == "open",
+          f"breaker {hang['breaker']}")
+    check(results, "llm_breaker_fails_fast", hang["seconds"] < results["llm_hang_no_breaker"]["seconds"],
+          f"{hang['seconds']}s with the breaker vs {results['llm_hang_no_breaker']['seconds']}s without")
+
+    faults.update(latency=60.0)
+    embedding_pipeline = pipeline_factory()
+    results["embedding_hang_with_breaker"] = await fire(embedding_pipeline, n, concurrency, "embed-hang")
+    results["embedding_hang_with_breaker"]["breaker"] = embedding_pipeline.embed_breaker.stats()
+    faults.update(healthy)
+    embed_hang = results["embedding_hang_with_breaker"]
+    check(results, "embedding_breaker_opens", embed_hang["breaker"]["times_opened"] >= 1,
+          f"breaker {embed_hang['breaker']}")
+    check(results, "embedding_hang_keyword_search", embed_hang["fallback_answers"] == 0,
+          f"{embed_hang['fallback_answers']} built-in answers; keyword search should have kept the LLM answering")
+
+    # Upstream healthy again: after the cool-down one trial call closes the circuit
+    await asyncio.sleep(cooldown)
+    state = pipeline.llm_breaker.state
+    check(results, "llm_breaker_half_open_after_cooldown", state == "half_open", f"state {state}")
+    results["recovered"] = await fire(pipeline, n, concurrency, "recovered")
+    results["recovered"]["breaker"] = pipeline.llm_breaker.state
+    # Requests sent while the trial call is out still short-circuit; once it succeeds the rest are answered
+    check(results, "llm_breaker_recovers",
+          results["recovered"]["breaker"] == "closed" and results["recovered"]["fallback_answers"] < n // 2,
+          f"state {results['recovered']['breaker']}, {results['recovered']['fallback_answers']} fallback answers")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["RAFIKI_EMBED_CACHE"] = os.path.join(tmp, "embeddings.sqlite3")
+        fake = create_app(latency=0.02, jitter=0.005, chat_latency=0.05)
+        server = serve(fake)
+        os.environ["OPENAI_BASE_URL"] = f"{server.base_url}/v1"
+
+        from app.services.cache import SemanticCache
+        from app.services.chatbot import RafikiPipeline
+        from app.services.upstream import BREAKER_COOLDOWN
+        from benchmarks.load_test import build_fixture
+
+        db_path = os.path.join(tmp, "chroma")
+        build_fixture(Path(db_path), server.base_url)
+
+        def pipeline_factory(**kwargs):
+            return RafikiPipeline(db_path=db_path, cache=SemanticCache(max_entries=0), **kwargs)
+
+        try:
+            results = asyncio.run(run(pipeline_factory, fake.state.faults, args.requests, args.concurrency,
+                                      BREAKER_COOLDOWN))
+        finally:
+            server.should_exit = True
+        results["upstream_calls"] = fake.state.stats
+    print(json.dumps(results, indent=2))
+    failed = {name: outcome for name, outcome in results["checks"].items() if outcome != "pass"}
+    for name, outcome in failed.items():
+        print(f"❌ {name}: {outcome}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
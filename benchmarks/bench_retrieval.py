@@ -0,0 +1,101 @@
+"""
+Retrieval quality and latency: dense-only vs BM25-only vs hybrid (RRF).
+
+The corpus is SAMPLE_DOCS plus synthetic distractor chunks; each query has one
+relevant chunk and leans on exact terms (extensions, network names, menu
+paths). Dense vectors come from the hashed bag-of-words fake, so absolute
+numbers are only indicative; the relative picture is what matters.
+
+    python benchmarks/bench_retrieval.py --distractors 2000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from app.services.lexical import BM25Index, reciprocal_rank_fusion
+from benchmarks.fakes import SAMPLE_DOCS, BagOfWordsEmbeddings
+
+# (query, index of the relevant SAMPLE_DOCS entry)
+LABELLED_QUERIES = [
+    ("What is Ext 303 for?", 0),
+    ("who do I call on extension 304", 0),
+    ("portal locked Staff ID Username", 1),
+    ("Employee > Leave Application menu", 2),
+    ("upload medical certificate for sick leave", 3),
+    ("Kosovo and Ngomongo centers", 4),
+    ("unlicensed software on my laptop", 5),
+    ("MOHI-Guest voucher", 6),
+    ("what goes in an email signature", 7),
+    ("switchboard number in signature brand guide", 7),
+]
+
+WORDS = ("staff policy portal network report office finance budget program school health center "
+         "training device account meeting community child sponsor transport kitchen").split()
+
+
+def distractors(n: int, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(40)) for _ in range(n)]
+
+
+def evaluate(name, retrieve, k: int = 5):
+    hits, reciprocal_ranks, latencies = 0, [], []
+    for query, relevant in LABELLED_QUERIES:
+        start = time.perf_counter()
+        docs = retrieve(query)
+        latencies.append(time.perf_counter() - start)
+        ids = [d.id for d in docs[:k]]
+        target = f"sample-{relevant}"
+        if target in ids:
+            hits += 1
+            reciprocal_ranks.append(1 / (ids.index(target) + 1))
+        else:
+            reciprocal_ranks.append(0.0)
+    print(f"   {name:>7}: recall@{k} {hits / len(LABELLED_QUERIES):.2f} | MRR {statistics.mean(reciprocal_ranks):.2f} | "
+          f"p50 {statistics.median(latencies) * 1000:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--distractors", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = SAMPLE_DOCS + distractors(args.distractors)
+    ids = [f"sample-{i}" for i in range(len(SAMPLE_DOCS))] + [f"noise-{i}" for i in range(args.distractors)]
+    docs = [Document(id=i, page_content=t, metadata={"source": i}) for i, t in zip(ids, texts)]
+
+    embeddings = BagOfWordsEmbeddings()
+    with tempfile.TemporaryDirectory() as db_path:
+        vector_db = Chroma.from_documents(docs, embedding=embeddings, ids=ids, persist_directory=db_path)
+        start = time.perf_counter()
+        index = BM25Index.from_collection(vector_db._collection)
+        build = time.perf_counter() - start
+
+        def dense(q):
+            return vector_db.similarity_search_by_vector(embeddings.embed_query(q), k=args.k)
+
+        def lexical(q):
+            return index.documents(q, args.k)
+
+        def hybrid(q):
+            return reciprocal_rank_fusion([dense(q), lexical(q)], k=args.k)
+
+        print(f"📊 {len(texts)} chunks, {len(LABELLED_QUERIES)} labelled queries (BM25 build {build * 1000:.0f} ms)")
+        evaluate("dense", dense, args.k)
+        evaluate("bm25", lexical, args.k)
+        evaluate("hybrid", hybrid, args.k)
+
+
+if __name__ == "__main__":
+    main()
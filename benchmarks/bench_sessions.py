@@ -0,0 +1,58 @@
+"""
+Server-side sessions: request payload size and prompt history tokens per turn
+for a client that resends its whole history vs one that sends only the new
+message and its session_id.
+
+    python benchmarks/bench_sessions.py --turns 40
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.context import ContextBuilder
+from app.services.sessions import SessionStore
+from app.services.tokens import count_tokens
+from benchmarks.fakes import SAMPLE_DOCS, SAMPLE_QUESTIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=40)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    builder = ContextBuilder()
+    store = SessionStore()
+    session = store.get()
+    client_history = []
+
+    rows = []
+    for turn in range(1, args.turns + 1):
+        question = f"{rng.choice(SAMPLE_QUESTIONS)} (follow-up {turn})"
+        answer = " ".join(rng.sample(SAMPLE_DOCS, 3))
+
+        legacy_payload = len(json.dumps({"message": question, "history": client_history}))
+        session_payload = len(json.dumps({"message": question, "session_id": session.id}))
+        # Tokens of all history the client ships, and what the prompt keeps of it
+        legacy_history = sum(count_tokens(m["content"]) for m in client_history)
+        session_prompt = count_tokens(builder.select_history(session.recent, session.summary)[0])
+
+        rows.append({"turn": turn, "legacy_payload_bytes": legacy_payload, "session_payload_bytes": session_payload,
+                     "legacy_history_tokens": legacy_history, "session_prompt_history_tokens": session_prompt})
+
+        client_history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+        store.append(session, question, answer)
+
+    for row in rows:
+        if row["turn"] in (1, 5, 10, 20, args.turns):
+            print(json.dumps(row))
+    print(f"rolling summary after {args.turns} turns: {count_tokens(session.summary)} tokens")
+
+
+if __name__ == "__main__":
+    main()
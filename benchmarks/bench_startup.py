@@ -0,0 +1,146 @@
+"""
+Cold start of both API servers, as real uvicorn processes against the fake
+OpenAI server and the tiny Chroma fixture (see load_test.py).
+
+For each server: the time from spawning the process to the first answer from
+its health endpoint (any status; 'loading' / 'warming_up' come back as 503),
+and to the first 200 once the pipeline has loaded and warm-up has finished.
+Then a `python -X importtime` breakdown: the slowest top-level packages behind
+importing the app module (what a health probe waits for) and behind
+app.services.chatbot (now loaded in the background).
+
+    python benchmarks/bench_startup.py --runs 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+# fakes first: it sets env defaults that app modules read at import time
+import benchmarks.fakes  # noqa: F401
+from benchmarks.fake_openai import free_port
+from benchmarks.load_test import FIXTURE_PATH, build_fixture, spawn, wait_healthy
+
+REPORT_PATH = ROOT / "test_reports" / "startup_results.json"
+SERVERS = {
+    # server -> (uvicorn app, app dir, health path, module to import)
+    "main": ("app.main:app", ROOT, "/", "app.main"),
+    "backend": ("server:app", ROOT / "backend", "/api/health", "server"),
+}
+
+
+def time_to_health(app: str, app_dir: Path, url: str, env: dict, log, timeout: float = 120.0) -> dict:
+    start = time.perf_counter()
+    process = spawn(["-m", "uvicorn", app, "--port", url.rsplit(":", 1)[1].split("/")[0], "--log-level", "warning"],
+                    app_dir, env, log)
+    first_response = statuses = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{app} exited with code {process.returncode}")
+            try:
+                response = httpx.get(url, timeout=1.0)
+            except httpx.HTTPError:
+                time.sleep(0.01)
+                continue
+            if first_response is None:
+                first_response = time.perf_counter() - start
+                statuses = response.json().get("status")
+            if response.status_code == 200:
+                return {"first_response_s": round(first_response, 3), "first_status": statuses,
+                        "ready_s": round(time.perf_counter() - start, 3)}
+            time.sleep(0.01)
+        raise RuntimeError(f"{app} not ready after {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def import_breakdown(module: str, cwd: Path, top: int = 8) -> dict:
+    """Total import time of `module` and its slowest top-level packages (cumulative, ms)."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd,
+                            capture_output=True, text=True, check=True).stderr
+    packages = {}
+    total = 0.0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            cumulative_ms = int(cumulative) / 1000
+        except ValueError:
+            continue  # the header line
+        name = name.strip()
+        if name == module:
+            total = cumulative_ms
+        root = name.split(".")[0]
+        if root != module.split(".")[0]:
+            # The outermost import of a package includes everything below it
+            packages[root] = max(packages.get(root, 0.0), cumulative_ms)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"total_ms": round(total, 1), "slowest_packages_ms": {name: round(ms, 1) for name, ms in slowest}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per server")
+    parser.add_argument("--chat-latency", type=float, default=0.3, help="fake LLM latency, paid by warm-up")
+    parser.add_argument("--output", default=str(REPORT_PATH))
+    args = parser.parse_args()
+
+    results = {"timestamp": datetime.now().isoformat(), "runs": args.runs, "servers": {}}
+    with tempfile.TemporaryDirectory() as tmp, open(os.path.join(tmp, "servers.log"), "w") as log:
+        fake_port = free_port()
+        fake_url = f"http://127.0.0.1:{fake_port}"
+        fake = spawn([str(ROOT / "benchmarks" / "fake_openai.py"), "--port", str(fake_port),
+                      "--chat-latency", str(args.chat_latency)], ROOT, dict(os.environ), log)
+        try:
+            wait_healthy(f"{fake_url}/stats", fake)
+            if not FIXTURE_PATH.exists():
+                build_fixture(FIXTURE_PATH, fake_url)
+
+            for name, (app, app_dir, health_path, module) in SERVERS.items():
+                runs = []
+                for i in range(args.runs):
+                    env = dict(os.environ, OPENAI_API_KEY="fake", OPENAI_BASE_URL=f"{fake_url}/v1",
+                               RAFIKI_DB_PATH=str(FIXTURE_PATH),
+                               RAFIKI_EMBED_CACHE=os.path.join(tmp, f"{name}{i}_embeddings.sqlite3"),
+                               RAFIKI_FEEDBACK_DB=os.path.join(tmp, f"{name}{i}_feedback.sqlite3"),
+                               RAFIKI_QUESTION_LOG=os.path.join(tmp, f"{name}{i}_questions.sqlite3"),
+                               RAFIKI_INTENT_ROUTER="0", ANONYMIZED_TELEMETRY="False")
+                    runs.append(time_to_health(app, app_dir, f"http://127.0.0.1:{free_port()}{health_path}",
+                                               env, log))
+                results["servers"][name] = {
+                    "first_response_s": round(statistics.median(r["first_response_s"] for r in runs), 3),
+                    "first_status": runs[0]["first_status"],
+                    "ready_s": round(statistics.median(r["ready_s"] for r in runs), 3),
+                    "import": import_breakdown(module, app_dir),
+                }
+                print(f"🚀 {name}: first response {results['servers'][name]['first_response_s']}s "
+                      f"({runs[0]['first_status']}), ready {results['servers'][name]['ready_s']}s")
+        finally:
+            fake.terminate()
+            fake.wait()
+    results["deferred_import"] = {"app.services.chatbot": import_breakdown("app.services.chatbot", ROOT)}
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(json.dumps(results, indent=2))
+    print(f"📄 Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
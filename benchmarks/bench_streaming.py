@@ -0,0 +1,72 @@
+"""
+Time-to-first-token of /chat/stream vs time-to-response of /chat, using a fake
+LLM that waits --delay seconds before the first token and --token-delay between tokens.
+
+    python benchmarks/bench_streaming.py --delay 0.3 --token-delay 0.01
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import SAMPLE_QUESTIONS, build_fixture_db, make_embeddings, make_llm
+from app.services import chatbot
+from app.services.cache import SemanticCache
+from benchmarks.fake_openai import serve
+
+ANSWER = "To apply for leave, open **Employee** > **Leave Application** in the MOHI Staff Portal and submit. " * 3
+
+
+async def measure(base_url: str):
+    payload = {"message": SAMPLE_QUESTIONS[2], "history": []}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        start = time.perf_counter()
+        await client.post("/chat", json=payload)
+        blocking_total = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_token = None
+        async with client.stream("POST", "/chat/stream", json=payload) as response:
+            async for line in response.aiter_lines():
+                if first_token is None and line == "event: token":
+                    first_token = time.perf_counter() - start
+        stream_total = time.perf_counter() - start
+    return blocking_total, first_token, stream_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    from app.main import app
+
+    with tempfile.TemporaryDirectory() as db_path:
+        build_fixture_db(db_path)
+        llm = make_llm(delay=args.delay, responses=[ANSWER], token_delay=args.token_delay)
+        chatbot.init_pipeline(embeddings=make_embeddings(), llm=llm, db_path=db_path,
+                              cache=SemanticCache(max_entries=0))
+
+        server = serve(app)
+        try:
+            blocking_total, first_token, stream_total = asyncio.run(measure(server.base_url))
+        finally:
+            server.should_exit = True
+
+    print(f"📊 {len(ANSWER)}-character answer (one token per character), first-token delay {args.delay}s, {args.token_delay}s/token")
+    print(f"   /chat        full response:  {blocking_total:.2f}s")
+    print(f"   /chat/stream first token:    {first_token:.2f}s")
+    print(f"   /chat/stream done frame:     {stream_total:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
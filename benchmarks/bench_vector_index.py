@@ -0,0 +1,190 @@
+"""
+Vector search for multi-worker deployments: Chroma (each process loads its own
+HNSW index) vs the memory-mapped export (RAFIKI_VECTOR_INDEX=mmap), which every
+process maps from the same page-cache pages.
+
+A synthetic collection of --chunks random 1536-d vectors is written to Chroma
+and exported. Reported: export time and file sizes, query latency for both
+retrievers in one process, recall@k of Chroma's approximate search against the
+exact mmap top-k, and memory of --workers worker processes per retriever held
+alive at the same time (RSS counts shared pages in every process; PSS splits
+them between the processes that share them, so it is the per-worker cost).
+
+    python benchmarks/bench_vector_index.py --chunks 20000 --workers 4
+"""
+
+import argparse
+import importlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+# fakes first: it sets env defaults that app modules read at import time
+import benchmarks.fakes  # noqa: F401
+
+DIM = 1536
+UPSERT_BATCH = 5000
+
+
+def memory_mb() -> dict:
+    """Rss / Pss / Private of this process from /proc (Linux)."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(fields["Rss"], 1),
+        "pss_mb": round(fields["Pss"], 1),
+        "private_mb": round(fields["Private_Clean"] + fields["Private_Dirty"], 1),
+    }
+
+
+def synthetic_vectors(n: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, DIM), dtype=np.float32)
+
+
+def build_collection(db_path: str, n: int) -> float:
+    from langchain_chroma import Chroma
+
+    vectors = synthetic_vectors(n, seed=0)
+    start = time.perf_counter()
+    collection = Chroma(persist_directory=db_path, collection_metadata={"hnsw:space": "cosine"})._collection
+    for i in range(0, n, UPSERT_BATCH):
+        rows = range(i, min(n, i + UPSERT_BATCH))
+        collection.upsert(
+            ids=[f"chunk-{r}" for r in rows],
+            embeddings=vectors[i:i + len(rows)].tolist(),
+            documents=[f"Synthetic chunk {r}. " + "MOHI IT knowledge base filler text. " * 20 for r in rows],
+            metadatas=[{"source": f"doc_{r // 50}.pdf"} for r in rows],
+        )
+    return time.perf_counter() - start
+
+
+def queries(n: int, chunks: int) -> np.ndarray:
+    """Noisy copies of stored vectors, so each query has a clear neighbourhood."""
+    rows = random.Random(1).sample(range(chunks), n)
+    return synthetic_vectors(chunks, seed=0)[rows] + 0.5 * synthetic_vectors(n, seed=2)
+
+
+def open_retriever(kind: str, db_path: str):
+    """A search(vector, k) -> ids function, as the pipeline would call it."""
+    if kind == "chroma":
+        from langchain_chroma import Chroma
+
+        vector_db = Chroma(persist_directory=db_path)
+        return lambda vector, k: [d.id for d in vector_db.similarity_search_by_vector(vector.tolist(), k=k)]
+    from app.services.vectorindex import VectorIndexRetriever
+
+    retriever = VectorIndexRetriever(db_path)
+    return lambda vector, k: [d.id for d in retriever.documents(vector, k)]
+
+
+def worker(kind: str, db_path: str, k: int):
+    """Child process: open the retriever like a uvicorn worker would, serve a few queries, report memory, wait."""
+    importlib.import_module("langchain_chroma" if kind == "chroma" else "app.services.vectorindex")
+    baseline = memory_mb()
+    start = time.perf_counter()
+    search = open_retriever(kind, db_path)
+    vectors = synthetic_vectors(51, seed=3)
+    search(vectors[0], k)
+    first_query_ms = (time.perf_counter() - start) * 1000
+    for vector in vectors[1:]:
+        search(vector, k)
+    print(json.dumps({"first_query_ms": round(first_query_ms, 1), "after_imports": baseline, **memory_mb()}),
+          flush=True)
+    sys.stdin.read()  # stay alive until the parent has measured every worker
+
+
+def measure_workers(kind: str, db_path: str, workers: int, k: int) -> dict:
+    processes = [
+        subprocess.Popen([sys.executable, __file__, "--worker", kind, "--db", db_path, "--k", str(k)],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    try:
+        reports = [json.loads(p.stdout.readline()) for p in processes]
+    finally:
+        for p in processes:
+            p.stdin.close()
+            p.wait()
+
+    def mean(field: str) -> float:
+        return round(statistics.mean(r[field] for r in reports), 1)
+
+    return {
+        "workers": workers,
+        "rss_mb_per_worker": mean("rss_mb"),
+        "pss_mb_per_worker": mean("pss_mb"),
+        "private_mb_per_worker": mean("private_mb"),
+        "rss_mb_over_imports": round(statistics.mean(r["rss_mb"] - r["after_imports"]["rss_mb"] for r in reports), 1),
+        "total_pss_mb": round(sum(r["pss_mb"] for r in reports), 1),
+        "open_and_first_query_ms": mean("first_query_ms"),
+    }
+
+
+def latency(search, vectors: np.ndarray, k: int) -> dict:
+    timings = []
+    for vector in vectors:
+        start = time.perf_counter()
+        search(vector, k)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"p50_ms": round(statistics.median(timings), 3), "p95_ms": round(timings[int(len(timings) * 0.95)], 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--worker", choices=["chroma", "mmap"], help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.db, args.k)
+        return
+
+    from app.services.vectorindex import export_vector_index
+    from langchain_chroma import Chroma
+
+    with tempfile.TemporaryDirectory() as db_path:
+        results = {"chunks": args.chunks, "dim": DIM}
+        results["chroma_build_s"] = round(build_collection(db_path, args.chunks), 1)
+
+        start = time.perf_counter()
+        export_vector_index(Chroma(persist_directory=db_path)._collection, db_path)
+        results["export_s"] = round(time.perf_counter() - start, 2)
+        results["export_files_mb"] = {
+            name: round(os.path.getsize(os.path.join(db_path, name)) / 2 ** 20, 1)
+            for name in sorted(os.listdir(db_path)) if os.path.isfile(os.path.join(db_path, name))
+        }
+
+        vectors = queries(args.queries, args.chunks)
+        chroma, mmap_index = open_retriever("chroma", db_path), open_retriever("mmap", db_path)
+        chroma(vectors[0], args.k), mmap_index(vectors[0], args.k)  # load both before timing
+        results["query_latency"] = {"chroma": latency(chroma, vectors, args.k),
+                                    "mmap": latency(mmap_index, vectors, args.k)}
+        recall = [len(set(chroma(v, args.k)) & set(mmap_index(v, args.k))) / args.k for v in vectors]
+        results[f"chroma_recall_at_{args.k}_vs_exact"] = round(statistics.mean(recall), 3)
+
+        results["memory"] = {kind: measure_workers(kind, db_path, args.workers, args.k)
+                             for kind in ("chroma", "mmap")}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Startup warm-up: the app is served for real (lifespan included) against a
+fake LLM that takes --delay seconds. Reports how long '/' answers 503 while
+the suggested prompts are precomputed, the first click on a suggested prompt
+once ready vs a question nobody warmed, and the refresh after a knowledge base
+change, which also picks up a question staff have been asking repeatedly.
+
+    python benchmarks/bench_warmup.py --delay 1.0
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import build_fixture_db, make_embeddings, make_llm
+from benchmarks.fake_openai import serve
+
+POPULAR = "Which Wi-Fi network should staff laptops use?"
+
+
+def timed_post(client: httpx.Client, message: str) -> float:
+    start = time.perf_counter()
+    response = client.post("/chat", json={"message": message})
+    assert response.status_code == 200, response.text
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def wait_for(predicate, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("warm-up did not finish")
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay", type=float, default=1.0, help="fake LLM latency in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["RAFIKI_QUESTION_LOG"] = os.path.join(tmp, "questions.sqlite3")
+        os.environ["RAFIKI_FEEDBACK_DB"] = os.path.join(tmp, "feedback.sqlite3")
+        os.environ.setdefault("RAFIKI_WARMUP_INTERVAL", "0.5")
+
+        from app.main import app
+        from app.services import chatbot
+        from app.services.cache import SemanticCache, bump_kb_version
+        from app.services.warmup import SUGGESTED_PROMPTS
+
+        db_path = os.path.join(tmp, "chroma")
+        build_fixture_db(db_path)
+        bump_kb_version(db_path)
+        llm = make_llm(delay=args.delay)
+        chatbot.init_pipeline(embeddings=make_embeddings(), llm=llm, db_path=db_path,
+                              cache=SemanticCache(db_path=db_path))
+
+        results = {}
+        start = time.perf_counter()
+        server = serve(app)
+        try:
+            with httpx.Client(base_url=server.base_url, timeout=60) as client:
+                statuses = []
+                while True:
+                    status = client.get("/").status_code
+                    statuses.append(status)
+                    if status == 200:
+                        break
+                    time.sleep(0.05)
+                results["ready_after_s"] = round(time.perf_counter() - start, 2)
+                results["health_503_while_warming"] = statuses[0] == 503
+                results["warmup"] = client.get("/warmup/stats").json()
+
+                results["suggested_prompt_ms"] = timed_post(client, SUGGESTED_PROMPTS[0])
+                results["unwarmed_question_ms"] = timed_post(client, "How do I connect to the office printer?")
+
+                for _ in range(3):
+                    timed_post(client, POPULAR)
+                runs = app.state.warmup.runs
+                bump_kb_version(db_path)
+                wait_for(lambda: app.state.warmup.runs > runs)
+                results["after_kb_change"] = {
+                    "warmup": client.get("/warmup/stats").json(),
+                    "suggested_prompt_ms": timed_post(client, SUGGESTED_PROMPTS[1]),
+                    "popular_question_ms": timed_post(client, POPULAR),
+                }
+        finally:
+            server.should_exit = True
+            time.sleep(0.5)
+
+    results["llm_delay_s"] = args.delay
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
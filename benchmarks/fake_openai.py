@@ -0,0 +1,262 @@
+"""
+A local fake of the OpenAI embeddings and chat completions APIs for offline
+benchmarks.
+
+Embeddings are deterministic hash vectors; chat completions are a canned IT
+answer, streamed word by word when asked to. Both answer after a configurable
+latency (+ jitter). Embeddings enforce requests/min and tokens/min limits,
+answering 429 with a Retry-After header when a client goes over them, and
+--throttle-rate / --error-rate inject 429s and 500s at random on both.
+--chat-concurrency caps the completions generated at once, like a saturated
+deployment: the rest queue, so chat latency grows with load.
+
+    python benchmarks/fake_openai.py --port 8900 --rpm 600 --tpm 3000000
+    python benchmarks/fake_openai.py --latency 0.4 --token-delay 0.02 --throttle-rate 0.05
+    python benchmarks/fake_openai.py --chat-latency 2 --chat-concurrency 8
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DIMENSIONS = 256
+CHAT_REPLY = (
+    "For portal or password problems, contact the I.T. department at the Pangani Head Office "
+    "(Ext 303/304) with your Staff ID and Username. Password resets take about 30 minutes."
+)
+
+
+class WindowLimit:
+    """Server-side token bucket; `burst_seconds` of the per-minute allowance can be spent at once."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 6.0):
+        self.rate = per_minute / 60.0
+        self.capacity = self.rate * burst_seconds
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self, amount: float):
+        """Return 0 if allowed, otherwise the seconds until it would be."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            self.level -= amount
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+def fake_vector(text, dimensions: int = DIMENSIONS) -> np.ndarray:
+    # Clients may send token ids instead of text (langchain's OpenAIEmbeddings does by default)
+    raw = text if isinstance(text, str) else json.dumps(text)
+    seed = int.from_bytes(hashlib.sha256(raw.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def create_app(latency: float = 0.1, jitter: float = 0.02, rpm: float = None, tpm: float = None,
+               error_rate: float = 0.0, throttle_rate: float = 0.0, chat_latency: float = None,
+               token_delay: float = 0.0, reply: str = CHAT_REPLY, chat_concurrency: int = None) -> FastAPI:
+    """
+    latency/jitter apply to embeddings, and to chat completions unless chat_latency
+    is given (time to first token); token_delay is the gap between streamed words.
+    chat_concurrency, if given, is how many completions are generated at once.
+    The fault settings live in app.state.faults, so an in-process caller can make
+    the server slow or flaky mid-run and then let it recover.
+    """
+    app = FastAPI(title="Fake OpenAI")
+    app.state.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "inputs": 0,
+                       "chat_requests": 0, "chat_streams": 0}
+    app.state.faults = {
+        "latency": latency,
+        "chat_latency": latency if chat_latency is None else chat_latency,
+        "jitter": jitter,
+        "token_delay": token_delay,
+        "throttle_rate": throttle_rate,
+        "error_rate": error_rate,
+    }
+    faults = app.state.faults
+    request_limit = WindowLimit(rpm) if rpm else None
+    token_limit = WindowLimit(tpm) if tpm else None
+    reply_words = reply.split(" ")
+    generating = asyncio.Semaphore(chat_concurrency) if chat_concurrency else None
+
+    def delay(base: float) -> float:
+        return max(0.0, base + random.uniform(-faults["jitter"], faults["jitter"]))
+
+    def injected_failure():
+        """A random 429 or 500, or None."""
+        if faults["throttle_rate"] and random.random() < faults["throttle_rate"]:
+            return rate_limited(random.uniform(0.05, 0.5))
+        if faults["error_rate"] and random.random() < faults["error_rate"]:
+            app.state.stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": {"message": "Injected failure", "type": "server_error"}})
+        return None
+
+    def rate_limited(wait: float) -> JSONResponse:
+        app.state.stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": f"{wait:.3f}"},
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+        )
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        tokens = sum(len(text) // 4 + 1 if isinstance(text, str) else len(text) for text in inputs)
+        app.state.stats["requests"] += 1
+
+        for limit, amount in ((request_limit, 1), (token_limit, tokens)):
+            wait = limit.take(amount) if limit else 0.0
+            if wait:
+                return rate_limited(wait)
+        failure = injected_failure()
+        if failure:
+            return failure
+
+        await asyncio.sleep(delay(faults["latency"]))
+        app.state.stats["inputs"] += len(inputs)
+
+        data = []
+        for i, text in enumerate(inputs):
+            v = fake_vector(text, body.get("dimensions") or DIMENSIONS)
+            embedding = base64.b64encode(v.tobytes()).decode() if body.get("encoding_format") == "base64" else v.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.stats["chat_requests"] += 1
+        failure = injected_failure()
+        if failure:
+            return failure
+
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 1 for m in body.get("messages", []))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(reply_words),
+                 "total_tokens": prompt_tokens + len(reply_words)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "fake")
+        if generating is not None:
+            # Released once the last token is out (by events() for streams)
+            await generating.acquire()
+        try:
+            await asyncio.sleep(delay(faults["chat_latency"]))
+        except BaseException:
+            if generating is not None:
+                generating.release()
+            raise
+        token_delay = faults["token_delay"]
+
+        if not body.get("stream"):
+            try:
+                if token_delay:
+                    # A non-streamed reply still waits for every token to be generated
+                    await asyncio.sleep(token_delay * len(reply_words))
+            finally:
+                if generating is not None:
+                    generating.release()
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        app.state.stats["chat_streams"] += 1
+
+        def chunk(delta: dict, finish_reason=None, **extra) -> str:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    **extra}
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events():
+            try:
+                yield chunk({"role": "assistant", "content": ""})
+                for i, word in enumerate(reply_words):
+                    if i and token_delay:
+                        await asyncio.sleep(token_delay)
+                    yield chunk({"content": word if i == 0 else " " + word})
+            finally:
+                if generating is not None:
+                    generating.release()
+            yield chunk({}, finish_reason="stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                data = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(data)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(app, port: int = None) -> uvicorn.Server:
+    """Run an ASGI app on a background thread; returns the server (set .should_exit to stop)."""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    server.base_url = f"http://127.0.0.1:{port}"
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rpm", type=float, default=None)
+    parser.add_argument("--tpm", type=float, default=None)
+    parser.add_argument("--chat-latency", type=float, default=None, help="chat time to first token (default: --latency)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed words")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 500")
+    parser.add_argument("--chat-concurrency", type=int, default=None, help="completions generated at once")
+    args = parser.parse_args()
+    app = create_app(args.latency, args.jitter, args.rpm, args.tpm, error_rate=args.error_rate,
+                     throttle_rate=args.throttle_rate, chat_latency=args.chat_latency, token_delay=args.token_delay,
+                     chat_concurrency=args.chat_concurrency)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
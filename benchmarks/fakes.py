@@ -0,0 +1,196 @@
+"""
+Offline stand-ins for the OpenAI embedding model and chat model, plus a tiny
+MOHI knowledge base, so the benchmarks run without network access or API keys.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+# Keep Chroma from phoning home during offline runs
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+# The suggested prompts below would otherwise be answered by the intent fast path;
+# pipeline benchmarks measure retrieval + LLM (bench_intents.py covers the router)
+os.environ.setdefault("RAFIKI_INTENT_ROUTER", "0")
+
+from langchain_core.documents import Document
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+EMBEDDING_SIZE = 256
+
+SAMPLE_DOCS = [
+    "The MOHI IT Office is located at the Pangani Head Office. Call Ext 303 or Ext 304 during working hours.",
+    "If your portal account is locked, contact IT with your Staff ID and Username. Password resets take about 30 minutes.",
+    "To apply for leave, log into the MOHI Staff Portal and open Employee > Leave Application, then pick the Leave Type.",
+    "Sick leave requires a medical certificate uploaded under Supporting Documents before supervisor approval.",
+    "MOHI runs centers across Nairobi including Pangani, Mathare, Kosovo and Ngomongo.",
+    "Staff laptops must be returned to the Pangani IT Office for servicing. Do not install unlicensed software.",
+    "The staff Wi-Fi network is MOHI-Staff. Guests use MOHI-Guest and must request a voucher from reception.",
+    "Email signatures follow the MOHI brand guide: name, title, center and the Pangani switchboard number.",
+]
+
+SAMPLE_QUESTIONS = [
+    "Where is the IT office located and what are the extensions?",
+    "My portal account is locked, what should I do?",
+    "Show me the steps to apply for employee leave.",
+    "How many centers do we have in Nairobi?",
+]
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic hash embeddings with an optional per-call delay standing in for the API round trip."""
+
+    delay: float = 0.0
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return super().embed_query(text)
+
+
+class FakeLLM(FakeListChatModel):
+    """
+    Chat model that replies with a canned answer after an optional delay.
+    When streamed, `delay` is the time to first token and `sleep` the gap between tokens.
+    """
+
+    responses: list = ["Please contact the I.T. department at Pangani (Ext 303/304)."]
+    delay: float = 0.0
+    calls: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return super()._call(*args, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        # Await the delay instead of sleeping a worker thread, like a real async HTTP client
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        response = self.responses[self.i]
+        if self.sleep:
+            # A non-streamed reply still has to wait for every token to be generated
+            await asyncio.sleep(self.sleep * len(response))
+        self.i = (self.i + 1) % len(self.responses)
+        text = response
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, *args, **kwargs):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        yield from super()._stream(*args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words vectors: texts sharing words land close together, so
+    retrieval-quality benchmarks get a (crude) semantic signal offline.
+    """
+
+    def __init__(self, size: int = EMBEDDING_SIZE):
+        self.size = size
+
+    def _embed(self, text: str) -> list:
+        v = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r"[a-z]+", text.lower()):
+            if len(word) > 3:
+                v[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1.0
+        norm = np.linalg.norm(v)
+        return (v / norm if norm else v).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def make_embeddings(delay: float = 0.0) -> FakeEmbeddings:
+    return FakeEmbeddings(size=EMBEDDING_SIZE, delay=delay)
+
+
+def make_llm(delay: float = 0.0, responses=None, token_delay=None) -> FakeLLM:
+    kwargs = {"delay": delay, "sleep": token_delay}
+    if responses:
+        kwargs["responses"] = responses
+    return FakeLLM(**kwargs)
+
+
+def build_fixture_db(db_path: str, embeddings=None):
+    """Persist SAMPLE_DOCS into a Chroma directory at db_path."""
+    from langchain_chroma import Chroma
+
+    from app.services.knowledge import build_lexical_index, build_vector_index
+
+    docs = [Document(page_content=text, metadata={"source": f"sample_{i}.pdf"}) for i, text in enumerate(SAMPLE_DOCS)]
+    vector_db = Chroma.from_documents(
+        documents=docs,
+        embedding=embeddings or make_embeddings(),
+        persist_directory=db_path,
+    )
+    build_lexical_index(vector_db, db_path)
+    build_vector_index(vector_db, db_path)
+    return vector_db
+
+
+DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+
+def write_docx(path: str, paragraphs: list):
+    """Write a minimal .docx (enough for Docx2txtLoader) without python-docx."""
+    body = "".join(f"<w:p><w:r><w:t>{escape(p)}</w:t></w:r></w:p>" for p in paragraphs)
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", DOCX_CONTENT_TYPES)
+        z.writestr("_rels/.rels", DOCX_RELS)
+        z.writestr("word/document.xml", document)
+
+
+def write_corpus(data_path: str, files: int, paragraphs: int = 200):
+    """Synthetic HR/IT manual corpus of .docx files built from SAMPLE_DOCS."""
+    os.makedirs(data_path, exist_ok=True)
+    for f in range(files):
+        write_docx(
+            os.path.join(data_path, f"manual_{f:04d}.docx"),
+            [f"{f}.{p} {SAMPLE_DOCS[(f + p) % len(SAMPLE_DOCS)]}" for p in range(paragraphs)],
+        )
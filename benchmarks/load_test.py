@@ -0,0 +1,316 @@
+"""
+End-to-end load test, fully offline: the fake OpenAI server (embeddings +
+chat, with latency, jitter and injected 429s/500s) stands in for the API, a
+tiny Chroma fixture for the knowledge base, and both apps run as real uvicorn
+processes. An async load generator drives /chat (app.main) and /api/chat
+(backend/server.py) at a fixed concurrency and writes throughput, latency
+percentiles and error rate as JSON to test_reports/.
+
+    python benchmarks/load_test.py --concurrency 16 --requests 400
+    python benchmarks/load_test.py --target backend --stream --throttle-rate 0.05
+    python benchmarks/load_test.py --output /tmp/load.json --baseline test_reports/load_test_results.json
+
+With --baseline the run fails (exit 1) when throughput drops or p95 grows by
+more than --tolerance against that report; --url skips the local processes
+and loads an already running deployment.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+# fakes first: it sets env defaults that app modules read at import time
+from benchmarks.fakes import SAMPLE_QUESTIONS, build_fixture_db
+from benchmarks.fake_openai import free_port
+from app.services.embeddings import EMBEDDING_MODEL, write_embedding_config
+
+FIXTURE_PATH = ROOT / "benchmarks" / "fixtures" / "chroma_tiny"
+REPORT_PATH = ROOT / "test_reports" / "load_test_results.json"
+TARGETS = {
+    # target -> (uvicorn app, app dir, chat path)
+    "main": ("app.main:app", ROOT, "/chat"),
+    "backend": ("server:app", ROOT / "backend", "/api/chat"),
+}
+
+
+def build_fixture(path: Path, base_url: str):
+    """
+    Embed the sample knowledge base through the fake server, with the same
+    client settings the app uses, so query vectors and stored vectors agree.
+    Built once and reused; delete the directory (or --rebuild-fixture) to redo it.
+    """
+    from langchain_openai import OpenAIEmbeddings
+
+    embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL, base_url=f"{base_url}/v1", api_key="fake",
+                                  check_embedding_ctx_length=False)
+    build_fixture_db(str(path), embeddings=embeddings)
+    write_embedding_config(str(path), {"backend": "openai", "model": EMBEDDING_MODEL})
+    print(f"🧱 Chroma fixture built at {path}")
+
+
+def spawn(args: list, cwd: Path, env: dict, log) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_healthy(url: str, process: subprocess.Popen, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            # 503 while the app warms up its top answers
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not healthy after {timeout:.0f}s")
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    ok = [s for s in samples if s["ok"]]
+    latencies = sorted(s["seconds"] * 1000 for s in ok)
+    errors = {}
+    for s in samples:
+        if not s["ok"]:
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+    summary = {
+        "requests": len(samples),
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "max": round(latencies[-1], 1) if latencies else 0,
+        },
+        "error_rate": round((len(samples) - len(ok)) / len(samples) * 100, 2) if samples else 0,
+        "errors": errors,
+        # 200s answered by the built-in responses instead of the pipeline
+        "fallbacks": sum(1 for s in ok if s.get("fallback")),
+    }
+    first_tokens = sorted(s["first_token"] * 1000 for s in ok if s.get("first_token") is not None)
+    if first_tokens:
+        summary["first_token_ms"] = {"p50": round(percentile(first_tokens, 50), 1),
+                                     "p95": round(percentile(first_tokens, 95), 1),
+                                     "p99": round(percentile(first_tokens, 99), 1)}
+    return summary
+
+
+async def send(client: httpx.AsyncClient, path: str, body: dict, stream: bool) -> dict:
+    """One request; returns a sample with latency, and for streams the time to first token."""
+    start = time.perf_counter()
+    sample = {"ok": False, "session_id": None}
+    try:
+        if not stream:
+            response = await client.post(path, json=body)
+            if response.status_code != 200:
+                sample["error"] = str(response.status_code)
+            else:
+                reply = response.json()
+                sample.update(ok=True, session_id=reply.get("session_id"), fallback=not reply.get("answer_id"))
+        else:
+            async with client.stream("POST", f"{path}/stream", json=body) as response:
+                if response.status_code != 200:
+                    sample["error"] = str(response.status_code)
+                else:
+                    event = None
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: "):
+                            event = line[7:]
+                        elif line.startswith("data: "):
+                            data = json.loads(line[6:])
+                            if event == "token" and "first_token" not in sample:
+                                sample["first_token"] = time.perf_counter() - start
+                            elif event == "metadata":
+                                sample["session_id"] = data.get("session_id")
+                            elif event == "done":
+                                sample.update(ok=True, fallback=not data.get("answer_id"))
+                            elif event == "error":
+                                sample["error"] = "stream_error"
+                    if not sample["ok"] and "error" not in sample:
+                        sample["error"] = "incomplete_stream"
+    except httpx.HTTPError as e:
+        sample["error"] = type(e).__name__
+    sample["seconds"] = time.perf_counter() - start
+    return sample
+
+
+async def generate_load(base_url: str, path: str, concurrency: int, requests: int, stream: bool,
+                        turns: int, repeat: bool, timeout: float) -> dict:
+    """
+    Closed loop: `concurrency` simulated staff each send their next message as
+    soon as the previous reply lands, continuing one conversation for `turns`
+    messages. Questions are made unique unless `repeat`, so caches don't hide
+    the pipeline cost.
+    """
+    counter = iter(range(requests))
+    samples = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def user():
+            session_id, turn = None, 0
+            for n in counter:
+                question = SAMPLE_QUESTIONS[n % len(SAMPLE_QUESTIONS)]
+                if not repeat:
+                    question = f"{question} (ticket {n})"
+                sample = await send(client, path, {"message": question, "session_id": session_id}, stream)
+                samples.append(sample)
+                turn += 1
+                session_id = sample["session_id"] if turn < turns else None
+                turn %= turns
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return summarize(samples, elapsed)
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> list:
+    """Regressions against a previous report: lower throughput or higher p95, beyond the tolerance."""
+    baseline = json.loads(Path(baseline_path).read_text())["targets"]
+    regressions = []
+    for target, current in results["targets"].items():
+        before = baseline.get(target)
+        if not before:
+            continue
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{target}: throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append(f"{target}: p95 {before['latency_ms']['p95']} -> {current['latency_ms']['p95']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["main", "backend", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="per target")
+    parser.add_argument("--stream", action="store_true", help="use the SSE endpoints and report time to first token")
+    parser.add_argument("--turns", type=int, default=1, help="messages per conversation before starting a new one")
+    parser.add_argument("--repeat", action="store_true", help="send the sample questions verbatim (caches will hit)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake embedding latency")
+    parser.add_argument("--chat-latency", type=float, default=0.3, help="fake LLM time to first token")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of upstream calls answered 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream calls answered 500")
+    parser.add_argument("--url", default=None, help="load this running app instead of starting local ones")
+    parser.add_argument("--rebuild-fixture", action="store_true")
+    parser.add_argument("--output", default=str(REPORT_PATH))
+    parser.add_argument("--baseline", default=None, help="previous report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    targets = ["main", "backend"] if args.target == "both" else [args.target]
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "concurrency": args.concurrency,
+        "stream": args.stream,
+        "turns": args.turns,
+        "unique_questions": not args.repeat,
+        "upstream": {key: getattr(args, key) for key in
+                     ("latency", "chat_latency", "jitter", "token_delay", "throttle_rate", "error_rate")},
+        "targets": {},
+    }
+
+    def run(target: str, base_url: str):
+        print(f"🚦 {target}: {args.requests} requests at concurrency {args.concurrency}")
+        summary = asyncio.run(generate_load(base_url, TARGETS[target][2], args.concurrency, args.requests,
+                                            args.stream, args.turns, args.repeat, args.timeout))
+        results["targets"][target] = summary
+        print(f"   {summary['throughput_rps']} req/s, p50 {summary['latency_ms']['p50']} ms, "
+              f"p95 {summary['latency_ms']['p95']} ms, p99 {summary['latency_ms']['p99']} ms, "
+              f"errors {summary['error_rate']}%")
+
+    if args.url:
+        results["url"] = args.url
+        for target in targets:
+            run(target, args.url.rstrip("/"))
+    else:
+        processes = []
+        with tempfile.TemporaryDirectory() as tmp, open(os.path.join(tmp, "servers.log"), "w") as log:
+            try:
+                fake_port = free_port()
+                fake_url = f"http://127.0.0.1:{fake_port}"
+                fake = spawn([str(ROOT / "benchmarks" / "fake_openai.py"), "--port", str(fake_port),
+                              "--latency", str(args.latency), "--jitter", str(args.jitter),
+                              "--chat-latency", str(args.chat_latency), "--token-delay", str(args.token_delay),
+                              "--throttle-rate", str(args.throttle_rate), "--error-rate", str(args.error_rate)],
+                             ROOT, dict(os.environ), log)
+                processes.append(fake)
+                wait_healthy(f"{fake_url}/stats", fake)
+
+                if args.rebuild_fixture or not FIXTURE_PATH.exists():
+                    if FIXTURE_PATH.exists():
+                        import shutil
+                        shutil.rmtree(FIXTURE_PATH)
+                    build_fixture(FIXTURE_PATH, fake_url)
+
+                for target in targets:
+                    app, app_dir, _ = TARGETS[target]
+                    port = free_port()
+                    # Fresh runtime state per target: caches and feedback must not carry over
+                    env = dict(os.environ, OPENAI_API_KEY="fake", OPENAI_BASE_URL=f"{fake_url}/v1",
+                               OPENAI_API_BASE=f"{fake_url}/v1", RAFIKI_DB_PATH=str(FIXTURE_PATH),
+                               RAFIKI_EMBED_CACHE=os.path.join(tmp, f"{target}_embeddings.sqlite3"),
+                               RAFIKI_FEEDBACK_DB=os.path.join(tmp, f"{target}_feedback.sqlite3"),
+                               RAFIKI_QUESTION_LOG=os.path.join(tmp, f"{target}_questions.sqlite3"),
+                               # Every simulated user shares one address: no per-client rate limit
+                               RAFIKI_USER_RATE="0", RAFIKI_CLIENT_RATE="0",
+                               RAFIKI_INTENT_ROUTER="0", ANONYMIZED_TELEMETRY="False")
+                    server = spawn(["-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+                                   app_dir, env, log)
+                    processes.append(server)
+                    wait_healthy(f"http://127.0.0.1:{port}/", server)
+                    run(target, f"http://127.0.0.1:{port}")
+                    server.terminate()
+                    server.wait()
+
+                results["upstream"]["calls"] = httpx.get(f"{fake_url}/stats").json()
+            finally:
+                for process in processes:
+                    if process.poll() is None:
+                        process.terminate()
+                        process.wait()
+                log.flush()
+                if any(target not in results["targets"] for target in targets):
+                    print(Path(log.name).read_text()[-4000:])
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"📄 Report written to {output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
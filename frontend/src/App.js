@@ -189,7 +189,7 @@ function App() {
   const [messages, setMessages] = useState([]);
   const [inputValue, setInputValue] = useState('');
   const [isTyping, setIsTyping] = useState(false);
-  const [history, setHistory] = useState([]);
+  const [sessionId, setSessionId] = useState(null);
   const [feedback, setFeedback] = useState({}); 
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
@@ -249,7 +249,8 @@ function App() {
           messageContent: messages[messageIndex]?.content,
           feedbackType: feedbackData.type,
           feedbackReason: feedbackData.reason,
-          timestamp: new Date().toISOString()
+          timestamp: new Date().toISOString(),
+          answerId: messages[messageIndex]?.answerId
         })
       });
     } catch (error) {
@@ -267,27 +268,73 @@ function App() {
     setInputValue('');
     setIsTyping(true);
 
-    // Update history for API
-    const updatedHistory = [...history, userMessage];
-    setHistory(updatedHistory);
-
     try {
-      const response = await fetch(`${BACKEND_URL}/chat`, {
+      const response = await fetch(`${BACKEND_URL}/chat/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
           message: messageText.trim(),
-          history: updatedHistory,
+          // The server keeps the conversation; only the new message and its session ID are sent
+          session_id: sessionId,
         }),
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        const assistantMessage = { role: 'assistant', content: data.response };
-        setMessages((prev) => [...prev, assistantMessage]);
-        setHistory((prev) => [...prev, assistantMessage]);
+      if (response.ok && response.body) {
+        // Read Server-Sent Events: 'metadata', then 'token' frames, then 'done'
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answer = '';
+        let started = false;
+        let finished = false;
+
+        const showPartialAnswer = (content, answerId) => {
+          // answerId (sent with 'done') ties the thumbs up/down on this message to the answer
+          const reply = { role: 'assistant', content, answerId };
+          if (!started) {
+            started = true;
+            setIsTyping(false);
+            setMessages((prev) => [...prev, reply]);
+          } else {
+            setMessages((prev) => [...prev.slice(0, -1), reply]);
+          }
+        };
+
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+
+          const frames = buffer.split('\n\n');
+          buffer = frames.pop();
+          for (const frame of frames) {
+            const event = frame.match(/^event: (.*)$/m)?.[1];
+            const data = frame.match(/^data: (.*)$/m)?.[1];
+            if (!event || !data) continue;
+            const payload = JSON.parse(data);
+
+            if (event === 'metadata' && payload.session_id) {
+              setSessionId(payload.session_id);
+            } else if (event === 'token') {
+              answer += payload.content;
+              showPartialAnswer(answer);
+            } else if (event === 'done') {
+              answer = payload.response;
+              showPartialAnswer(answer, payload.answer_id);
+              finished = true;
+            } else if (event === 'error') {
+              break;
+            }
+          }
+        }
+
+        // The stream failed part-way ('error' frame, or the connection dropped before 'done')
+        if (!finished) {
+          const notice = "Sorry, my answer was cut off. Please ask again, or contact the IT office directly if this persists.";
+          showPartialAnswer(answer ? `${answer}\n\n_${notice}_` : notice);
+        }
       } else {
         const errorMessage = {
           role: 'assistant',
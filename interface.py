@@ -34,6 +34,8 @@ with st.sidebar:
 # 3. Initialize Chat History
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None  # the server keeps the conversation under this ID
 
 # 4. Display Chat History
 for message in st.session_state.messages:
@@ -56,14 +58,18 @@ if prompt:
             try:
                 response = requests.post(
                     "http://127.0.0.1:8080/chat", 
-                    json={"message": prompt, "history": st.session_state.messages},
+                    json={"message": prompt, "session_id": st.session_state.session_id},
                     timeout=30
                 )
                 
                 if response.status_code == 200:
                     answer = response.json().get("response")
+                    st.session_state.session_id = response.json().get("session_id") or st.session_state.session_id
                     st.markdown(answer)
                     st.session_state.messages.append({"role": "assistant", "content": answer})
+                elif response.status_code in (429, 503) and "Retry-After" in response.headers:
+                    # Rate limited or overloaded: the server says when to try again
+                    st.warning(f"⏳ Rafiki is busy right now. Please try again in {response.headers['Retry-After']} seconds.")
                 else:
                     st.warning("⚠️ Rafiki is currently offline. Please ensure the FastAPI server is running in the background.")
             except Exception: